@@ -0,0 +1,105 @@
+# ==================================================
+# Benchmark: Config lookups per second
+# ==================================================
+#
+# Usage (from the project folder):
+#   python bench/bench_config.py
+
+# imports
+import sys
+import time
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "bench")
+
+from fake_hw import install_shims
+
+install_shims()
+
+from src.config import Config
+
+
+# ==================================================
+# class LegacyConfig (parses the value on every call)
+# ==================================================
+class LegacyConfig(Config):
+    def get_int_value(self, key, default=0):
+        try:
+            value = self.config.get(str(key), int(default))
+            return int(value)
+        except (ValueError, TypeError):
+            return int(default)
+
+    def get_float_value(self, key, default=0.0, decimal=None):
+        try:
+            value = self.config.get(str(key), float(default))
+            float_value = float(value)
+            if decimal is not None:
+                return round(float_value, int(decimal))
+            return float_value
+        except (ValueError, TypeError):
+            return float(default)
+
+
+# create config with string values (as after a POST from the web ui)
+def create_config(config_class):
+    config = config_class(file_name="bench_config.json")
+    values = {
+        "temp_last_measurement_time": "123456",
+        "temp_sampling_interval": "6000",
+        "current_temp": "48.5",
+        "temp_last_measurement": "48.1",
+    }
+    config.config.update(values)
+    config.state.update(values)
+    config.invalidate()
+    return config
+
+
+# lookups per second
+def lookups_per_second(lookup, rounds=20000):
+    start = time.ticks_us()
+    for _ in range(rounds):
+        lookup()
+    elapsed_us = max(1, time.ticks_diff(time.ticks_us(), start))
+    return 4 * rounds * 1000000 / elapsed_us  # 4 lookups per round
+
+
+# print results
+def main():
+    legacy = create_config(LegacyConfig)
+    cached = create_config(Config)
+
+    def lookup_keys(config):
+        config.get_int_value("temp_last_measurement_time")
+        config.get_int_value("temp_sampling_interval")
+        config.get_float_value("current_temp", -127.0)
+        config.get_float_value("temp_last_measurement")
+
+    measurement_time = cached.int_accessor("temp_last_measurement_time")
+    sampling_interval = cached.int_accessor("temp_sampling_interval")
+    current_temp = cached.float_accessor("current_temp", -127.0)
+    last_measurement = cached.float_accessor("temp_last_measurement")
+
+    def lookup_accessors():
+        measurement_time.get()
+        sampling_interval.get()
+        current_temp.get()
+        last_measurement.get()
+
+    results = {
+        "legacy get_*_value()": lookups_per_second(lambda: lookup_keys(legacy)),
+        "cached get_*_value()": lookups_per_second(lambda: lookup_keys(cached)),
+        "accessor.get()": lookups_per_second(lookup_accessors),
+    }
+    for name, value in results.items():
+        print(f"{name:22} {value:12.0f} lookups/s")
+
+    # values must follow config.set_value()
+    cached.set_value("current_temp", "50.25")
+    assert current_temp.get() == 50.25
+    assert cached.get_float_value("current_temp") == 50.25
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# ==================================================
+# Benchmark: HTTP request parsing
+# ==================================================
+#
+# Compares the line based parser (readline(), decode, split) with the in place
+# parser of src/http.py on a socket stand-in, that delivers a request in
+# TCP sized segments. Heap usage is measured with tracemalloc (CPython).
+#
+# Usage (from the project folder):
+#   python bench/bench_http.py
+
+# imports
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "bench")
+
+from fake_hw import install_shims
+
+install_shims()
+
+import uasyncio as asyncio
+from src.http import Connection, get_deadline, read_until
+
+BODY = (
+    b"nominal_min_temp=42.5&nominal_max_temp=57.0&delay_before_start_1=660"
+    b"&init_relay_time=5000&delay_before_start_2=420&relay_time=1200"
+    b"&update_time=120&temp_update_interval=5&lcd_i2c_backlight=true"
+    b"&buttons_activated=false&log_level=INFO&interval=930"
+    b"&temp_sampling_interval=6000&temp_change_high_threshold_temp=1.0"
+    b"&wifi_max_attempts=10&manual_relay_time=1500"
+)
+REQUEST = (
+    b"POST /save_config?ajax=1 HTTP/1.1\r\n"
+    b"Host: 192.168.1.50\r\n"
+    b"User-Agent: Mozilla/5.0 (Linux; Android 13) AppleWebKit/537.36\r\n"
+    b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+    b"Accept-Language: de-DE,de;q=0.9,en;q=0.8\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Content-Type: application/x-www-form-urlencoded\r\n"
+    b"Content-Length: %d\r\n"
+    b"Origin: http://192.168.1.50\r\n"
+    b"Connection: keep-alive\r\n"
+    b"\r\n" % len(BODY)
+) + BODY
+
+
+# ==================================================
+# class FakeSocket (stream reader stand-in)
+# ==================================================
+# delivers the data in segments like a socket, readline() and read() return
+# new bytes objects like uasyncio.StreamReader
+class FakeSocket:
+    def __init__(self, data, segment_size=536):
+        self.data = data
+        self.pos = 0
+        self.segment_end = 0
+        self.segment_size = segment_size
+
+    # next segment
+    def next_segment(self):
+        if self.pos >= self.segment_end:
+            self.segment_end = min(len(self.data), self.pos + self.segment_size)
+
+    async def readline(self):
+        self.next_segment()
+        end = self.data.find(b"\n", self.pos, self.segment_end)
+        end = self.segment_end if end < 0 else end + 1
+        line = self.data[self.pos : end]
+        self.pos = end
+        return line
+
+    async def read(self, size):
+        self.next_segment()
+        end = min(self.segment_end, self.pos + size)
+        data = self.data[self.pos : end]
+        self.pos = end
+        return data
+
+    async def readinto(self, view):
+        self.next_segment()
+        count = min(self.segment_end - self.pos, len(view))
+        view[:count] = self.data[self.pos : self.pos + count]
+        self.pos += count
+        return count
+
+
+# legacy parser (readline() per header line with a deadline, decoded and split
+# into strings, like the webserver before the in place parser)
+async def legacy_read_request(reader):
+    deadline = get_deadline(5000)
+    request_lines = []
+    content_length = 0
+    while True:
+        line = await read_until(deadline, reader.readline)
+        if line == b"\r\n" or not line:
+            break
+        request_lines.append(line.decode("utf-8"))
+        if line.lower().startswith(b"content-length:"):
+            content_length = int(line.decode().split()[1])
+    request_header = "".join(request_lines)
+    request_body = ""
+    remaining_length = content_length
+    while remaining_length > 0:
+        chunk = await read_until(deadline, reader.read, min(remaining_length, 1024))
+        if not chunk:
+            break
+        request_body += chunk.decode("utf-8")
+        remaining_length -= len(chunk)
+    method = request_header.split(" ")[0]
+    path, _, query = request_header.split(" ")[1].partition("?")
+    headers = {}
+    for line in request_lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    form = {}
+    for pair in request_body.split("&"):
+        key, _, value = pair.partition("=")
+        form[key] = value
+    return method, path, query, headers, form
+
+
+# in place parser
+async def parse_in_place(reader, buffer):
+    request = await Connection(reader, buffer).read_request()
+    return request.method, request.path, request.get_params(), request.get_form()
+
+
+# measure parser
+def measure(parse, rounds=2000):
+    buffer = bytearray(3072)
+
+    async def run():
+        # heap peak of one request
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        await parse(FakeSocket(REQUEST), buffer)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+
+        # throughput
+        start = time.ticks_us()
+        for _ in range(rounds):
+            await parse(FakeSocket(REQUEST), buffer)
+        elapsed_us = max(1, time.ticks_diff(time.ticks_us(), start))
+        return rounds * 1000000 / elapsed_us, peak
+
+    return asyncio.run(run())
+
+
+# print results
+def main():
+    legacy = measure(lambda reader, buffer: legacy_read_request(reader))
+    in_place = measure(parse_in_place)
+    print(f"request: {len(REQUEST)} bytes")
+    for name, (requests, peak) in (("legacy", legacy), ("in place", in_place)):
+        print(f"{name:10} {requests:10.0f} requests/s {peak:8} bytes heap peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# ==================================================
+# Benchmark: I2cLcd.putstr() transactions and allocations
+# ==================================================
+#
+# Usage (from the project folder):
+#   python bench/bench_lcd.py
+
+# imports
+import sys
+import time
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "bench")
+
+from fake_hw import FakeI2C, install_shims
+
+install_shims()
+
+from src.lcd_api import LcdApi
+from src.machine_i2c_lcd import I2cLcd, MASK_RS, MASK_E, SHIFT_BACKLIGHT, SHIFT_DATA
+
+
+# ==================================================
+# class LegacyI2cLcd (4 writeto() and 4 allocations per byte)
+# ==================================================
+class LegacyI2cLcd(I2cLcd):
+    def hal_write_data(self, data):
+        byte = (
+            MASK_RS
+            | (self.backlight << SHIFT_BACKLIGHT)
+            | (((data >> 4) & 0x0F) << SHIFT_DATA)
+        )
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        byte = (
+            MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | ((data & 0x0F) << SHIFT_DATA)
+        )
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+
+    def hal_write_command(self, cmd):
+        byte = (self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0F) << SHIFT_DATA)
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        byte = (self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0F) << SHIFT_DATA)
+        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
+        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+
+    def putstr(self, string):
+        for char in string:
+            self.putchar(char)
+
+
+# run benchmark
+def run(lcd_class, string, rounds=200):
+    i2c = FakeI2C()
+    lcd = lcd_class(i2c, 0x27, 4, 20)
+    preallocated = [getattr(lcd, "cmd_buf", None), getattr(lcd, "data_buf", None)]
+
+    # count one putstr()
+    lcd.move_to(0, 0)
+    i2c.reset()
+    lcd.putstr(string)
+    result = {
+        "transactions": i2c.transactions,
+        "bytes": i2c.bytes,
+        "allocations": i2c.allocations(preallocated),
+        "cursor": (lcd.cursor_x, lcd.cursor_y),
+    }
+
+    # time several putstr()
+    start = time.ticks_us()
+    for _ in range(rounds):
+        lcd.move_to(0, 0)
+        lcd.putstr(string)
+    result["us_per_putstr"] = time.ticks_diff(time.ticks_us(), start) / rounds
+    return result
+
+
+# print results
+def main():
+    cases = {
+        "line (20 chars)": "Regle in:    01m 59s",
+        "screen (80 chars)": "x" * 80,
+        "wrap + newline": "Temperatur\nSoll: 42.0 - 57.0 \337C" + "-" * 30,
+    }
+    for name, string in cases.items():
+        legacy = run(LegacyI2cLcd, string)
+        bulk = run(I2cLcd, string)
+        assert legacy["cursor"] == bulk["cursor"], "cursor differs"
+        print(name)
+        for key in ("transactions", "bytes", "allocations", "us_per_putstr"):
+            print(f"  {key:15} legacy: {legacy[key]:10.1f}   bulk: {bulk[key]:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
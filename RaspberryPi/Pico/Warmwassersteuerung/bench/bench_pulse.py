@@ -0,0 +1,123 @@
+# ==================================================
+# Benchmark: relay pulse width under event loop load
+# ==================================================
+#
+# Compares a pulse timed by asyncio.sleep_ms() with the timer driven pulse of
+# src/pulse.py, while a load task blocks the event loop (page rendering, i2c
+# and onewire transfers). The pulse widths are measured at the simulated pin,
+# the simulated timer calls back from a thread like an irq (the thread
+# scheduling of the host adds some jitter, which a real timer irq does not
+# have).
+#
+# Usage (from the project folder):
+#   python bench/bench_pulse.py
+
+# imports
+import random
+import sys
+import time
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "bench")
+
+import sim
+
+sim.install()
+
+import uasyncio as asyncio
+from machine import Pin, add_pin_listener
+from src.pulse import PulseDriver
+
+PULSE_MS = 200
+PULSES = 10
+
+# load: maximum blocking time of the event loop in milliseconds
+LOADS = {"idle": 0, "light": 20, "heavy": 100}
+
+
+# pin edges (pin number -> [(perf_counter, value)])
+edges = {}
+
+
+# record edges of a pin
+def record_edges(pin_number):
+    edges[pin_number] = []
+    add_pin_listener(
+        pin_number,
+        lambda value: edges[pin_number].append((time.perf_counter(), value)),
+    )
+
+
+# get pulse widths of a pin in milliseconds (rising to falling edge)
+def get_pulses(pin_number):
+    pulses = []
+    start = None
+    for timestamp, value in edges[pin_number]:
+        if value:
+            start = timestamp
+        elif start is not None:
+            pulses.append((timestamp - start) * 1000)
+            start = None
+    return pulses
+
+
+# pulse timed by the event loop (like open_relay() before the pulse driver)
+async def sleep_pulse(pin_number, duration_ms):
+    pin = Pin(pin_number, Pin.OUT)
+    pin.value(1)
+    await asyncio.sleep_ms(duration_ms)
+    pin.value(0)
+
+
+# pulse switched off by the timer callback
+async def timer_pulse(pin_number, duration_ms, driver):
+    driver.start(pin_number, duration_ms)
+    return await driver.wait()
+
+
+# block the event loop for random times (like synchronous work in other tasks)
+async def load_task(max_block_ms, rng):
+    while max_block_ms:
+        time.sleep(rng.uniform(0, max_block_ms) / 1000)
+        await asyncio.sleep(0)
+
+
+# run pulses under load (returns the pulse widths measured at the pin in ms)
+def measure(pulse, pin_number, max_block_ms):
+    async def run():
+        load = asyncio.create_task(load_task(max_block_ms, random.Random(1)))
+        for _ in range(PULSES):
+            await pulse(pin_number)
+            await asyncio.sleep_ms(20)
+        load.cancel()
+
+    record_edges(pin_number)
+    asyncio.run(run())
+    return get_pulses(pin_number)
+
+
+# print results
+def main():
+    print(f"{PULSES} pulses of {PULSE_MS} ms, error = measured - commanded")
+    print(f"{'load':6} {'method':6} {'mean':>9} {'max':>9}")
+    pin_number = 100  # unused pins
+    for load_name, max_block_ms in LOADS.items():
+        driver = PulseDriver()
+        methods = (
+            ("sleep", lambda pin: sleep_pulse(pin, PULSE_MS)),
+            ("timer", lambda pin: timer_pulse(pin, PULSE_MS, driver)),
+        )
+        for method_name, pulse in methods:
+            pin_number += 1
+            widths = measure(pulse, pin_number, max_block_ms)
+            errors = [width - PULSE_MS for width in widths]
+            print(
+                f"{load_name:6} {method_name:6} {sum(errors) / len(errors):7.2f}ms"
+                f" {max(errors):7.2f}ms"
+            )
+        recorded = [pulse[2] / 1000 - PULSE_MS for pulse in driver.pulses]
+        print(f"{'':6} {'(rec.)':6} {sum(recorded) / len(recorded):7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# ==================================================
+# Benchmark: index.html page render
+# ==================================================
+#
+# Usage (from the project folder):
+#   python bench/bench_template.py
+
+# imports
+import sys
+import time
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "bench")
+
+from fake_hw import install_shims
+
+install_shims()
+
+import uasyncio as asyncio
+from src.config import config
+from src.template import Template, MARKER_OPEN, MARKER_CLOSE
+
+TEMPLATE_PATH = "web/index.html"
+
+
+# ==================================================
+# class FakeWriter (counts writes and bytes)
+# ==================================================
+class FakeWriter:
+    def __init__(self):
+        self.writes = 0
+        self.data = bytearray()
+
+    async def awrite(self, data):
+        self.writes += 1
+        self.data += data
+
+
+# ==================================================
+# class CountingSlots (counts slot evaluations)
+# ==================================================
+class CountingSlots:
+    def __init__(self, names):
+        self.evaluations = 0
+        self.names = names
+
+    # get slot function
+    def get(self, name):
+        def slot():
+            self.evaluations += 1
+            return config.get_value(name, name)
+
+        return slot
+
+
+# legacy render: all slots are evaluated for every line, then replaced
+async def render_legacy(writer, slots):
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as file:
+        for line in file:
+            placeholders = {}
+            for name in slots.names:
+                placeholders[name] = slots.get(name)()
+            start = line.find(MARKER_OPEN.decode())
+            while start >= 0:
+                end = line.find(MARKER_CLOSE.decode(), start)
+                name = line[start + len(MARKER_OPEN) : end]
+                line = line.replace(
+                    f"{MARKER_OPEN.decode()}{name}{MARKER_CLOSE.decode()}",
+                    str(placeholders[name]),
+                )
+                start = line.find(MARKER_OPEN.decode())
+            await writer.awrite(line.encode("utf-8"))
+
+
+# measure render function
+def measure(render, slots, rounds=50):
+    writer = FakeWriter()
+    start = time.ticks_us()
+    for _ in range(rounds):
+        writer.data = bytearray()
+        asyncio.run(render(writer, slots))
+    elapsed_us = time.ticks_diff(time.ticks_us(), start)
+    return {
+        "ms/render": elapsed_us / rounds / 1000,
+        "slot calls": slots.evaluations // rounds,
+        "writes": writer.writes // rounds,
+        "bytes": len(writer.data),
+        "output": bytes(writer.data),
+    }
+
+
+# print results
+def main():
+    template = Template(TEMPLATE_PATH)
+    names = template.slot_names
+
+    legacy = measure(render_legacy, CountingSlots(names))
+    compiled = measure(
+        lambda writer, slots: template.render(writer, slots), CountingSlots(names)
+    )
+    assert legacy["output"] == compiled["output"]
+
+    print(f"template: {len(template.segments)} segments, {len(names)} slots")
+    for name, result in (("legacy (per line)", legacy), ("compiled", compiled)):
+        print(
+            f"{name:18} {result['ms/render']:8.2f} ms/render"
+            f" {result['slot calls']:6} slot calls"
+            f" {result['writes']:5} writes {result['bytes']:6} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# imports
+import sim
+
+# ==================================================
+# fake hardware for benchmarks on the host (CPython)
+# ==================================================
+
+
+# add micropython only modules and functions (see sim/)
+def install_shims():
+    sim.install_shims()
+
+
+# fake i2c bus, that counts transactions, bytes and buffer allocations
+class FakeI2C:
+    def __init__(self):
+        self.reset()
+
+    # reset counters
+    def reset(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.buffers = {}
+
+    # writeto
+    def writeto(self, addr, buf):
+        self.transactions += 1
+        self.bytes += len(buf)
+        # keep a reference, so the id() of a buffer can not be reused
+        self.buffers[id(buf)] = buf
+
+    # number of different buffer objects passed to writeto()
+    def allocations(self, preallocated=()):
+        ids = [id(buf) for buf in preallocated]
+        return len([key for key in self.buffers if key not in ids])
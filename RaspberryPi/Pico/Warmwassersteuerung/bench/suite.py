@@ -0,0 +1,536 @@
+# ==================================================
+# Benchmark suite: firmware hot paths with regression thresholds
+# ==================================================
+#
+# Runs the hot paths of the firmware and writes the results as JSON:
+#   - lcd: i2c transactions and bus bytes per frame (print_lcd() + flush),
+#     transactions of putstr()
+#   - template: get_index_html() render time, writes and bytes
+#   - config: get_*_value() and accessor lookups per second
+#   - temp: temp_sensors.read() wall time, get_temp() lookup time
+#   - http: handle_client() requests per second (GET /api/state)
+#   - main loop: heap allocated per tick (gc.mem_alloc() deltas on the device,
+#     tracemalloc on the host)
+#
+# On the host the firmware runs on the simulated board (sim/). With --device
+# the same file runs on the board through the REPL (mpremote run), the
+# project must be uploaded. The results are compared with a baseline, the
+# suite fails (exit code 1), if a count or byte metric is more than
+# --threshold percent or a timed metric more than --time-threshold percent
+# worse. timings have the noise of the machine: the best of --runs runs is
+# compared with the median run of the baseline. bench/baseline.json is a host
+# baseline, a board needs its own.
+#
+# Usage (from the project folder):
+#   python bench/suite.py                          (compare with the baseline)
+#   python bench/suite.py --output /tmp/bench.json --time-threshold 30
+#   python bench/suite.py --save-baseline          (store a new baseline)
+#   python bench/suite.py --device /dev/ttyACM0 --baseline bench/baseline_pico.json
+
+# imports
+import gc
+import sys
+import time
+
+# host (CPython): run on the simulated board
+HOST = sys.implementation.name != "micropython"
+if HOST:
+    sys.path.insert(0, ".")
+    import sim
+
+    sim.install()
+
+    # a full collection of the host heap takes milliseconds and would hide
+    # the request handling, the device only collects its small heap
+    collect_full = gc.collect
+    gc.collect = lambda generation=0: collect_full(generation)
+
+import ujson
+import uasyncio as asyncio
+
+# default paths and thresholds (percent, counts and bytes are exact, timed
+# metrics have the noise of the host)
+BASELINE_PATH = "bench/baseline.json"
+THRESHOLD = 10.0
+TIME_THRESHOLD = 50.0
+
+# units of timed metrics
+TIMED_UNITS = ("us", "ms", "1/s")
+
+# marker of the results line on the device
+RESULTS_MARKER = "BENCH_RESULTS "
+
+# request of the http benchmark
+HTTP_REQUEST = (
+    b"GET /api/state HTTP/1.1\r\n"
+    b"Host: 192.168.1.50\r\n"
+    b"User-Agent: Mozilla/5.0 (Linux; Android 13) AppleWebKit/537.36\r\n"
+    b"Accept: application/json\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+
+
+# ==================================================
+# class CountingI2C
+# ==================================================
+# passes writes to the i2c bus and counts transactions and bytes
+class CountingI2C:
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.transactions = 0
+        self.bytes = 0
+
+    def writeto(self, addr, buf, stop=True):
+        self.transactions += 1
+        self.bytes += len(buf)
+        return self.i2c.writeto(addr, buf, stop)
+
+    def reset(self):
+        self.transactions = 0
+        self.bytes = 0
+
+
+# ==================================================
+# class FakeStream
+# ==================================================
+# reader and writer of one connection (the request is read in one segment)
+class FakeStream:
+    def __init__(self, request=b""):
+        self.request = request
+        self.pos = 0
+        self.writes = 0
+        self.bytes = 0
+
+    async def readinto(self, view):
+        count = min(len(self.request) - self.pos, len(view))
+        view[:count] = self.request[self.pos : self.pos + count]
+        self.pos += count
+        return count
+
+    async def read(self, size=-1):
+        end = len(self.request) if size < 0 else self.pos + size
+        data = self.request[self.pos : end]
+        self.pos += len(data)
+        return data
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+
+    async def awrite(self, data, off=0, sz=-1):
+        self.write(data)
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 50000) if name == "peername" else default
+
+
+# ==================================================
+# measurement
+# ==================================================
+
+
+# best time of several repeats in microseconds per round (the best repeat is
+# the least disturbed by the host or the event loop, a repeat should take some
+# ten milliseconds)
+def best_time_us(function, rounds, repeats=7):
+    best = None
+    for _ in range(repeats):
+        start = time.ticks_us()
+        for _ in range(rounds):
+            function()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if best is None or elapsed < best:
+            best = elapsed
+    return max(1, best) / rounds
+
+
+# heap allocated by function in bytes (mean of rounds)
+def heap_per_call(function, rounds=10):
+    function()  # warm up (caches, interned strings)
+    if HOST:
+        import tracemalloc
+
+        tracemalloc.start()
+        total = 0
+        for _ in range(rounds):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            function()
+            total += tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        return total / rounds
+    gc.collect()
+    gc.disable()
+    try:
+        start = gc.mem_alloc()
+        for _ in range(rounds):
+            function()
+        return (gc.mem_alloc() - start) / rounds
+    finally:
+        gc.enable()
+
+
+# add metric (better: "lower" or "higher")
+def add(results, name, value, unit, better="lower"):
+    results[name] = {"value": round(value, 3), "unit": unit, "better": better}
+
+
+# ==================================================
+# benchmarks
+# ==================================================
+
+
+# lcd: transactions per frame
+def bench_lcd(results):
+    from src import lcd
+
+    if lcd.lcd is None:
+        return
+    counting_i2c = CountingI2C(lcd.lcd.i2c)
+    lcd.lcd.i2c = counting_i2c
+    lcd.init_lcd()
+    lcd.flush_lcd()
+    try:
+        # countdown line (one frame of the main loop)
+        seconds = [0]
+
+        def timer_frame():
+            seconds[0] = (seconds[0] + 1) % 60
+            lcd.print_lcd(3, 0, "Regle in:    01m {:02d}s".format(seconds[0]))
+            lcd.flush_lcd()
+
+        timer_frame()
+        counting_i2c.reset()
+        timer_frame()
+        add(results, "lcd_line_transactions", counting_i2c.transactions, "count")
+        add(results, "lcd_line_bus_bytes", counting_i2c.bytes, "bytes")
+        add(results, "lcd_line_frame_us", best_time_us(timer_frame, 200), "us")
+
+        # full screen change
+        screens = ["-", "#"]
+
+        def screen_frame():
+            screens.reverse()
+            for row in range(lcd.lcd_rows):
+                lcd.print_lcd(row, 0, screens[0] * lcd.lcd_cols)
+            lcd.flush_lcd()
+
+        screen_frame()
+        counting_i2c.reset()
+        screen_frame()
+        add(results, "lcd_screen_transactions", counting_i2c.transactions, "count")
+        add(results, "lcd_screen_bus_bytes", counting_i2c.bytes, "bytes")
+
+        # putstr() of a full screen
+        lcd.lcd.move_to(0, 0)
+        counting_i2c.reset()
+        lcd.lcd.putstr("x" * lcd.lcd_rows * lcd.lcd_cols)
+        add(results, "lcd_putstr_transactions", counting_i2c.transactions, "count")
+    finally:
+        lcd.lcd.i2c = counting_i2c.i2c
+        lcd.reset_lcd_frame()
+
+
+# template: get_index_html() render time and bytes
+def bench_template(results):
+    from src.webserver import get_index_html
+
+    writer = FakeStream()
+    asyncio.run(get_index_html(writer))
+    add(results, "template_writes", writer.writes, "count")
+    add(results, "template_bytes", writer.bytes, "bytes")
+
+    async def run(rounds):
+        for _ in range(rounds):
+            await get_index_html(FakeStream())
+
+    def render():
+        asyncio.run(run(50))
+
+    add(results, "template_render_ms", best_time_us(render, 1) / 50000, "ms")
+
+
+# config: lookups per second
+def bench_config(results):
+    from src.config import config
+
+    def lookup_keys():
+        config.get_int_value("temp_last_measurement_time")
+        config.get_int_value("temp_sampling_interval")
+        config.get_float_value("current_temp", -127.0)
+        config.get_float_value("temp_last_measurement")
+
+    measurement_time = config.int_accessor("temp_last_measurement_time")
+    sampling_interval = config.int_accessor("temp_sampling_interval")
+    current_temp = config.float_accessor("current_temp", -127.0)
+    last_measurement = config.float_accessor("temp_last_measurement")
+
+    def lookup_accessors():
+        measurement_time.get()
+        sampling_interval.get()
+        current_temp.get()
+        last_measurement.get()
+
+    # 4 lookups per round
+    value = 4000000 / best_time_us(lookup_keys, 20000)
+    add(results, "config_lookups_per_s", value, "1/s", "higher")
+    value = 4000000 / best_time_us(lookup_accessors, 20000)
+    add(results, "config_accessor_lookups_per_s", value, "1/s", "higher")
+
+
+# temp: read() wall time (conversion included) and get_temp()
+def bench_temp(results):
+    from src.temp import temp_sensors
+
+    def read():
+        asyncio.run(temp_sensors.read())
+
+    add(results, "temp_read_ms", best_time_us(read, 1, 3) / 1000, "ms")
+
+    def get_temp():
+        temp_sensors.get_temp("temp")
+
+    add(results, "temp_get_temp_us", best_time_us(get_temp, 100000), "us")
+
+
+# http: handle_client() requests per second
+def bench_http(results):
+    from src.webserver import handle_client
+
+    async def run(rounds):
+        for _ in range(rounds):
+            await handle_client(FakeStream(HTTP_REQUEST), FakeStream())
+
+    writer = FakeStream()
+    asyncio.run(handle_client(FakeStream(HTTP_REQUEST), writer))
+    add(results, "http_response_bytes", writer.bytes, "bytes")
+
+    def requests():
+        asyncio.run(run(200))
+
+    value = 200000000 / best_time_us(requests, 1)
+    add(results, "http_requests_per_s", value, "1/s", "higher")
+
+
+# main loop: heap per tick (the work of main.py for one second of countdown)
+def bench_main_loop(results):
+    from src.config import config
+    from src.functions import categorize_temp_change, show_temps, update_timer
+
+    state = {"update_time": 120}
+
+    def tick():
+        temp_change = config.get_float_value(
+            "current_temp", -127.0
+        ) - config.get_float_value("temp_last_measurement")
+        categorize_temp_change(temp_change)
+        config.set_value("temp_last_measurement_time", time.ticks_ms())
+        update_timer(state["update_time"])
+        show_temps()
+        state["update_time"] = state["update_time"] - 1 or 120
+
+    add(results, "main_tick_heap_bytes", heap_per_call(tick), "bytes")
+    add(results, "main_tick_us", best_time_us(tick, 3000), "us")
+
+
+# scheduler: dispatch of due jobs (heap push / pop and the call, no sleeping)
+def bench_scheduler(results):
+    from src.scheduler import Scheduler
+
+    def job():
+        pass
+
+    def dispatch():
+        scheduler = Scheduler()
+        for index in range(100):
+            # due in the past, but below the stall threshold of the watchdog
+            scheduler.add_once("job", job, -(index % 40))
+        scheduler.run_due()
+
+    add(results, "scheduler_dispatch_us", best_time_us(dispatch, 20) / 100, "us")
+
+
+BENCHMARKS = (
+    ("lcd", bench_lcd),
+    ("template", bench_template),
+    ("config", bench_config),
+    ("temp", bench_temp),
+    ("http", bench_http),
+    ("main_loop", bench_main_loop),
+    ("scheduler", bench_scheduler),
+)
+
+
+# run benchmarks (names: None for all)
+def run_suite(names=None):
+    results = {}
+    for name, function in BENCHMARKS:
+        if names is None or name in names:
+            gc.collect()
+            function(results)
+    return {
+        "platform": sys.platform,
+        "implementation": sys.implementation.name,
+        "results": results,
+    }
+
+
+# ==================================================
+# host: baseline and regression check
+# ==================================================
+
+
+# merge results of several runs (the best or the median value of every metric)
+def merge(runs, how="best"):
+    merged = runs[0]
+    for name, metric in merged["results"].items():
+        values = sorted(
+            results["results"][name]["value"]
+            for results in runs
+            if name in results["results"]
+        )
+        if how == "median":
+            metric["value"] = values[len(values) // 2]
+        elif metric["better"] == "higher":
+            metric["value"] = values[-1]
+        else:
+            metric["value"] = values[0]
+    merged["runs"] = len(runs)
+    return merged
+
+
+# run the suite on the device (the results line is printed by the device)
+def run_on_device(port):
+    import subprocess
+
+    output = subprocess.run(
+        ["mpremote", "connect", port, "run", __file__],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    for line in output.splitlines():
+        if line.startswith(RESULTS_MARKER):
+            return ujson.loads(line[len(RESULTS_MARKER) :])
+    raise RuntimeError("no results from the device:\n" + output)
+
+
+# compare results with the baseline (returns rows and number of regressions)
+def compare(results, baseline, threshold, time_threshold):
+    rows = []
+    regressions = 0
+    for name, metric in results["results"].items():
+        base = baseline["results"].get(name) if baseline else None
+        change = None
+        regression = False
+        if base is not None and base["value"]:
+            change = (metric["value"] - base["value"]) * 100 / abs(base["value"])
+            worse = -change if metric["better"] == "higher" else change
+            limit = time_threshold if metric["unit"] in TIMED_UNITS else threshold
+            regression = worse > limit
+        regressions += regression
+        rows.append((name, metric, base, change, regression))
+    return rows, regressions
+
+
+# print comparison
+def print_rows(rows):
+    print(f"{'metric':32} {'value':>12} {'baseline':>12} {'change':>8}")
+    for name, metric, base, change, regression in rows:
+        base_text = "-" if base is None else f"{base['value']:.1f}"
+        change_text = "-" if change is None else f"{change:+.1f}%"
+        mark = "  REGRESSION" if regression else ""
+        print(
+            f"{name:32} {metric['value']:12.1f} {base_text:>12} {change_text:>8}"
+            f" {metric['unit']}{mark}"
+        )
+
+
+# parse arguments
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="firmware benchmark suite")
+    parser.add_argument("--output", default=None, help="write results (json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline (json)")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="allowed regression of counts and bytes (%%)",
+    )
+    parser.add_argument(
+        "--time-threshold",
+        type=float,
+        default=TIME_THRESHOLD,
+        help="allowed regression of timed metrics (%%)",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="runs (the best value is kept)"
+    )
+    parser.add_argument("--device", default=None, help="serial port of the board")
+    parser.add_argument(
+        "--only", action="append", default=None, help="run only these benchmarks"
+    )
+    return parser.parse_args(argv)
+
+
+# main (host)
+def main(argv=None):
+    import os
+
+    args = parse_args(argv)
+    runs = []
+    for _ in range(max(1, args.runs)):
+        if args.device:
+            runs.append(run_on_device(args.device))
+        else:
+            runs.append(run_suite(args.only))
+    # the check uses the best run, the baseline the median run (a regression
+    # is reported, if even the best run is worse than a typical run was)
+    results = merge(runs, "median" if args.save_baseline else "best")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            ujson.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            ujson.dump(results, file, indent=2)
+        print(f"baseline saved: {args.baseline}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = ujson.load(file)
+    rows, regressions = compare(
+        results, baseline, args.threshold, args.time_threshold
+    )
+    print_rows(rows)
+    if regressions:
+        print(
+            f"{regressions} regression(s) above {args.threshold:g}%"
+            f" (timed: {args.time_threshold:g}%)"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if HOST:
+        sys.exit(main())
+    # device: print the results line for the host
+    print(RESULTS_MARKER + ujson.dumps(run_suite()))
@@ -0,0 +1,38 @@
+# ==================================================
+# Compress static web files
+# ==================================================
+#
+# Creates web/<file>.gz for every static file, which is served with
+# Content-Encoding: gzip by the webserver. Run it after changing a static
+# file and before uploading the project (index.html is a template and is not
+# compressed).
+#
+# Usage (from the project folder):
+#   python compress_web.py
+
+# imports
+import gzip
+import os
+
+WEB_PATH = "web"
+STATIC_FILES = ["styles.css"]
+
+
+# compress file (mtime=0, so the same file always gives the same etag)
+def compress_file(file_path):
+    with open(file_path, "rb") as file:
+        content = file.read()
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) >= len(content):
+        print(f"{file_path}: not compressed ({len(content)} bytes)")
+        if os.path.exists(file_path + ".gz"):
+            os.remove(file_path + ".gz")
+        return
+    with open(file_path + ".gz", "wb") as file:
+        file.write(compressed)
+    print(f"{file_path}: {len(content)} -> {len(compressed)} bytes")
+
+
+if __name__ == "__main__":
+    for file_name in STATIC_FILES:
+        compress_file(os.path.join(WEB_PATH, file_name))
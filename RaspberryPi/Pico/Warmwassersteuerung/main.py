@@ -27,17 +27,22 @@ from machine import (
 # custom imports
 from src.log import log
 from src.config import config
-from src.lcd import init_lcd
+from src.metrics import metrics
+from src.lcd import init_lcd, run_display
 from src.led import init_led
 from src.relay import init_relays
+from src.sampler import sampler
+from src.actuator import actuator
 from src.webserver import run_webserver
+from src.watchdog import timed
+from src.scheduler import scheduler
 from src.functions import (
     categorize_temp_change,
     adjust_relay_time_based_on_temp_category,
     adjust_update_time_based_on_temp_category,
-    update_temp,
+    show_temps,
+    update_temps,
     print_nominal_temp,
-    set_relay,
     open_relays,
     # check_buttons,
     update_timer,
@@ -45,6 +50,25 @@ from src.functions import (
 )
 
 
+# handle error (logs it, boots without the start delays and resets the pico)
+def handle_error(e):
+
+    # print error message
+    message = f"ERROR: main.py: {str(e)}\n"
+    print(message)
+
+    # set normal boot to False
+    config.set_value("boot_normal", 0)
+    config.save_config()
+
+    # write error.log
+    with open("/error.log", "w", encoding="utf-8") as file:
+        file.write(message)
+
+    # reset pico
+    reset()
+
+
 async def main():
     try:
         log("INFO", "main()")
@@ -66,8 +90,7 @@ async def main():
         init_relays()
 
         # update temp
-        await update_temp()
-        await update_temp(2)
+        await update_temps()
         config.set_value(
             "temp_last_measurement", config.get_float_value("current_temp", -127.0)
         )
@@ -80,11 +103,8 @@ async def main():
             # wait start 1
             await wait_start(config.get_int_value("delay_before_start_1"), "Start 1/2:")
 
-            # open relay initial
-            await set_relay(
-                config.get_int_value("RELAY_OPEN_PIN", 14),
-                config.get_int_value("init_relay_time", 5000),
-            )
+            # home valve (full close, the valve position is unknown after a reset)
+            await actuator.home()
 
             # wait start 2
             await wait_start(config.get_int_value("delay_before_start_2"), "Start 2/2:")
@@ -96,110 +116,115 @@ async def main():
         config.set_value("boot_normal", 1)
 
         # init time values
-        previous_millis = 0
-        interval = config.get_int_value("interval", 930)
+        interval = config.get_int_value("interval", 1000)
         update_time = config.get_int_value("update_time", 120)
         temp_update_interval = config.get_int_value("temp_update_interval", 5)
 
-        # ==================================================
-        # main loop
-        # ==================================================
-        log("INFO", "--------------------------")
-        log("INFO", "main loop()")
-        log("INFO", "--------------------------")
+        # typed config values (parsed once, updated on config.set_value())
+        temp_sampling_interval = config.int_accessor("temp_sampling_interval")
+        current_temp = config.float_accessor("current_temp", -127.0)
+        temp_last_measurement = config.float_accessor("temp_last_measurement")
 
-        while True:
-            current_millis = time.ticks_ms()
+        # ========================================
+        # jobs
+        # ========================================
 
-            # adjust temp category
-            if time.ticks_diff(
-                current_millis, config.get_int_value("temp_last_measurement_time")
-            ) >= config.get_int_value("temp_sampling_interval"):
+        # adjust temp category (every temp_sampling_interval milliseconds)
+        def sample():
 
-                # update temp
-                await update_temp()
-                temp_change = config.get_float_value(
-                    "current_temp", -127.0
-                ) - config.get_float_value("temp_last_measurement")
+            # latest temp of the sampler
+            temp_change = current_temp.get() - temp_last_measurement.get()
 
-                # categorize temp change
-                _ = categorize_temp_change(temp_change)
+            # categorize temp change
+            _ = categorize_temp_change(temp_change)
 
-                # update last measurement temp
-                config.set_value(
-                    "temp_last_measurement",
-                    config.get_float_value("current_temp", -127.0),
-                )
+            # update last measurement temp
+            config.set_value("temp_last_measurement", current_temp.get())
 
-                # update last measurement temp time
-                config.set_value("temp_last_measurement_time", current_millis)
+            # update last measurement temp time
+            config.set_value("temp_last_measurement_time", time.ticks_ms())
 
-                # release memory
-                gc.collect()
+            # apply a changed sampling interval from the next run
+            sample_job.period_ms = max(1, temp_sampling_interval.get())
 
-            # main
-            if time.ticks_diff(current_millis, previous_millis) > interval:
+            # release memory
+            metrics.collect()
 
-                if update_time > 0:
-                    # update timer
-                    update_timer(update_time)
+        # count down to the next regulation (every interval milliseconds)
+        def countdown():
+            nonlocal update_time
 
-                    # update temp on temp update interval
-                    if update_time % temp_update_interval == 0:
-                        await update_temp()
-                        await update_temp(2)
+            if update_time > 0:
+                # update timer
+                update_timer(update_time)
 
-                    update_time -= 1
+                # update temp on temp update interval
+                if update_time % temp_update_interval == 0:
+                    show_temps()
 
-                    # # check buttons
-                    # await check_buttons()
+                update_time -= 1
 
-                    # print mem alloc
-                    log("VERBOSE", "mem_alloc(): {} Bytes".format(gc.mem_alloc()))
+                # # check buttons
+                # await check_buttons()
 
-                else:
+                # print mem alloc
+                log("VERBOSE", "mem_alloc(): {} Bytes", gc.mem_alloc())
 
-                    # update temp
-                    await update_temp()
-                    await update_temp(2)
+                # last tick: regulate one interval later
+                if update_time <= 0:
+                    countdown_job.cancel()
+                    scheduler.add_once("regulation", regulate, interval)
 
-                    # set and adjust relay_time based on temp category
-                    relay_time = adjust_relay_time_based_on_temp_category()
+            else:
+                # regulate now (update_time was 0 from the start)
+                countdown_job.cancel()
+                scheduler.add_once("regulation", regulate)
 
-                    # set and adjust update_time based on temp category
-                    update_time = adjust_update_time_based_on_temp_category()
+            config.set_value("previous_millis", time.ticks_ms())
 
-                    # open relays
-                    await open_relays(relay_time)
+        # regulate (a new countdown starts, when the relays are done)
+        async def regulate():
+            nonlocal update_time, countdown_job
 
-                    # create config backup
-                    config.create_config_backup()
+            # wait for a fresh temp
+            await update_temps()
 
-                    # print allocated memory
-                    log("INFO", "gc.mem_alloc(): {} Bytes".format(gc.mem_alloc()))
+            # set and adjust relay_time based on temp category
+            relay_time = adjust_relay_time_based_on_temp_category()
 
-                # update previous millis
-                previous_millis = current_millis
-                config.set_value("previous_millis", previous_millis)
+            # set and adjust update_time based on temp category
+            update_time = adjust_update_time_based_on_temp_category()
 
-            await asyncio.sleep(0.1)
+            # open relays
+            await open_relays(relay_time)
 
-    except Exception as e:
+            # create config backup
+            scheduler.add_once("config_backup", backup_config)
 
-        # print error message
-        message = f"ERROR: main.py: {str(e)}\n"
-        print(message)
+            # restart countdown
+            countdown_job = scheduler.add_periodic("countdown", countdown, interval, 0)
 
-        # set normal boot to False
-        config.set_value("boot_normal", 0)
-        config.save_config()
+        # create config backup
+        def backup_config():
+            config.create_config_backup()
 
-        # write error.log
-        with open("/error.log", "w", encoding="utf-8") as file:
-            file.write(message)
+            # print allocated memory
+            log("INFO", "gc.mem_alloc(): {} Bytes", gc.mem_alloc())
 
-        # reset pico
-        reset()
+        # ==================================================
+        # main loop
+        # ==================================================
+        log("INFO", "--------------------------")
+        log("INFO", "main loop()")
+        log("INFO", "--------------------------")
+
+        sample_job = scheduler.add_periodic(
+            "sampling", sample, max(1, temp_sampling_interval.get()), 0
+        )
+        countdown_job = scheduler.add_periodic("countdown", countdown, interval, 0)
+
+    except Exception as e:
+        handle_error(e)
 
 
 if __name__ == "__main__":
@@ -210,10 +235,26 @@ if __name__ == "__main__":
     loop = asyncio.get_event_loop()
 
     # run webserver() as task
-    loop.create_task(run_webserver())
+    loop.create_task(timed("webserver", run_webserver()))
+
+    # run run_display() as task
+    loop.create_task(timed("display", run_display()))
+
+    # run sampler.run() as task
+    loop.create_task(timed("sampler", sampler.run()))
+
+    # run scheduler.run() as task (runs the jobs of main(), errors reset the pico)
+    scheduler.on_error = handle_error
+    loop.create_task(timed("scheduler", scheduler.run()))
+
+    # run actuator.run() as task (owns the relays)
+    loop.create_task(timed("actuator", actuator.run()))
+
+    # run config.run_save_task() as task
+    loop.create_task(timed("config_save", config.run_save_task()))
 
     # run main() as task
-    loop.create_task(main())
+    loop.create_task(timed("main", main()))
 
     # run event loop forever
     loop.run_forever()
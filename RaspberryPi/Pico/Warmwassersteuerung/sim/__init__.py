@@ -0,0 +1,64 @@
+# ==================================================
+# Hardware simulator
+# ==================================================
+#
+# Stand-ins for the micropython modules (machine, onewire, ds18x20, network,
+# uasyncio, ujson and the time/gc extensions), so main.py and webserver.py run
+# unchanged under CPython. The board wiring (lcd, temp sensors, relays) is
+# read from config.json, the temp sensors measure a thermal plant model, that
+# is driven by the relay pins.
+#
+# Usage (from the project folder):
+#   python -m sim.run --port 8080
+#   python -m sim.scenario --hours 24   (virtual time, see sim/scenario.py)
+#
+# or in a script (before the firmware is imported):
+#   import sim
+#   sim.install(flash_dir)
+
+# imports
+import sys
+
+
+# ==================================================
+# class SimReset
+# ==================================================
+# raised by machine.reset(). it is no Exception, so the firmware does not catch
+# it, and no SystemExit, so asyncio keeps it in the task and the loop stops.
+class SimReset(BaseException):
+    pass
+
+
+from sim import clock, flash  # noqa: E402
+
+
+# install micropython only modules and functions (without the hardware)
+def install_shims():
+    if sys.implementation.name == "micropython":
+        return
+    import json
+
+    from sim import uasyncio
+
+    clock.install()
+    sys.modules.setdefault("ujson", json)
+    sys.modules.setdefault("uasyncio", uasyncio)
+
+
+# install all modules and the board (flash_dir is the root "/" of the firmware,
+# virtual_time runs the event loop and the plant on a virtual clock)
+def install(flash_dir=None, project_dir=".", virtual_time=False):
+    from sim import board, ds18x20, machine, network, onewire
+
+    if virtual_time:
+        from sim import virtual_time as virtual_time_module
+
+        virtual_time_module.install()
+    install_shims()
+    flash.install(flash_dir, project_dir)
+    sys.modules["machine"] = machine
+    sys.modules["onewire"] = onewire
+    sys.modules["ds18x20"] = ds18x20
+    sys.modules["network"] = network
+    board.setup(flash.load_settings())
+    return board.board
@@ -0,0 +1,78 @@
+# ==================================================
+# board
+# ==================================================
+# wires the simulated parts like config.json: lcd at LCD_ADDR, temp sensors
+# (temp_sensors or TEMP_SENSOR_PIN / TEMP_SENSOR_2_PIN) and the relay pins,
+# which drive the plant. "temp" measures the outlet, "temp_2" the supply.
+
+# imports
+import binascii
+
+from sim import machine, onewire
+from sim.ds18x20 import SimDS18B20, make_rom
+from sim.lcd import HD44780
+from sim.plant import ThermalPlant
+
+# board instance (created by setup())
+board = None
+
+
+# ==================================================
+# class Board
+# ==================================================
+class Board:
+    def __init__(self, settings, plant=None):
+        self.settings = settings
+        self.plant = plant or ThermalPlant(
+            travel_time=settings.get("valve_travel_time", 120000) / 1000
+        )
+
+        # lcd
+        self.lcd = HD44780(settings.get("LCD_ROWS", 4), settings.get("LCD_COLS", 20))
+        lcd_addr = int(str(settings.get("LCD_ADDR", "0x27")), 16)
+        machine.i2c_devices[lcd_addr] = self.lcd
+
+        # relays
+        self.relay_open_pin = settings.get("RELAY_OPEN_PIN", 14)
+        self.relay_close_pin = settings.get("RELAY_CLOSE_PIN", 15)
+        machine.add_pin_listener(
+            self.relay_open_pin, lambda value: self.plant.set_relays(relay_open=value)
+        )
+        machine.add_pin_listener(
+            self.relay_close_pin, lambda value: self.plant.set_relays(relay_close=value)
+        )
+
+        # temp sensors
+        self.sensors = {}
+        for serial, (name, pin_id, rom) in enumerate(self.get_sensor_wiring()):
+            read_function = self.plant.get_outlet_temp
+            if name == "temp_2":
+                read_function = self.plant.get_supply_temp
+            sensor = SimDS18B20(rom or make_rom(serial + 1), read_function)
+            onewire.attach(pin_id, sensor)
+            self.sensors[name] = sensor
+
+    # get sensors (name, pin, rom) like src/temp.py
+    def get_sensor_wiring(self):
+        wiring = self.settings.get("temp_sensors") or "temp:{},temp_2:{}".format(
+            self.settings.get("TEMP_SENSOR_PIN", 22),
+            self.settings.get("TEMP_SENSOR_2_PIN", 26),
+        )
+        sensors = []
+        for entry in wiring.split(","):
+            parts = entry.strip().split(":")
+            rom = binascii.unhexlify(parts[2]) if len(parts) > 2 else None
+            sensors.append((parts[0], int(parts[1]), rom))
+        return sensors
+
+    # get lcd lines
+    def get_lcd_lines(self):
+        return self.lcd.get_lines()
+
+
+# set up the board (once, a simulated reset keeps it)
+def setup(settings, plant=None):
+    global board
+    if board is None:
+        board = Board(settings, plant)
+    return board
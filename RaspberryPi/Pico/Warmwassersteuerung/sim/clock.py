@@ -0,0 +1,172 @@
+# imports
+import gc
+import heapq
+import sys
+import threading
+import time
+
+# micropython ticks wrap around (like on the rp2040 and esp32)
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF_PERIOD = TICKS_PERIOD // 2
+
+# simulated heap size for gc.mem_free()
+HEAP_SIZE = 192 * 1024
+
+
+# ==================================================
+# class RealClock
+# ==================================================
+# host time (time.monotonic_ns). timers run in threads, like irqs, that do not
+# depend on the event loop.
+class RealClock:
+    # get time in microseconds
+    def now_us(self):
+        return time.monotonic_ns() // 1000
+
+    # blocking sleep
+    def sleep_us(self, us):
+        if us > 0:
+            time.sleep(us / 1000000)
+
+    # call function after delay_us (returns an object with cancel())
+    def call_later(self, delay_us, function):
+        timer = threading.Timer(delay_us / 1000000, function)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+# ==================================================
+# class VirtualTimer
+# ==================================================
+class VirtualTimer:
+    def __init__(self, when_us, function):
+        self.when_us = when_us
+        self.function = function
+        self.cancelled = False
+
+    # cancel timer
+    def cancel(self):
+        self.cancelled = True
+
+
+# ==================================================
+# class VirtualClock
+# ==================================================
+# simulated time in microseconds. it only advances, when the event loop has
+# nothing to do (see sim/virtual_time.py) or on blocking sleeps. timers are
+# called in order of their deadline, from advance_to().
+class VirtualClock:
+    def __init__(self, start_us=0):
+        self.now = start_us
+        self.timers = []  # heap of (when_us, sequence, VirtualTimer)
+        self.sequence = 0
+
+    # get time in microseconds
+    def now_us(self):
+        return self.now
+
+    # blocking sleep (the time passes at once, timers are called on the way)
+    def sleep_us(self, us):
+        self.advance_to(self.now + max(0, int(us)))
+
+    # call function after delay_us
+    def call_later(self, delay_us, function):
+        timer = VirtualTimer(self.now + max(0, int(delay_us)), function)
+        self.sequence += 1
+        heapq.heappush(self.timers, (timer.when_us, self.sequence, timer))
+        return timer
+
+    # get deadline of the next timer (None, if there is none)
+    def get_next_timer(self):
+        while self.timers and self.timers[0][2].cancelled:
+            heapq.heappop(self.timers)
+        return self.timers[0][0] if self.timers else None
+
+    # advance to when_us and call all timers until then (returns the number of
+    # called timers)
+    def advance_to(self, when_us):
+        called = 0
+        while True:
+            next_timer = self.get_next_timer()
+            if next_timer is None or next_timer > when_us:
+                break
+            timer = heapq.heappop(self.timers)[2]
+            self.now = max(self.now, timer.when_us)
+            timer.function()
+            called += 1
+        self.now = max(self.now, when_us)
+        return called
+
+
+# current clock (replaced by a virtual clock for simulated time)
+current = RealClock()
+
+
+# set clock
+def set_clock(clock):
+    global current
+    current = clock
+
+
+# get time in seconds (float, for the plant model)
+def now():
+    return current.now_us() / 1000000
+
+
+# ticks in microseconds
+def ticks_us():
+    return current.now_us() & TICKS_MAX
+
+
+# ticks in milliseconds
+def ticks_ms():
+    return (current.now_us() // 1000) & TICKS_MAX
+
+
+# ticks difference (signed, handles the wrap around)
+def ticks_diff(new, old):
+    return ((new - old + TICKS_HALF_PERIOD) & TICKS_MAX) - TICKS_HALF_PERIOD
+
+
+# add delta to ticks
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+# blocking sleeps
+def sleep_ms(ms):
+    current.sleep_us(ms * 1000)
+
+
+def sleep_us(us):
+    current.sleep_us(us)
+
+
+# allocated blocks of the host, before the firmware was loaded (see install())
+base_blocks = 0
+
+
+# allocated heap (blocks of the host allocator since install(), 16 bytes each)
+def mem_alloc():
+    return max(0, sys.getallocatedblocks() - base_blocks) * 16
+
+
+# free heap of the simulated heap size
+def mem_free():
+    return max(0, HEAP_SIZE - mem_alloc())
+
+
+# add the micropython functions to the time and gc modules
+def install():
+    global base_blocks
+    base_blocks = sys.getallocatedblocks()
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
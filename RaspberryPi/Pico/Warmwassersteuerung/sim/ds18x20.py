@@ -0,0 +1,95 @@
+# ==================================================
+# ds18x20
+# ==================================================
+# DS18X20 driver on the simulated OneWire bus and the simulated DS18B20
+
+# imports
+from sim import clock
+from sim.onewire import OneWireError, crc8
+
+# conversion time in seconds per resolution
+CONVERSION_TIMES = {9: 0.09375, 10: 0.1875, 11: 0.375, 12: 0.75}
+
+# temp after power on (before the first conversion)
+POWER_ON_TEMP = 85.0
+
+
+# make rom of a DS18B20 (family code 0x28, serial number, crc)
+def make_rom(serial):
+    rom = bytes([0x28]) + serial.to_bytes(6, "little")
+    return rom + bytes([crc8(rom)])
+
+
+# ==================================================
+# class SimDS18B20
+# ==================================================
+# one sensor. read_function() returns the temp at the sensor (e.g. from the
+# plant model). faults: connected = False (no answer) or crc_errors > 0 (the
+# next reads fail)
+class SimDS18B20:
+    def __init__(self, rom, read_function):
+        self.rom = bytes(rom)
+        self.read_function = read_function
+        self.resolution = 12
+        self.temp = POWER_ON_TEMP
+        self.conversion = None  # (start time, temp)
+        self.connected = True
+        self.crc_errors = 0
+        self.conversions = 0
+
+    # start conversion
+    def convert(self):
+        self.conversions += 1
+        self.conversion = (clock.now(), self.read_function())
+
+    # read temp (the new temp is only ready after the conversion time)
+    def read(self):
+        if self.crc_errors > 0:
+            self.crc_errors -= 1
+            raise Exception("CRC error")
+        if self.conversion is not None:
+            start, temp = self.conversion
+            if clock.now() - start >= CONVERSION_TIMES[self.resolution]:
+                step = 0.5 / (1 << (self.resolution - 9))
+                self.temp = round(temp / step) * step
+                self.conversion = None
+        return self.temp
+
+    # write configuration register (resolution)
+    def write_scratch(self, buf):
+        self.resolution = 9 + ((buf[2] >> 5) & 0x03)
+
+
+# ==================================================
+# class DS18X20
+# ==================================================
+class DS18X20:
+    def __init__(self, onewire):
+        self.ow = onewire
+
+    # scan roms of temp sensors
+    def scan(self):
+        return [rom for rom in self.ow.scan() if rom[0] in (0x10, 0x22, 0x28)]
+
+    # start conversion on all sensors (skip rom)
+    def convert_temp(self):
+        self.ow.reset(True)
+        for device in self.ow.get_devices():
+            device.convert()
+
+    # get device (a missing device reads as 0xff, which fails the crc check)
+    def get_device(self, rom):
+        self.ow.reset(True)
+        device = self.ow.get_device(rom)
+        if device is None:
+            raise Exception("CRC error")
+        return device
+
+    # write scratchpad (th, tl, config)
+    def write_scratch(self, rom, buf):
+        self.get_device(rom).write_scratch(buf)
+
+    # read temp
+    def read_temp(self, rom):
+        return self.get_device(rom).read()
+
@@ -0,0 +1,106 @@
+# ==================================================
+# flash file system
+# ==================================================
+# the firmware uses absolute paths ("/config.json", "/web/index.html"). they
+# are mapped into a flash folder on the host. firmware modules (src.*) get an
+# open(), that maps the paths, the rest of python is not affected.
+
+# imports
+import atexit
+import builtins
+import importlib.machinery
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# files and folders, which are copied into a new flash folder
+FLASH_FILES = ["config.json", "web"]
+
+# flash folder (root "/" of the firmware)
+flash_dir = None
+
+
+# map a firmware path to the host
+def get_path(path):
+    if not isinstance(path, str):
+        return path
+    return os.path.join(flash_dir, path.lstrip("/"))
+
+
+# open() for the firmware
+def flash_open(path, *args, **kwargs):
+    return builtins.open(get_path(path), *args, **kwargs)
+
+
+# ==================================================
+# class FirmwareFinder
+# ==================================================
+# imports the firmware modules (src.*) with flash_open() as their open()
+class FirmwareFinder:
+    # find spec
+    def find_spec(self, name, path=None, target=None):
+        if name != "src" and not name.startswith("src."):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        if spec is not None and spec.loader is not None:
+            spec.loader = FirmwareLoader(spec.loader)
+        return spec
+
+
+# ==================================================
+# class FirmwareLoader
+# ==================================================
+class FirmwareLoader:
+    def __init__(self, loader):
+        self.loader = loader
+
+    # create module
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    # execute module with flash_open()
+    def exec_module(self, module):
+        module.open = flash_open
+        self.loader.exec_module(module)
+
+    # other loader functions
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+# create flash folder (a temporary folder, that is removed at exit, if
+# directory is None)
+def install(directory=None, project_dir="."):
+    global flash_dir
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="sim_flash_")
+        atexit.register(shutil.rmtree, directory, True)
+    os.makedirs(directory, exist_ok=True)
+    for name in FLASH_FILES:
+        source = os.path.join(project_dir, name)
+        target = os.path.join(directory, name)
+        if os.path.exists(target):
+            continue
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        else:
+            shutil.copy(source, target)
+    flash_dir = directory
+    if not any(isinstance(finder, FirmwareFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, FirmwareFinder())
+    return directory
+
+
+# load settings of config.json (for the board wiring)
+def load_settings():
+    with builtins.open(get_path("/config.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+# unload firmware modules (a simulated reset imports them again)
+def unload_firmware():
+    for name in list(sys.modules):
+        if name == "src" or name.startswith("src."):
+            del sys.modules[name]
@@ -0,0 +1,150 @@
+# ==================================================
+# HD44780 lcd behind a PCF8574 i2c expander
+# ==================================================
+# decodes the nibble stream of the PCF8574 (P0 = RS, P2 = E, P3 = backlight,
+# P4-P7 = D4-D7) back into commands and data and keeps the display ram, so
+# the screen contents can be read as text.
+
+MASK_RS = 0x01
+MASK_E = 0x04
+MASK_BACKLIGHT = 0x08
+SHIFT_DATA = 4
+
+# characters of the HD44780A00 rom, that differ from latin-1
+ROM_CHARS = {
+    0x5C: "¥",
+    0x7E: "→",
+    0x7F: "←",
+    0xDF: "°",
+    0xE1: "ä",
+    0xE2: "ß",
+    0xEF: "ö",
+    0xF5: "ü",
+}
+
+# custom characters of the firmware (cgram bitmap -> text)
+CUSTOM_CHARS = {
+    (0b00100, 0b01110, 0b11111, 0b00100, 0b00100, 0b00100, 0b00100, 0b00100): "↑",
+    (0b00100, 0b00100, 0b00100, 0b00100, 0b00100, 0b11111, 0b01110, 0b00100): "↓",
+}
+
+
+# ==================================================
+# class HD44780
+# ==================================================
+class HD44780:
+    def __init__(self, rows=4, cols=20):
+        self.rows = rows
+        self.cols = cols
+        self.ddram = bytearray(b" " * 0x80)
+        self.cgram = bytearray(64)
+        self.address = 0
+        self.cgram_mode = False  # data goes to the cgram
+        self.increment = True
+        self.display_on = False
+        self.backlight = False
+        self.four_bit = False
+        self.high_nibble = None  # first nibble of a byte in 4 bit mode
+        self.last_port = 0
+        self.commands = 0
+        self.data_bytes = 0
+        self.listeners = []  # function(lines), called after data was written
+
+    # i2c write (every byte is one PCF8574 port state)
+    def writeto(self, buf):
+        changed = False
+        for port in buf:
+            self.backlight = bool(port & MASK_BACKLIGHT)
+            # latched on the falling edge of E
+            if self.last_port & MASK_E and not port & MASK_E:
+                changed |= self.latch(self.last_port)
+            self.last_port = port
+        if changed and self.listeners:
+            lines = self.get_lines()
+            for function in self.listeners:
+                function(lines)
+
+    # latch nibble (returns True, if the display ram changed)
+    def latch(self, port):
+        nibble = (port >> SHIFT_DATA) & 0x0F
+        rs = port & MASK_RS
+        if not self.four_bit:
+            # 8 bit mode (init): only the high nibble is connected
+            return self.execute(rs, nibble << 4)
+        if self.high_nibble is None:
+            self.high_nibble = nibble
+            return False
+        byte = (self.high_nibble << 4) | nibble
+        self.high_nibble = None
+        return self.execute(rs, byte)
+
+    # execute command or write data
+    def execute(self, rs, byte):
+        if rs:
+            self.data_bytes += 1
+            return self.write_data(byte)
+        self.commands += 1
+        if byte & 0x80:  # set ddram address
+            self.address = byte & 0x7F
+            self.cgram_mode = False
+        elif byte & 0x40:  # set cgram address
+            self.address = byte & 0x3F
+            self.cgram_mode = True
+        elif byte & 0x20:  # function set
+            self.four_bit = not byte & 0x10
+            self.high_nibble = None
+        elif byte & 0x08:  # display control
+            self.display_on = bool(byte & 0x04)
+        elif byte & 0x04:  # entry mode
+            self.increment = bool(byte & 0x02)
+        elif byte & 0x02:  # home
+            self.address = 0
+            self.cgram_mode = False
+        elif byte & 0x01:  # clear
+            self.ddram[:] = b" " * len(self.ddram)
+            self.address = 0
+            self.cgram_mode = False
+            return True
+        return False
+
+    # write data to the ddram or cgram
+    def write_data(self, byte):
+        step = 1 if self.increment else -1
+        if self.cgram_mode:
+            self.cgram[self.address] = byte & 0x1F
+            self.address = (self.address + step) & 0x3F
+            return False
+        self.ddram[self.address] = byte
+        address = self.address + step
+        # 2 line mode: 0x00-0x27 and 0x40-0x67
+        if address == 0x28:
+            address = 0x40
+        elif address == 0x68:
+            address = 0x00
+        elif address < 0:
+            address = 0x67
+        self.address = address
+        return True
+
+    # get text of a character code
+    def get_char(self, code):
+        if code < 8:
+            glyph = tuple(self.cgram[code * 8 : code * 8 + 8])
+            return CUSTOM_CHARS.get(glyph, "?")
+        return ROM_CHARS.get(code, chr(code))
+
+    # get ddram address of a row
+    def get_row_address(self, row):
+        address = 0x40 if row & 1 else 0
+        if row & 2:
+            address += self.cols
+        return address
+
+    # get screen contents
+    def get_lines(self):
+        lines = []
+        for row in range(self.rows):
+            address = self.get_row_address(row)
+            codes = self.ddram[address : address + self.cols]
+            lines.append("".join(self.get_char(code) for code in codes))
+        return lines
@@ -0,0 +1,230 @@
+# ==================================================
+# machine
+# ==================================================
+# Pin, I2C, Timer and the irq functions of micropython. pins are shared by id,
+# the board listens to pin changes (relays drive the thermal plant).
+
+# imports
+import threading
+
+from sim import SimReset, clock, uasyncio
+
+# lock for disable_irq() (timer callbacks run with the lock held)
+irq_lock = threading.RLock()
+
+# pin id -> {"value", "mode", "listeners"}
+pins = {}
+
+# i2c address -> device with writeto(buf) (set by the board)
+i2c_devices = {}
+
+
+# get pin state
+def get_pin(pin_id):
+    if pin_id not in pins:
+        pins[pin_id] = {"value": 0, "mode": None, "listeners": []}
+    return pins[pin_id]
+
+
+# call function(value) on every change of a pin
+def add_pin_listener(pin_id, function):
+    get_pin(pin_id)["listeners"].append(function)
+
+
+# reset all pins (simulated reset, the listeners stay)
+def reset_pins():
+    for state in pins.values():
+        set_pin_value(state, 0)
+        state["mode"] = None
+
+
+# set value and notify the listeners
+def set_pin_value(state, value):
+    value = 1 if value else 0
+    if state["value"] == value:
+        return
+    state["value"] = value
+    for function in state["listeners"]:
+        function(value)
+
+
+# ==================================================
+# class Pin
+# ==================================================
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, pin_id, mode=-1, pull=-1, value=None):
+        self.id = pin_id
+        self.state = get_pin(pin_id)
+        self.init(mode, pull, value)
+
+    # init pin
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self.state["mode"] = mode
+        if value is not None:
+            self.value(value)
+
+    # get or set value
+    def value(self, value=None):
+        if value is None:
+            return self.state["value"]
+        with irq_lock:
+            set_pin_value(self.state, value)
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    # irq (buttons are not simulated)
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        return None
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+# ==================================================
+# class I2C
+# ==================================================
+# writes go to the simulated devices, missing devices raise OSError like the
+# hardware (EIO)
+class I2C:
+    def __init__(self, i2c_id=0, scl=None, sda=None, freq=400000):
+        self.id = i2c_id
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0
+
+    # get device
+    def get_device(self, addr):
+        if addr not in i2c_devices:
+            raise OSError(5, "EIO")
+        return i2c_devices[addr]
+
+    # write buffer to device
+    def writeto(self, addr, buf, stop=True):
+        device = self.get_device(addr)
+        self.transactions += 1
+        self.bytes += len(buf)
+        device.writeto(bytes(buf))
+        return len(buf)
+
+    # read from device (the lcd has nothing to read)
+    def readfrom(self, addr, nbytes, stop=True):
+        self.get_device(addr)
+        return bytes(nbytes)
+
+    # scan addresses
+    def scan(self):
+        return sorted(i2c_devices)
+
+
+# ==================================================
+# class Timer
+# ==================================================
+# the callback runs from the clock (a thread with the real clock, the event loop
+# with the virtual clock), with the irq lock held
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id=-1, **kwargs):
+        self.id = timer_id
+        self.handle = None
+        self.generation = 0
+        if kwargs:
+            self.init(**kwargs)
+
+    # start timer
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        self.deinit()
+        if freq > 0:
+            period = 1000 / freq
+        self.mode = mode
+        self.period_us = int(period * 1000)
+        self.callback = callback
+        self.schedule(self.generation)
+
+    # schedule next callback
+    def schedule(self, generation):
+        self.handle = clock.current.call_later(
+            self.period_us, lambda: self.fire(generation)
+        )
+
+    # run callback (ignored, if the timer was stopped or started again)
+    def fire(self, generation):
+        with irq_lock:
+            if generation != self.generation:
+                return
+            if self.mode == Timer.PERIODIC:
+                self.schedule(generation)
+            else:
+                self.handle = None
+            if self.callback is not None:
+                self.callback(self)
+
+    # stop timer
+    def deinit(self):
+        self.generation += 1
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+
+# disable irqs (timer callbacks wait until enable_irq())
+def disable_irq():
+    irq_lock.acquire()
+    return 0
+
+
+# enable irqs
+def enable_irq(state=0):
+    irq_lock.release()
+
+
+# ==================================================
+# reset
+# ==================================================
+# reset() stops the event loop, the runner starts the firmware again
+reset_requested = False
+
+
+# reset
+def reset():
+    global reset_requested
+    reset_requested = True
+    uasyncio.get_event_loop().stop()
+    raise SimReset("machine.reset()")
+
+
+# soft reset
+def soft_reset():
+    reset()
+
+
+# cpu frequency
+def freq(hz=None):
+    return 125000000
+
+
+# unique id
+def unique_id():
+    return b"\xe6\x61\x41\x04\x03\x2b\x5a\x2e"
+
+
+# idle
+def idle():
+    clock.sleep_us(100)
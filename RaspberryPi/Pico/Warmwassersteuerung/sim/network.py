@@ -0,0 +1,90 @@
+# ==================================================
+# network
+# ==================================================
+# WLAN, that connects after a short time (connect_time) to any ssid
+
+# imports
+from sim import clock
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+# seconds until a connection is established
+connect_time = 1.5
+
+# ip configuration (ip, subnet, gateway, dns)
+IFCONFIG = ("127.0.0.1", "255.255.255.0", "127.0.0.1", "127.0.0.1")
+
+# country code
+_country = "XX"
+
+
+# get or set the country code
+def country(code=None):
+    global _country
+    if code is None:
+        return _country
+    _country = code
+
+
+# ==================================================
+# class WLAN
+# ==================================================
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self.is_active = False
+        self.ssid = None
+        self.connect_start = None
+
+    # get or set active
+    def active(self, is_active=None):
+        if is_active is None:
+            return self.is_active
+        self.is_active = bool(is_active)
+        if not self.is_active:
+            self.connect_start = None
+
+    # connect
+    def connect(self, ssid=None, key=None, **kwargs):
+        if not self.is_active:
+            raise OSError("wifi not active")
+        self.ssid = ssid
+        self.connect_start = clock.now()
+
+    # disconnect
+    def disconnect(self):
+        self.connect_start = None
+
+    # status
+    def status(self, param=None):
+        if param == "rssi":
+            return -55
+        if self.connect_start is None:
+            return STAT_IDLE
+        if clock.now() - self.connect_start < connect_time:
+            return STAT_CONNECTING
+        return STAT_GOT_IP
+
+    # connected
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    # ip configuration
+    def ifconfig(self, config=None):
+        return IFCONFIG
+
+    # get config value
+    def config(self, *args, **kwargs):
+        if args == ("mac",):
+            return b"\x28\xcd\xc1\x00\x00\x01"
+        if args == ("essid",) or args == ("ssid",):
+            return self.ssid
+        return None
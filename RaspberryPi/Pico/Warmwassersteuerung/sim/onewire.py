@@ -0,0 +1,79 @@
+# ==================================================
+# onewire
+# ==================================================
+# OneWire bus of a pin. the devices are simulated on the transaction level
+# (scan, convert, scratchpad), not bit by bit.
+
+# imports
+from sim import machine
+
+# pin id -> list of devices
+buses = {}
+
+
+# ==================================================
+# class OneWireError
+# ==================================================
+class OneWireError(Exception):
+    pass
+
+
+# get devices of a pin (without devices, that are disconnected)
+def get_devices(pin_id):
+    return [device for device in buses.get(pin_id, []) if device.connected]
+
+
+# attach device to a pin
+def attach(pin_id, device):
+    buses.setdefault(pin_id, []).append(device)
+
+
+# dallas crc8
+def crc8(data):
+    crc = 0
+    for byte in data:
+        for _ in range(8):
+            mix = (crc ^ byte) & 0x01
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            byte >>= 1
+    return crc
+
+
+# ==================================================
+# class OneWire
+# ==================================================
+class OneWire:
+    SEARCH_ROM = 0xF0
+    MATCH_ROM = 0x55
+    SKIP_ROM = 0xCC
+
+    def __init__(self, pin):
+        self.pin_id = pin.id if isinstance(pin, machine.Pin) else pin
+
+    # get devices on the bus
+    def get_devices(self):
+        return get_devices(self.pin_id)
+
+    # reset (presence pulse, if there is at least one device)
+    def reset(self, required=False):
+        present = bool(self.get_devices())
+        if required and not present:
+            raise OneWireError
+        return present
+
+    # scan roms
+    def scan(self):
+        return [bytearray(device.rom) for device in self.get_devices()]
+
+    # get device by rom (None, if it does not answer)
+    def get_device(self, rom):
+        for device in self.get_devices():
+            if device.rom == bytes(rom):
+                return device
+        return None
+
+    @staticmethod
+    def crc8(data):
+        return crc8(data)
@@ -0,0 +1,120 @@
+# ==================================================
+# thermal plant
+# ==================================================
+# mixing valve between the supply (boiler) and cold water. the valve motor is
+# driven by the relays: open = more cold water, close = more hot water. the
+# sensor at the outlet follows the mixed temp with a first order lag.
+#
+#   mixed temp = supply temp - (supply temp - cold temp) * position / 100
+
+# imports
+import math
+import threading
+
+from sim import clock
+
+# maximum integration step in seconds
+PLANT_STEP = 0.5
+
+
+# ==================================================
+# class ThermalPlant
+# ==================================================
+class ThermalPlant:
+    def __init__(
+        self,
+        travel_time=120.0,  # seconds from closed to open
+        position=50.0,  # % open
+        supply_temp=65.0,
+        supply_swing=5.0,  # amplitude of the supply temp
+        supply_period=6 * 3600.0,  # period of the supply temp in seconds
+        cold_temp=12.0,
+        time_constant=60.0,  # lag of the outlet temp in seconds
+    ):
+        self.travel_time = travel_time
+        self.position = position
+        self.supply_temp = supply_temp
+        self.supply_swing = supply_swing
+        self.supply_period = supply_period
+        self.cold_temp = cold_temp
+        self.time_constant = time_constant
+        self.lock = threading.RLock()
+        self.relay_open = 0
+        self.relay_close = 0
+        self.motor = 0  # +1 opening, -1 closing
+        self.start = clock.now()
+        self.last_update = self.start
+        self.outlet_temp = self.get_mixed_temp(self.start)
+
+        # statistics
+        self.motor_time = 0.0  # seconds the motor ran
+        self.end_stop_time = 0.0  # seconds the motor ran against an end stop
+        self.both_relays = 0  # both relays energized (interlock violation)
+
+    # get supply temp at time t
+    def get_supply_temp(self, t=None):
+        if t is None:
+            t = clock.now()
+        phase = 2 * math.pi * (t - self.start) / self.supply_period
+        return self.supply_temp + self.supply_swing * math.sin(phase)
+
+    # get mixed temp at time t
+    def get_mixed_temp(self, t):
+        supply_temp = self.get_supply_temp(t)
+        return supply_temp - (supply_temp - self.cold_temp) * self.position / 100
+
+    # integrate until now
+    def update(self, now=None):
+        with self.lock:
+            if now is None:
+                now = clock.now()
+            t = self.last_update
+            while t < now:
+                step = min(PLANT_STEP, now - t)
+                t += step
+                self.move_valve(step)
+                mixed_temp = self.get_mixed_temp(t)
+                factor = 1 - math.exp(-step / self.time_constant)
+                self.outlet_temp += (mixed_temp - self.outlet_temp) * factor
+            self.last_update = max(self.last_update, now)
+
+    # move valve for step seconds
+    def move_valve(self, step):
+        if not self.motor:
+            return
+        self.motor_time += step
+        position = self.position + self.motor * 100.0 * step / self.travel_time
+        if position < 0 or position > 100:
+            self.end_stop_time += step
+        self.position = max(0.0, min(100.0, position))
+
+    # set relays (called on every change of a relay pin)
+    def set_relays(self, relay_open=None, relay_close=None):
+        with self.lock:
+            self.update()
+            if relay_open is not None:
+                self.relay_open = relay_open
+            if relay_close is not None:
+                self.relay_close = relay_close
+            if self.relay_open and self.relay_close:
+                self.both_relays += 1
+                self.motor = 0
+            else:
+                self.motor = self.relay_open - self.relay_close
+
+    # get outlet temp (measured by the temp sensor)
+    def get_outlet_temp(self):
+        self.update()
+        return self.outlet_temp
+
+    # get state (for logs and reports)
+    def get_state(self):
+        self.update()
+        return {
+            "position": round(self.position, 2),
+            "outlet_temp": round(self.outlet_temp, 2),
+            "supply_temp": round(self.get_supply_temp(), 2),
+            "motor_time": round(self.motor_time, 2),
+            "end_stop_time": round(self.end_stop_time, 2),
+            "both_relays": self.both_relays,
+        }
@@ -0,0 +1,92 @@
+# ==================================================
+# Run the firmware in the simulator
+# ==================================================
+#
+# Runs main.py unchanged under CPython with the simulated board. The webserver
+# listens on --port, the lcd is printed on every change with --lcd. A
+# machine.reset() starts the firmware again, the flash folder and the plant
+# are kept.
+#
+# Usage (from the project folder):
+#   python -m sim.run --port 8080 --lcd
+#   python -m sim.run --flash /tmp/flash   (keeps config slots between runs)
+
+# imports
+import argparse
+import os
+import runpy
+import sys
+
+import sim
+from sim import flash, machine
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# last printed lcd lines
+last_lcd_lines = None
+
+
+# print lcd (only changed screens)
+def print_lcd(lines):
+    global last_lcd_lines
+    if lines != last_lcd_lines:
+        last_lcd_lines = lines
+        print("+" + "-" * len(lines[0]) + "+")
+        for line in lines:
+            print("|" + line + "|")
+        print("+" + "-" * len(lines[0]) + "+", flush=True)
+
+
+# run firmware until it ends (returns True after machine.reset())
+def run_firmware(script="main.py"):
+    from sim import uasyncio
+
+    machine.reset_requested = False
+    try:
+        runpy.run_path(
+            os.path.join(PROJECT_DIR, script),
+            init_globals={"open": flash.flash_open},
+            run_name="__main__",
+        )
+    finally:
+        uasyncio.shutdown()
+        flash.unload_firmware()
+        machine.reset_pins()
+    if machine.reset_requested:
+        print("sim: machine.reset()", flush=True)
+    return machine.reset_requested
+
+
+# parse arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="run the firmware on the host")
+    parser.add_argument("--port", type=int, default=8080, help="webserver port")
+    parser.add_argument("--flash", default=None, help="flash folder (default: temp)")
+    parser.add_argument("--lcd", action="store_true", help="print the lcd")
+    parser.add_argument(
+        "--script", default="main.py", help="main.py or src/webserver.py"
+    )
+    return parser.parse_args(argv)
+
+
+# main
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, PROJECT_DIR)
+    board = sim.install(args.flash, PROJECT_DIR)
+    print(f"sim: flash {flash.flash_dir}, http://127.0.0.1:{args.port}/", flush=True)
+
+    from sim import uasyncio
+
+    uasyncio.port_map[80] = args.port
+    if args.lcd:
+        board.lcd.listeners.append(print_lcd)
+    try:
+        while run_firmware(args.script):
+            pass
+    except KeyboardInterrupt:
+        print(f"sim: plant {board.plant.get_state()}")
+
+
+if __name__ == "__main__":
+    main()
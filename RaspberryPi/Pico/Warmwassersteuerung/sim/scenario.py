@@ -0,0 +1,189 @@
+# ==================================================
+# Control scenario on virtual time
+# ==================================================
+#
+# Runs main.py for --hours of simulated time. The event loop runs on a virtual
+# clock (sim/virtual_time.py), that jumps straight to the next deadline. Every
+# relay pulse is recorded (start time, direction, width) together with the
+# plant, the run ends with a summary.
+#
+# A day of operation takes about 15 seconds (not the few seconds, that were the
+# goal). The firmware really wakes up every second (countdown job and lcd frame)
+# and the time is spread over this work, the asyncio loop and the simulated
+# i2c lcd, there is no single hot spot left in sim/.
+#
+# The relay decisions only depend on the simulated time, --realtime runs the
+# same scenario on the real clock to compare them (use a short scenario).
+#
+# Usage (from the project folder):
+#   python -m sim.scenario --hours 24
+#   python -m sim.scenario --hours 24 --trace /tmp/day.json
+#   python -m sim.scenario --minutes 3 --set delay_before_start_1=5 \
+#       --set delay_before_start_2=5 --set valve_travel_time=10000 --realtime
+
+# imports
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import sim
+from sim import clock, machine
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# interval of the plant samples in seconds
+SAMPLE_INTERVAL = 60
+
+
+# ==================================================
+# class Recorder
+# ==================================================
+# records the relay pulses (from the pin edges) and samples the plant
+class Recorder:
+    def __init__(self, board):
+        self.board = board
+        self.start = clock.now()
+        self.pulses = []  # [start s, direction, width ms]
+        self.samples = []  # [time s, outlet temp, position]
+        self.pulse_start = {}
+        for direction, pin_id in (
+            ("open", board.relay_open_pin),
+            ("close", board.relay_close_pin),
+        ):
+            machine.add_pin_listener(
+                pin_id, lambda value, direction=direction: self.edge(direction, value)
+            )
+
+    # get time since start in seconds
+    def get_time(self):
+        return clock.now() - self.start
+
+    # relay pin changed
+    def edge(self, direction, value):
+        if value:
+            self.pulse_start[direction] = self.get_time()
+        elif direction in self.pulse_start:
+            start = self.pulse_start.pop(direction)
+            width = (self.get_time() - start) * 1000
+            self.pulses.append([round(start, 3), direction, round(width, 1)])
+
+    # sample plant (every SAMPLE_INTERVAL seconds)
+    def sample(self):
+        state = self.board.plant.get_state()
+        self.samples.append(
+            [round(self.get_time()), state["outlet_temp"], state["position"]]
+        )
+        clock.current.call_later(SAMPLE_INTERVAL * 1000000, self.sample)
+
+    # get relay decisions (direction and width rounded to 10 ms, the width on
+    # the real clock jitters by a few milliseconds)
+    def get_decisions(self):
+        return [[direction, int(round(width, -1))] for _, direction, width in self.pulses]
+
+    # get summary
+    def get_summary(self, settings, wall_time):
+        temps = [outlet_temp for _, outlet_temp, _ in self.samples]
+        nominal_min = settings.get("nominal_min_temp", 42.0)
+        nominal_max = settings.get("nominal_max_temp", 57.0)
+        in_band = [temp for temp in temps if nominal_min <= temp <= nominal_max]
+        return {
+            "simulated_s": round(self.get_time()),
+            "wall_s": round(wall_time, 2),
+            "speedup": round(self.get_time() / max(wall_time, 1e-6)),
+            "pulses": len(self.pulses),
+            "open": sum(1 for pulse in self.pulses if pulse[1] == "open"),
+            "close": sum(1 for pulse in self.pulses if pulse[1] == "close"),
+            "min_temp": min(temps) if temps else None,
+            "max_temp": max(temps) if temps else None,
+            "in_band_percent": round(100 * len(in_band) / max(1, len(temps)), 1),
+            "plant": self.board.plant.get_state(),
+        }
+
+
+# create flash folder with config.json and the overridden settings
+def create_flash(overrides):
+    directory = tempfile.mkdtemp(prefix="sim_scenario_")
+    atexit.register(shutil.rmtree, directory, True)
+    with open(os.path.join(PROJECT_DIR, "config.json"), encoding="utf-8") as file:
+        settings = json.load(file)
+    settings.update(overrides)
+    with open(os.path.join(directory, "config.json"), "w", encoding="utf-8") as file:
+        json.dump(settings, file, indent=4)
+    return directory, settings
+
+
+# parse setting (key=value, the value is parsed as json if possible)
+def parse_setting(text):
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+# run scenario (returns recorder and summary)
+def run_scenario(duration, overrides=None, realtime=False):
+    directory, settings = create_flash(overrides or {})
+    board = sim.install(directory, PROJECT_DIR, virtual_time=not realtime)
+
+    from sim import uasyncio
+    from sim.run import run_firmware
+
+    uasyncio.port_map[80] = 0  # any free port
+    recorder = Recorder(board)
+    recorder.sample()
+
+    # stop the event loop at the end of the scenario
+    def stop():
+        loop = uasyncio.get_event_loop()
+        loop.call_soon_threadsafe(loop.stop)
+
+    clock.current.call_later(int(duration * 1000000), stop)
+    wall_start = time.perf_counter()
+    run_firmware()
+    wall_time = time.perf_counter() - wall_start
+    return recorder, recorder.get_summary(settings, wall_time)
+
+
+# parse arguments
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="run a control scenario")
+    parser.add_argument("--hours", type=float, default=0, help="simulated hours")
+    parser.add_argument("--minutes", type=float, default=0, help="simulated minutes")
+    parser.add_argument(
+        "--set", action="append", default=[], help="override a setting (key=value)"
+    )
+    parser.add_argument("--realtime", action="store_true", help="use the real clock")
+    parser.add_argument("--trace", default=None, help="write pulses and samples")
+    args = parser.parse_args(argv)
+    if not args.hours and not args.minutes:
+        args.hours = 24
+    return args
+
+
+# main
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, PROJECT_DIR)
+    overrides = dict(parse_setting(text) for text in args.set)
+    duration = args.hours * 3600 + args.minutes * 60
+    recorder, summary = run_scenario(duration, overrides, args.realtime)
+    print(json.dumps(summary, indent=2))
+    print("decisions:", json.dumps(recorder.get_decisions()))
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as file:
+            trace = {
+                "summary": summary,
+                "pulses": recorder.pulses,
+                "samples": recorder.samples,
+            }
+            json.dump(trace, file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# ==================================================
+# uasyncio on top of the CPython asyncio
+# ==================================================
+# adds the micropython extensions (sleep_ms, wait_for_ms, ThreadSafeFlag) and
+# streams with awrite() and readinto(). start_server() maps the device ports
+# to host ports (port_map), so the webserver does not need port 80.
+
+# imports
+import asyncio as _asyncio
+from asyncio import *  # noqa: F401,F403
+
+from sim import SimReset
+
+# device port -> host port
+port_map = {}
+
+# event loop of get_event_loop()
+_loop = None
+
+# servers of start_server() (closed by shutdown())
+servers = []
+
+
+# sleep in milliseconds
+async def sleep_ms(ms):
+    await _asyncio.sleep(ms / 1000)
+
+
+# wait_for with a timeout in milliseconds. asyncio.timeout() (python 3.11+)
+# awaits in the calling task, wait_for() of python 3.11 runs the awaitable as a
+# task of its own and needs several loop iterations more for every timeout.
+async def wait_for_ms(awaitable, timeout_ms):
+    if not hasattr(_asyncio, "timeout"):
+        return await _asyncio.wait_for(awaitable, timeout_ms / 1000)
+    async with _asyncio.timeout(timeout_ms / 1000):
+        return await awaitable
+
+
+# get event loop (creates one, like uasyncio, if there is none)
+def get_event_loop():
+    global _loop
+    try:
+        return _asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    if _loop is None or _loop.is_closed():
+        _loop = _asyncio.new_event_loop()
+        _loop.set_exception_handler(handle_exception)
+        _asyncio.set_event_loop(_loop)
+    return _loop
+
+
+# exception handler (SimReset ends the task, that called machine.reset())
+def handle_exception(loop, context):
+    if isinstance(context.get("exception"), SimReset):
+        return
+    loop.default_exception_handler(context)
+
+
+# ==================================================
+# class ThreadSafeFlag
+# ==================================================
+# set() may be called from timer callbacks in other threads
+class ThreadSafeFlag:
+    def __init__(self):
+        self.state = False
+        self.loop = None
+        self.event = None
+
+    # set flag
+    def set(self):
+        self.state = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    # clear flag
+    def clear(self):
+        self.state = False
+
+    # wait for the flag and clear it
+    async def wait(self):
+        if self.event is None:
+            self.event = _asyncio.Event()
+            self.loop = _asyncio.get_running_loop()
+        while not self.state:
+            await self.event.wait()
+            self.event.clear()
+        self.state = False
+
+
+# ==================================================
+# class Stream
+# ==================================================
+# micropython stream (one object for reading and writing)
+class Stream:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    # read up to n bytes (all bytes until eof, if n is -1)
+    async def read(self, n=-1):
+        return await self.reader.read(n)
+
+    # read into buffer (returns the number of bytes, 0 at eof)
+    async def readinto(self, buf):
+        data = await self.reader.read(len(buf))
+        buf[: len(data)] = data
+        return len(data)
+
+    # read exactly n bytes
+    async def readexactly(self, n):
+        return await self.reader.readexactly(n)
+
+    # read line
+    async def readline(self):
+        return await self.reader.readline()
+
+    # write (the data is copied, the firmware reuses its buffers)
+    def write(self, buf):
+        self.writer.write(bytes(buf))
+
+    # drain
+    async def drain(self):
+        await self.writer.drain()
+
+    # write and drain
+    async def awrite(self, buf, off=0, sz=-1):
+        if sz == -1:
+            sz = len(buf) - off
+        self.write(memoryview(buf)[off : off + sz])
+        await self.writer.drain()
+
+    # close
+    def close(self):
+        self.writer.close()
+
+    # close and wait (like micropython, where close() does nothing and
+    # wait_closed() closes the socket), connection errors are ignored
+    async def wait_closed(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+    # close and wait
+    async def aclose(self):
+        self.close()
+        await self.wait_closed()
+
+    # get extra info (e.g. "peername")
+    def get_extra_info(self, name, default=None):
+        return self.writer.get_extra_info(name, default)
+
+
+# start server (callback(reader, writer) gets the same Stream twice)
+async def start_server(callback, host, port, backlog=5):
+    async def connected(reader, writer):
+        stream = Stream(reader, writer)
+        await callback(stream, stream)
+
+    port = port_map.get(port, port)
+    server = await _asyncio.start_server(connected, host, port, backlog=backlog)
+    servers.append(server)
+    return server
+
+
+# stop all tasks and servers of the event loop (simulated reset)
+def shutdown():
+    global _loop
+    loop = _loop
+    _loop = None
+    for server in servers:
+        server.close()
+    servers.clear()
+    if loop is None or loop.is_closed():
+        return
+    tasks = _asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        gather = _asyncio.gather(*tasks, return_exceptions=True)
+        loop.run_until_complete(gather)
+    loop.close()
+
+
+# open connection
+async def open_connection(host, port):
+    reader, writer = await _asyncio.open_connection(host, port)
+    stream = Stream(reader, writer)
+    return stream, stream
@@ -0,0 +1,103 @@
+# ==================================================
+# virtual time event loop
+# ==================================================
+# an asyncio event loop, that runs on the virtual clock. if no task is ready,
+# the clock jumps straight to the next deadline (asyncio timer or
+# machine.Timer) instead of waiting. sockets are still polled, so the
+# webserver can be used while the simulation runs.
+
+# imports
+import asyncio
+import gc
+import math
+import selectors
+
+from sim import clock
+
+
+# ==================================================
+# class VirtualSelector
+# ==================================================
+# selector, that polls the real selector and advances the virtual clock by
+# the timeout of the event loop
+class VirtualSelector(selectors.BaseSelector):
+    def __init__(self, virtual_clock):
+        self.clock = virtual_clock
+        self.selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self.selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self.selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self.selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self.selector.get_map()
+
+    def close(self):
+        self.selector.close()
+
+    # select (timeout None: until the next machine.Timer)
+    def select(self, timeout=None):
+        events = self.selector.select(0)
+        if events or timeout == 0:
+            return events
+        when_us = self.clock.get_next_timer()
+        if timeout is not None:
+            # rounded up, so the asyncio timer is due after the jump
+            deadline_us = self.clock.now + math.ceil(timeout * 1000000)
+            when_us = deadline_us if when_us is None else min(when_us, deadline_us)
+        if when_us is None:
+            return self.selector.select(None)
+        if self.clock.advance_to(when_us):
+            # a timer callback may have woken up the loop (ThreadSafeFlag)
+            return self.selector.select(0)
+        return events
+
+
+# ==================================================
+# class VirtualTimeLoop
+# ==================================================
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, virtual_clock):
+        super().__init__(VirtualSelector(virtual_clock))
+        self.clock = virtual_clock
+
+    # loop time in seconds
+    def time(self):
+        return self.clock.now / 1000000
+
+
+# ==================================================
+# class VirtualTimePolicy
+# ==================================================
+# new event loops (asyncio.run(), uasyncio.get_event_loop()) run on the clock
+class VirtualTimePolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, virtual_clock):
+        super().__init__()
+        self.clock = virtual_clock
+
+    def new_event_loop(self):
+        return VirtualTimeLoop(self.clock)
+
+
+# collect the youngest generation only (a full collection of the host heap takes
+# milliseconds, the firmware calls gc.collect() every few simulated seconds)
+def collect(generation=0):
+    return collect_full(generation)
+
+
+# full gc.collect() of the host
+collect_full = gc.collect
+
+
+# use virtual time (before the board and the firmware are set up)
+def install(start_us=0):
+    virtual_clock = clock.VirtualClock(start_us)
+    clock.set_clock(virtual_clock)
+    asyncio.set_event_loop_policy(VirtualTimePolicy(virtual_clock))
+    gc.collect = collect
+    return virtual_clock
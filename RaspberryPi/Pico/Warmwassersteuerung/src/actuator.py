@@ -0,0 +1,252 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.log import log
+from src.config import config  # Config() instance
+from src.lcd import print_lcd
+from src.relay import deactivate_relay, pulse_relay
+from src.pulse import pulse_driver  # PulseDriver() instance
+from src.valve import valve, VALVE_UNKNOWN  # ValveModel() instance
+
+# maximum number of queued commands (further commands are rejected)
+ACTUATOR_QUEUE_SIZE = 4
+
+# queue slots, that web commands can not use (kept for the regulation and homing)
+ACTUATOR_RESERVED_SLOTS = 1
+
+# number of finished commands, which can still be queried by id
+ACTUATOR_HISTORY_SIZE = 8
+
+# maximum movement time of one command in milliseconds
+ACTUATOR_MAX_TIME = 10000
+
+# lcd message per direction
+DIRECTION_MESSAGES = {
+    "open": "öffne Ventil     >>>",
+    "close": "schließe Ventil: <<<",
+}
+HOME_MESSAGE = "Ventil Referenz  <<<"
+
+
+# ==================================================
+# class Command
+# ==================================================
+# one valve movement
+# status: queued -> running -> done / cancelled / stopped, or queued -> skipped
+class Command:
+    def __init__(self, command_id, direction, relay_time, source, home=False):
+        self.id = command_id
+        self.direction = direction  # "open" or "close"
+        self.relay_time = relay_time  # milliseconds
+        self.run_time = relay_time  # shortened at an end stop
+        self.source = source  # "auto", "web" or "home"
+        self.home = home  # full close, that sets the valve position to 0 %
+        self.status = "queued"
+        self.started = None
+        self.elapsed = 0  # milliseconds the relay was energized
+        self.measured_us = None  # measured pulse width
+        self.done = asyncio.Event()
+
+    # finished (done, skipped, cancelled or stopped)
+    def finished(self):
+        return self.status not in ("queued", "running")
+
+    # get status dict (for /api/command)
+    def to_dict(self):
+        elapsed = self.elapsed
+        if self.status == "running":
+            elapsed = time.ticks_diff(time.ticks_ms(), self.started)
+        return {
+            "id": self.id,
+            "direction": self.direction,
+            "relay_time": self.relay_time,
+            "run_time": self.run_time,
+            "source": self.source,
+            "status": self.status,
+            "elapsed": elapsed,
+            "measured_us": self.measured_us,
+        }
+
+
+# ==================================================
+# class Actuator
+# ==================================================
+# owns both relay pins. all movements run one after another in the actuator
+# task, so open and close are never energized at the same time. movements are
+# queued as commands, the web handlers return at once with the command id.
+class Actuator:
+    def __init__(self):
+        self.queue = []  # queued commands (bounded by ACTUATOR_QUEUE_SIZE)
+        self.history = []  # finished commands (newest last)
+        self.current = None  # running command
+        self.last_id = 0
+        self.wakeup = asyncio.Event()  # new command queued
+
+    # get relay pin of a direction
+    def get_pin(self, direction):
+        if direction == "open":
+            return config.get_int_value("RELAY_OPEN_PIN", 14)
+        return config.get_int_value("RELAY_CLOSE_PIN", 15)
+
+    # submit command (returns the command, None if the queue is full)
+    def submit(self, direction, relay_time, source="web", home=False):
+        if direction not in DIRECTION_MESSAGES:
+            raise ValueError("unknown direction: " + str(direction))
+        size = ACTUATOR_QUEUE_SIZE
+        if source == "web":
+            size -= ACTUATOR_RESERVED_SLOTS
+        if len(self.queue) >= size:
+            log("WARN", "actuator: queue full, {} ({}) rejected", direction, source)
+            return None
+        self.last_id += 1
+        relay_time = max(0, int(relay_time))
+        if not home:
+            relay_time = min(relay_time, ACTUATOR_MAX_TIME)
+        command = Command(self.last_id, direction, relay_time, source, home)
+        self.queue.append(command)
+        self.wakeup.set()
+        log("INFO", "actuator: #{} {}({}) queued", command.id, direction, relay_time)
+        return command
+
+    # move and wait until the movement is finished (returns the command, None if
+    # the queue is full, the regulation moves again after its next countdown)
+    async def move(self, direction, relay_time, source="auto"):
+        command = self.submit(direction, relay_time, source)
+        if command is None:
+            log(
+                "WARN",
+                "actuator: {} move dropped, retried on the next regulation",
+                direction,
+            )
+            return None
+        await command.done.wait()
+        return command
+
+    # home valve (full close, waits until it is finished)
+    async def home(self):
+        command = self.submit("close", valve.get_home_time(), "home", True)
+        if command is not None:
+            await command.done.wait()
+        return command
+
+    # get command by id (queued, running or in the history)
+    def get_command(self, command_id):
+        if self.current is not None and self.current.id == command_id:
+            return self.current
+        for command in self.queue + self.history:
+            if command.id == command_id:
+                return command
+        return None
+
+    # cancel command (returns False, if it is unknown or already finished)
+    def cancel(self, command_id):
+        command = self.get_command(command_id)
+        if command is None or command.finished():
+            return False
+        if command is self.current:
+            pulse_driver.stop()
+        else:
+            self.queue.remove(command)
+            self.finish(command, "cancelled")
+        log("INFO", "actuator: #{} cancelled", command_id)
+        return True
+
+    # emergency stop (de-energizes both relays and drops all queued commands)
+    def stop(self):
+        pulse_driver.stop()
+        self.release_relays()
+        while self.queue:
+            self.finish(self.queue.pop(0), "stopped")
+        if self.current is not None:
+            self.current.status = "stopped"
+        log("WARN", "actuator: emergency stop")
+
+    # de-energize both relays
+    def release_relays(self):
+        deactivate_relay(self.get_pin("open"))
+        deactivate_relay(self.get_pin("close"))
+
+    # finish command and move it to the history
+    def finish(self, command, status):
+        if not command.finished():
+            command.status = status
+        self.history.append(command)
+        if len(self.history) > ACTUATOR_HISTORY_SIZE:
+            self.history.pop(0)
+        command.done.set()
+
+    # get status of all commands (for /api/command)
+    def get_status(self):
+        commands = self.history + ([self.current] if self.current else []) + self.queue
+        return {
+            "running": self.current.id if self.current else None,
+            "queued": len(self.queue),
+            "commands": [command.to_dict() for command in commands],
+            "pulses": pulse_driver.pulses,
+        }
+
+    # execute command (interlocked, the other relay is released first)
+    async def execute(self, command):
+        if command.home:
+            valve.set_position(VALVE_UNKNOWN)
+            message = HOME_MESSAGE
+        else:
+            command.run_time = valve.plan(command.direction, command.relay_time)
+            message = DIRECTION_MESSAGES[command.direction]
+        if command.run_time == 0:
+            self.finish(command, "skipped")
+            log("INFO", "actuator: #{} {} skipped", command.id, command.direction)
+            return
+        pin = self.get_pin(command.direction)
+        self.release_relays()
+        print_lcd(3, 0, message)
+        log(
+            "INFO",
+            "actuator: #{} {}({}) start",
+            command.id,
+            command.direction,
+            command.run_time,
+        )
+        command.status = "running"
+        command.started = time.ticks_ms()
+        command.measured_us = await pulse_relay(pin, command.run_time)
+        if command.measured_us is None:
+            self.finish(command, "stopped")
+            return
+        command.elapsed = command.measured_us // 1000
+        self.finish(command, "cancelled" if pulse_driver.stopped else "done")
+        if command.home and command.status == "done":
+            valve.set_home()
+        else:
+            valve.update(command.direction, command.elapsed)
+        log(
+            "INFO",
+            "actuator: #{} {} after {}us ({}ms commanded)",
+            command.id,
+            command.status,
+            command.measured_us,
+            command.run_time,
+        )
+
+    # run actuator task
+    async def run(self):
+        self.release_relays()
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            self.current = self.queue.pop(0)
+            try:
+                await self.execute(self.current)
+            except Exception as e:
+                pulse_driver.stop()
+                self.release_relays()
+                self.finish(self.current, "stopped")
+                log("ERROR", "actuator: #{} failed: {}", self.current.id, e)
+            finally:
+                self.current = None
+
+
+# instance Actuator()
+actuator = Actuator()
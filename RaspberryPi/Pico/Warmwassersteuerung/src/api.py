@@ -0,0 +1,326 @@
+# imports
+import gc  # https://docs.micropython.org/en/latest/library/gc.html
+import random  # https://docs.micropython.org/en/latest/library/random.html
+import ujson  # https://docs.micropython.org/en/latest/library/json.html
+from src.config import config  # Config() instance
+from src.actuator import actuator  # Actuator() instance
+from src.http import http_stats
+from src.lcd import get_lcd_lines, get_lcd_stats
+from src.metrics import metrics  # Metrics() instance
+from src.watchdog import loop_watchdog  # LoopWatchdog() instance
+from src.relay import get_relay_state
+from src.temp import temp_sensors  # SensorRegistry() instance
+
+# settings, which are never sent by /api/config
+HIDDEN_SETTINGS = ("wifi_password",)
+
+# prefix of the /metrics names
+METRICS_PREFIX = "wws_"
+
+
+# ==================================================
+# class StateTracker
+# ==================================================
+# compares the current values of all state fields with the last known values.
+# the version increases, if at least one field has changed since the last
+# update, every field remembers the version of its last change. so a client
+# only gets the fields, that have changed since its last version.
+class StateTracker:
+    def __init__(self, fields):
+        self.fields = fields  # name -> function, that returns the current value
+        self.values = {}
+        self.field_versions = {}
+        self.version = 0
+        self.boot = random.getrandbits(30)  # clients reset their version on reboot
+
+    # update values (returns the current version)
+    def update(self):
+        changed = False
+        for name, function in self.fields.items():
+            value = function()
+            if name in self.values and self.values[name] == value:
+                continue
+            if not changed:
+                self.version += 1
+                changed = True
+            self.values[name] = value
+            self.field_versions[name] = self.version
+        return self.version
+
+    # get fields changed since version (all fields, if since is unknown)
+    def get_changes(self, since=None, boot=None):
+        self.update()
+        if since is None or boot != self.boot or not 0 < since <= self.version:
+            return dict(self.values)
+        changes = {}
+        for name, version in self.field_versions.items():
+            if version > since:
+                changes[name] = self.values[name]
+        return changes
+
+
+# get state fields (temps of all sensors, lcd, timer, relay and category)
+def get_state_fields():
+    fields = {
+        "lcd": lambda: list(get_lcd_lines()),
+        "timer": lambda: config.get_int_value("timer", 0),
+        "stop_timer": lambda: config.get_int_value("stop_timer", 0),
+        "relay": get_relay_state,
+        "valve_position": lambda: config.get_value("valve_position", -1.0),
+        "temp_change_category": lambda: config.get_value("temp_change_category", ""),
+        "temp_increasing": lambda: config.get_value("temp_increasing", 0),
+        "temp_last_measurement": lambda: config.get_value("temp_last_measurement", 0),
+        "temp_last_measurement_time": lambda: config.get_value(
+            "temp_last_measurement_time", 0
+        ),
+        "previous_millis": lambda: config.get_value("previous_millis", 0),
+    }
+    for sensor in temp_sensors.sensors.values():
+        fields[sensor.config_key] = lambda key=sensor.config_key: config.get_value(key)
+    return fields
+
+
+# convert int parameter (None, if it is missing or not a number)
+def to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+# get /api/state response body (None, if nothing changed since the version)
+def get_api_state(params):
+    since = to_int(params.get("since"))
+    boot = to_int(params.get("boot"))
+    changes = state_tracker.get_changes(since, boot)
+    if since is not None and boot == state_tracker.boot and not changes:
+        return None
+    return ujson.dumps(
+        {"version": state_tracker.version, "boot": state_tracker.boot, "state": changes}
+    )
+
+
+# get /api/command response body (None, if the command id is unknown)
+def get_api_command(params):
+    if "id" not in params:
+        return ujson.dumps(actuator.get_status())
+    command = actuator.get_command(to_int(params.get("id")))
+    if command is None:
+        return None
+    return ujson.dumps(command.to_dict())
+
+
+# get /api/config response body
+def get_api_config():
+    settings = {}
+    for key, value in config.config.items():
+        if key not in HIDDEN_SETTINGS:
+            settings[key] = value
+    return ujson.dumps({"version": config.settings_version, "config": settings})
+
+
+# get /api/stats response body (connection counters)
+def get_api_stats():
+    return ujson.dumps(http_stats)
+
+
+# get /api/loop response body (event loop lateness, stalls and task steps)
+def get_api_loop():
+    return ujson.dumps(loop_watchdog.get_status())
+
+
+# add histogram in the prometheus text format (labels: "" or 'name="value"')
+def add_histogram(lines, name, help_text, labels, histogram, header=True):
+    name = METRICS_PREFIX + name
+    if header:
+        lines.append("# HELP {} {}".format(name, help_text))
+        lines.append("# TYPE {} histogram".format(name))
+    separator = "," if labels else ""
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(
+            '{}_bucket{{{}{}le="{}"}} {}'.format(
+                name, labels, separator, bound / 1000000, cumulative
+            )
+        )
+    lines.append(
+        '{}_bucket{{{}{}le="+Inf"}} {}'.format(name, labels, separator, histogram.count)
+    )
+    labels = "{" + labels + "}" if labels else ""
+    lines.append("{}_sum{} {}".format(name, labels, histogram.sum_us / 1000000))
+    lines.append("{}_count{} {}".format(name, labels, histogram.count))
+
+
+# add metric in the prometheus text format (samples: (labels, value) tuples)
+def add_metric(lines, name, kind, help_text, samples):
+    name = METRICS_PREFIX + name
+    lines.append("# HELP {} {}".format(name, help_text))
+    lines.append("# TYPE {} {}".format(name, kind))
+    for labels, value in samples:
+        lines.append("{}{} {}".format(name, labels, value))
+
+
+# get /metrics response body (prometheus text format)
+def get_api_metrics():
+    metrics.sample_heap()
+    lines = []
+
+    # subsystems
+    subsystems = [
+        ('{subsystem="' + subsystem.name + '"}', subsystem)
+        for subsystem in metrics.subsystems.values()
+    ]
+    add_metric(
+        lines,
+        "subsystem_calls_total",
+        "counter",
+        "Accounted sections of a subsystem.",
+        [(labels, subsystem.calls) for labels, subsystem in subsystems],
+    )
+    add_metric(
+        lines,
+        "subsystem_seconds_total",
+        "counter",
+        "Time spent in a subsystem.",
+        [(labels, subsystem.time_us / 1000000) for labels, subsystem in subsystems],
+    )
+    add_metric(
+        lines,
+        "subsystem_alloc_bytes_total",
+        "counter",
+        "Heap allocated by a subsystem.",
+        [(labels, subsystem.alloc_bytes) for labels, subsystem in subsystems],
+    )
+    add_metric(
+        lines,
+        "subsystem_alloc_max_bytes",
+        "gauge",
+        "Largest allocation of a single section of a subsystem.",
+        [(labels, subsystem.alloc_max) for labels, subsystem in subsystems],
+    )
+
+    # heap
+    heap = (
+        ("heap_alloc_bytes", "Allocated heap.", gc.mem_alloc()),
+        ("heap_free_bytes", "Free heap.", gc.mem_free()),
+        ("heap_alloc_max_bytes", "High water mark of the heap.", metrics.alloc_max),
+        ("heap_free_min_bytes", "Low water mark of the free heap.", metrics.free_min),
+        (
+            "heap_largest_free_block_bytes",
+            "Largest free block up to 16 KiB (fragmentation, searched every 5 min).",
+            metrics.largest_free_block,
+        ),
+    )
+    for name, help_text, value in heap:
+        add_metric(lines, name, "gauge", help_text, [("", value)])
+
+    # garbage collection (metrics.collect())
+    gc_metrics = (
+        ("gc_collections_total", "Garbage collections.", metrics.gc_collections),
+        ("gc_seconds_total", "Time of collections.", metrics.gc_time_us / 1000000),
+        ("gc_freed_bytes_total", "Heap freed by collections.", metrics.gc_freed_bytes),
+    )
+    for name, help_text, value in gc_metrics:
+        add_metric(lines, name, "counter", help_text, [("", value)])
+
+    # events
+    events = [
+        ('{event="' + name + '"}', count) for name, count in metrics.events.items()
+    ]
+    add_metric(lines, "events_total", "counter", "Counted events.", events)
+
+    # webserver
+    add_metric(
+        lines,
+        "http_connections_total",
+        "counter",
+        "Connections of the webserver by result.",
+        [
+            ('{result="accepted"}', http_stats["accepted"]),
+            ('{result="rejected"}', http_stats["rejected"]),
+        ],
+    )
+    add_metric(
+        lines,
+        "http_requests_total",
+        "counter",
+        "Handled requests.",
+        [("", http_stats["requests"])],
+    )
+    add_metric(
+        lines,
+        "http_errors_total",
+        "counter",
+        "Requests, that were not handled, by reason.",
+        [
+            ('{reason="timed_out"}', http_stats["timed_out"]),
+            ('{reason="too_large"}', http_stats["too_large"]),
+        ],
+    )
+    add_metric(
+        lines,
+        "http_open_connections",
+        "gauge",
+        "Open connections.",
+        [("", http_stats["active"])],
+    )
+    add_metric(
+        lines,
+        "http_open_connections_max",
+        "gauge",
+        "Maximum of open connections.",
+        [("", http_stats["max_active"])],
+    )
+
+    # lcd
+    lcd_stats = get_lcd_stats()
+    add_metric(
+        lines,
+        "lcd_frames_total",
+        "counter",
+        "Rendered lcd frames.",
+        [("", lcd_stats["frames"])],
+    )
+    add_metric(
+        lines,
+        "lcd_bus_bytes_total",
+        "counter",
+        "I2C bytes sent to the lcd.",
+        [("", lcd_stats["bus_bytes"])],
+    )
+    add_metric(
+        lines, "uptime_seconds", "gauge", "Uptime.", [("", metrics.get_uptime())]
+    )
+
+    # event loop (watchdog)
+    add_histogram(
+        lines,
+        "loop_lateness_seconds",
+        "Lateness of the scheduler jobs (event loop blocked).",
+        "",
+        loop_watchdog.lateness,
+    )
+    add_metric(
+        lines,
+        "loop_stalls_total",
+        "counter",
+        "Scheduler jobs, that ran later than the stall threshold.",
+        [("", loop_watchdog.stall_count)],
+    )
+    header = True
+    for name, timer in loop_watchdog.tasks.items():
+        add_histogram(
+            lines,
+            "task_step_seconds",
+            "Time of a task from a resume to its next await.",
+            'task="' + name + '"',
+            timer.steps,
+            header,
+        )
+        header = False
+    return "\n".join(lines) + "\n"
+
+
+# instance StateTracker()
+state_tracker = StateTracker(get_state_fields())
@@ -1,5 +1,55 @@
 # imports
 import ujson  # https://docs.micropython.org/en/latest/library/json.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.config_store import ConfigStore, convert_setting
+from src.metrics import metrics  # Metrics() instance
+
+# marker for values, which are not cached
+_MISSING = object()
+
+# memory and time accounting
+config_metrics = metrics.get("config")
+
+# runtime values, which are only kept in ram and never written to flash
+RUNTIME_DEFAULTS = {
+    "previous_millis": 0,
+    "timer": 0,
+    "stop_timer": 0,
+    "current_temp": -127.0,
+    "current_temp_2": -127.0,
+    "temp_last_measurement": 0,
+    "temp_last_measurement_time": 0,
+    "temp_sample_time": 0,
+    "temp_increasing": 0,
+    "temp_change_category": "LOW",
+    "valve_position": -1.0,
+}
+
+
+# ==================================================
+# class ConfigValue
+# ==================================================
+# typed accessor for a single config key, that hot code can hold instead of
+# a string key. the value is parsed once and invalidated by config.set_value()
+class ConfigValue:
+    def __init__(self, config, key, parser, default):
+        self.config = config
+        self.key = str(key)
+        self.parser = parser
+        self.default = default
+        self.valid = False
+        self.value = default
+
+    # get value
+    def get(self):
+        if not self.valid:
+            self.value = self.parser(self.key, self.default)
+            self.valid = True
+        return self.value
+
+    # invalidate value
+    def invalidate(self):
+        self.valid = False
 
 
 # ==================================================
@@ -10,7 +60,20 @@ class Config:
         self.root_path = "/"
         self.file_name = self.root_path + file_name
         self.file_name_backup = self.root_path + file_name_backup
-        self.config = {}
+        self.store = ConfigStore(self.root_path)  # binary settings slots
+        self.config = {}  # persisted settings
+        self.state = {}  # runtime state (ram only)
+        self.runtime_defaults = dict(RUNTIME_DEFAULTS)
+        self.dirty = set()  # settings changed since the last save
+        self.settings_version = 0  # increased on every changed setting
+        self.saved_version = 0  # settings version of the last save
+        self.save_event = asyncio.Event()
+        self.state_changed = asyncio.Event()  # runtime value, lcd or relay changed
+        self.version = 0
+        self.int_cache = {}
+        self.float_cache = {}
+        self.bool_cache = {}
+        self.accessors = {}
         self.load_config()
         self.reset_config()
 
@@ -18,88 +81,232 @@ class Config:
     def file_path(self, backup=False):
         return self.file_name_backup if backup else self.file_name
 
+    # invalidate typed values (all keys, if key is None)
+    def invalidate(self, key=None):
+        self.version += 1
+        if key is None:
+            self.int_cache.clear()
+            self.float_cache.clear()
+            self.bool_cache.clear()
+            for accessors in self.accessors.values():
+                for accessor in accessors:
+                    accessor.invalidate()
+        else:
+            self.int_cache.pop(key, None)
+            self.float_cache.pop(key, None)
+            self.bool_cache.pop(key, None)
+            for accessor in self.accessors.get(key, ()):
+                accessor.invalidate()
+
     # load config
     def load_config(self):
-        # try loading config.json
+        with config_metrics:
+            return self.load_settings()
+
+    # load settings (binary slots, config.json or config_backup.json)
+    def load_settings(self):
+        self.invalidate()
+        self.dirty = set()
+        self.saved_version = self.settings_version
+
+        # try loading the binary settings slots
+        settings = self.store.load()
+        if settings is not None:
+            self.config = settings
+            return self.config
+
+        # try importing config.json
         try:
-            with open(self.file_path(), "r", encoding="utf-8") as file:
-                self.config = ujson.load(file)
-                return self.config
-        except OSError:
-            # try loading config_backup.json
+            self.config = self.store.import_json(self.file_path())
+        except (OSError, ValueError):
+            # try importing config_backup.json
             try:
-                with open(self.file_path(backup=True), "r", encoding="utf-8") as file:
-                    self.config = ujson.load(file)
-                    return self.config
-            except OSError:
+                self.config = self.store.import_json(self.file_path(backup=True))
+            except (OSError, ValueError):
                 # set empty object
                 self.config = {}
                 return self.config
 
-    # reset config
+        # runtime values are not part of the settings
+        for key in self.runtime_defaults:
+            self.config.pop(key, None)
+
+        # write imported settings into the binary settings slots
+        try:
+            self.store.save(self.config)
+        except OSError as e:
+            print(f"ERROR: writing settings: {e}")
+        return self.config
+
+    # reset config (runtime state)
     def reset_config(self):
-        self.config["temp_last_measurement"] = 0
-        self.config["temp_last_measurement_time"] = 0
-        self.config["temp_change_category"] = "LOW"
+        self.state = dict(self.runtime_defaults)
+        self.invalidate()
+
+    # add runtime value (e.g. "current_<name>" of a temp sensor)
+    def add_runtime_value(self, key, default=None):
+        key = str(key)
+        self.runtime_defaults[key] = default
+        self.config.pop(key, None)
+        if key not in self.state:
+            self.state[key] = default
+            self.invalidate(key)
+
+    # save config (only, if a setting has changed since the last save)
+    def save_config(self):
+        version = self.settings_version
+        if self.saved_version == version:
+            return False
+        self.dirty = set()
 
-    # save config
-    def save_config(self, backup=False):
+        # the store skips writing, if the content (crc32) is unchanged
         try:
-            with open(self.file_path(backup), "w", encoding="utf-8") as file:
-                ujson.dump(self.config, file)
+            with config_metrics:
+                saved = self.store.save(self.config)
+            self.saved_version = version
+            return saved
         except OSError as e:
-            print(f"ERROR: writing to {self.file_name}: {e}")
+            print(f"ERROR: writing settings: {e}")
+            return False
 
-    # create config backup
+    # create config backup (the previous settings stay in the inactive slot)
     def create_config_backup(self):
-        self.save_config(backup=True)
+        return self.save_config()
 
-    # get value
+    # export config (config.json layout)
+    def export_config(self, file_path=None):
+        with config_metrics:
+            return self.store.export_json(self.config, file_path or self.file_path())
+
+    # request save (the write is deferred and coalesced by run_save_task())
+    def request_save(self):
+        if self.dirty:
+            self.save_event.set()
+
+    # run save task (save, when no further change was requested within the delay)
+    async def run_save_task(self):
+        while True:
+            await self.save_event.wait()
+            self.save_event.clear()
+            while True:
+                await asyncio.sleep_ms(self.get_int_value("config_save_delay", 5000))
+                if not self.save_event.is_set():
+                    break
+                self.save_event.clear()
+            self.save_config()
+
+    # get value (from runtime state or settings)
     def get_value(self, key, default=None):
-        return self.config.get(key, default)
+        value = self.state.get(key, _MISSING)
+        if value is _MISSING:
+            return self.config.get(key, default)
+        return value
 
     # get bool value
     def get_bool_value(self, key, default=False):
+        value = self.bool_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        key = str(key)
+        value = self.get_value(key, _MISSING)
+        if value is _MISSING:
+            return bool(default)
         try:
-            value = self.config.get(str(key), bool(default))
             if isinstance(value, bool):
-                return value
-            if isinstance(value, int):
-                if value >= 1:
-                    return True
-                else:
-                    return False
-            if isinstance(value, str):
+                pass
+            elif isinstance(value, int):
+                value = value >= 1
+            elif isinstance(value, str):
                 if value.lower() in ["true", "1", "yes", "on"]:
-                    return True
-                elif value.lower() in ["false", "0", "no", "off", None]:
+                    value = True
+                elif value.lower() in ["false", "0", "no", "off"]:
+                    value = False
+                else:
                     return False
-            return False
+            else:
+                return False
+            self.bool_cache[key] = value
+            return value
         except (ValueError, TypeError):
             return bool(default)
 
     # get int value
     def get_int_value(self, key, default=0):
+        value = self.int_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        key = str(key)
+        value = self.get_value(key, _MISSING)
+        if value is _MISSING:
+            return int(default)
         try:
-            value = self.config.get(str(key), int(default))
-            return int(value)
+            value = int(value)
+            self.int_cache[key] = value
+            return value
         except (ValueError, TypeError):
             return int(default)
 
     # get float value
     def get_float_value(self, key, default=0.0, decimal=None):
-        try:
-            value = self.config.get(str(key), float(default))
-            float_value = float(value)
-            if decimal is not None:
-                return round(float_value, int(decimal))
-            return float_value
-        except (ValueError, TypeError):
-            return float(default)
+        value = self.float_cache.get(key, _MISSING)
+        if value is _MISSING:
+            key = str(key)
+            value = self.get_value(key, _MISSING)
+            if value is _MISSING:
+                return float(default)
+            try:
+                value = float(value)
+                self.float_cache[key] = value
+            except (ValueError, TypeError):
+                return float(default)
+        if decimal is not None:
+            return round(value, int(decimal))
+        return value
+
+    # get typed accessor
+    def accessor(self, key, parser, default=None):
+        accessor = ConfigValue(self, key, parser, default)
+        if accessor.key not in self.accessors:
+            self.accessors[accessor.key] = []
+        self.accessors[accessor.key].append(accessor)
+        return accessor
+
+    # get int accessor
+    def int_accessor(self, key, default=0):
+        return self.accessor(key, self.get_int_value, default)
+
+    # get float accessor
+    def float_accessor(self, key, default=0.0):
+        return self.accessor(key, self.get_float_value, default)
 
-    # set value
+    # get bool accessor
+    def bool_accessor(self, key, default=False):
+        return self.accessor(key, self.get_bool_value, default)
+
+    # set value (runtime values stay in ram, changed settings are marked dirty,
+    # returns False, if the value does not fit the type of the setting)
     def set_value(self, key, value):
-        self.config[str(key)] = value
+        key = str(key)
+        if key in self.state:
+            if self.state[key] != value:
+                self.state[key] = value
+                self.invalidate(key)
+                self.state_changed.set()
+            return True
+
+        # convert to the type of the setting (values from the web ui are strings)
+        try:
+            value = convert_setting(key, value)
+        except (ValueError, TypeError):
+            return False
+        current = self.config.get(key, _MISSING)
+        if current == value and type(current) == type(value):
+            return True
+        self.config[key] = value
+        self.dirty.add(key)
+        self.settings_version += 1
+        self.invalidate(key)
+        return True
 
 
 # instance Config()
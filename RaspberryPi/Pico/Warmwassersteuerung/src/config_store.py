@@ -0,0 +1,277 @@
+# imports
+import struct  # https://docs.micropython.org/en/latest/library/struct.html
+import ujson  # https://docs.micropython.org/en/latest/library/json.html
+from src.metrics import metrics  # Metrics() instance
+
+try:
+    from binascii import crc32  # https://docs.micropython.org/en/latest/library/binascii.html
+except ImportError:
+
+    # crc32 (for ports without binascii.crc32)
+    def crc32(data, crc=0):
+        crc = ~crc & 0xFFFFFFFF
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                crc = (crc >> 1) ^ (0xEDB88320 if crc & 1 else 0)
+        return ~crc & 0xFFFFFFFF
+
+
+# ==================================================
+# settings schema
+# ==================================================
+# the payload is a list of key tagged records, so settings can be added to or
+# removed from SETTINGS_SCHEMA without invalidating the saved slots. increase
+# FORMAT_VERSION only on a change of the record encoding, slots with an other
+# format version are ignored and the settings are imported from config.json again.
+FORMAT_VERSION = 1
+
+# (key, type, size)
+#   "int"   = signed 32 bit integer
+#   "float" = double
+#   "bool"  = unsigned 8 bit integer (exported as 0 / 1 like in config.json)
+#   "str"   = utf-8 string with a maximum of size bytes (empty strings are skipped)
+SETTINGS_SCHEMA = (
+    ("wifi_ssid", "str", 33),
+    ("wifi_password", "str", 64),
+    ("wifi_country", "str", 3),
+    ("wifi_max_attempts", "int", 4),
+    ("delay_before_start_1", "int", 4),
+    ("delay_before_start_2", "int", 4),
+    ("update_time", "int", 4),
+    ("relay_time", "int", 4),
+    ("manual_relay_time", "int", 4),
+    ("valve_travel_time", "int", 4),
+    ("nominal_min_temp", "float", 8),
+    ("nominal_max_temp", "float", 8),
+    ("temp_update_interval", "int", 4),
+    ("lcd_i2c_backlight", "bool", 1),
+    ("buttons_activated", "bool", 1),
+    ("log_level", "str", 8),
+    ("log_buffer_level", "str", 8),
+    ("log_buffer_size", "int", 4),
+    ("config_save_delay", "int", 4),
+    ("http_max_connections", "int", 4),
+    ("http_max_header_size", "int", 4),
+    ("http_max_body_size", "int", 4),
+    ("http_idle_timeout", "int", 4),
+    ("http_header_timeout", "int", 4),
+    ("http_body_timeout", "int", 4),
+    ("boot_normal", "bool", 1),
+    ("interval", "int", 4),
+    ("temp_sampling_interval", "int", 4),
+    ("temp_change_high_threshold_temp", "float", 8),
+    ("temp_change_high_threshold_relay_time_multiplier", "float", 8),
+    ("temp_change_high_threshold_update_time_multiplier", "float", 8),
+    ("TEMP_SENSOR_PIN", "int", 4),
+    ("TEMP_SENSOR_2_PIN", "int", 4),
+    ("temp_sensors", "str", 512),  # name:pin:rom entries of about 28 bytes
+    ("TEMP_SENSOR_RESOLUTION_BIT", "int", 4),
+    ("LCD_PIN_SDA", "int", 4),
+    ("LCD_PIN_SCL", "int", 4),
+    ("LCD_ADDR", "str", 6),
+    ("LCD_FREQ", "int", 4),
+    ("LCD_COLS", "int", 4),
+    ("LCD_ROWS", "int", 4),
+    ("lcd_max_fps", "float", 8),
+    ("RELAY_OPEN_PIN", "int", 4),
+    ("RELAY_CLOSE_PIN", "int", 4),
+    ("RELAY_TIMER_ID", "int", 4),
+    ("BUTTON_TEMP_UP_PIN", "int", 4),
+    ("BUTTON_TEMP_DOWN_PIN", "int", 4),
+    ("LED", "bool", 1),
+)
+
+# struct format characters per type (stored in every record)
+FORMATS = {"int": "i", "float": "d", "bool": "B", "str": "s"}
+
+# header: magic, format version, sequence number, payload length, payload crc32
+MAGIC = b"WWSC"
+HEADER_FORMAT = "<4sHIHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# schema by key: key -> (type, size)
+SCHEMA_KEYS = {key: (kind, size) for key, kind, size in SETTINGS_SCHEMA}
+
+
+# encode string and cut it to size bytes (without splitting a utf-8 character)
+def encode_utf8(value, size):
+    encoded = str(value).encode("utf-8")
+    if len(encoded) <= size:
+        return encoded
+    end = size
+    while end > 0 and encoded[end] & 0xC0 == 0x80:
+        end -= 1
+    return encoded[:end]
+
+
+# convert value to bool
+def to_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ["true", "1", "yes", "on"]
+    try:
+        return int(value) >= 1
+    except (ValueError, TypeError):
+        return False
+
+
+# convert value to the type of a setting of SETTINGS_SCHEMA (values from the web
+# ui are strings, raises ValueError or TypeError, if the value does not fit)
+def convert_setting(key, value):
+    schema = SCHEMA_KEYS.get(key)
+    if schema is None:
+        return value
+    kind = schema[0]
+    if kind == "bool":
+        return 1 if to_bool(value) else 0
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    value = str(value)
+    if len(value.encode("utf-8")) > schema[1]:
+        raise ValueError("{} is longer than {} bytes".format(key, schema[1]))
+    return value
+
+
+# ==================================================
+# class ConfigStore
+# ==================================================
+# settings stored in two alternating binary slots (A/B). a write always goes to the
+# inactive slot, the slot with the highest sequence number and a valid crc wins.
+# a power cut during a write can only destroy the inactive slot.
+class ConfigStore:
+    def __init__(self, root_path="/", slot_names=("config_a.bin", "config_b.bin")):
+        self.slot_paths = [root_path + name for name in slot_names]
+        self.active_slot = None
+        self.sequence = 0
+        self.payload_crc = None
+
+    # pack settings into a payload. a record is: key length, key, format character
+    # and value (strings: 16 bit length and utf-8 bytes). missing settings and
+    # values, that can not be converted, are left out, so their code defaults
+    # apply after a load.
+    def pack(self, settings):
+        payload = bytearray()
+        for key, kind, size in SETTINGS_SCHEMA:
+            value = settings.get(key)
+            if value is None:
+                continue
+            fmt = FORMATS[kind]
+            if kind == "str":
+                encoded = encode_utf8(value, size)
+                if len(encoded) < len(str(value).encode("utf-8")):
+                    print(f"WARN: setting {key} cut to {size} bytes")
+                value = encoded
+                if not value:
+                    continue
+                value = struct.pack("<H", len(value)) + value
+            elif kind == "bool":
+                value = struct.pack("<B", 1 if to_bool(value) else 0)
+            else:
+                try:
+                    value = int(value) if kind == "int" else float(value)
+                    value = struct.pack("<" + fmt, value)
+                except (ValueError, TypeError):
+                    continue
+            encoded_key = key.encode("utf-8")
+            payload += struct.pack("<B", len(encoded_key)) + encoded_key
+            payload += fmt.encode("utf-8") + value
+        return bytes(payload)
+
+    # unpack payload into settings (unknown keys and records with an other type
+    # are skipped, the code defaults apply)
+    def unpack(self, payload):
+        settings = {}
+        offset = 0
+        while offset < len(payload):
+            length = payload[offset]
+            key = payload[offset + 1 : offset + 1 + length].decode("utf-8")
+            fmt = chr(payload[offset + 1 + length])
+            offset += length + 2
+            if fmt == "s":
+                length = struct.unpack_from("<H", payload, offset)[0]
+                value = payload[offset + 2 : offset + 2 + length].decode("utf-8")
+                offset += length + 2
+            else:
+                value = struct.unpack_from("<" + fmt, payload, offset)[0]
+                offset += struct.calcsize("<" + fmt)
+            schema = SCHEMA_KEYS.get(key)
+            if schema is not None and FORMATS[schema[0]] == fmt:
+                settings[key] = value
+        return settings
+
+    # read slot, returns (sequence, payload) or None if the slot is not valid
+    def read_slot(self, slot):
+        try:
+            with open(self.slot_paths[slot], "rb") as file:
+                header = file.read(HEADER_SIZE)
+                if len(header) != HEADER_SIZE:
+                    return None
+                magic, version, sequence, length, crc = struct.unpack(
+                    HEADER_FORMAT, header
+                )
+                if magic != MAGIC or version != FORMAT_VERSION:
+                    return None
+                payload = file.read(length)
+        except OSError:
+            return None
+        if len(payload) != length or crc32(payload) != crc:
+            return None
+        return sequence, payload
+
+    # load settings from the newest valid slot (None, if no slot is valid)
+    def load(self):
+        newest = None
+        for slot in range(len(self.slot_paths)):
+            result = self.read_slot(slot)
+            if result is not None and (newest is None or result[0] > newest[1]):
+                newest = (slot, result[0], result[1])
+        if newest is None:
+            return None
+        self.active_slot, self.sequence, payload = newest
+        self.payload_crc = crc32(payload)
+        return self.unpack(payload)
+
+    # save settings into the inactive slot (False, if the content is unchanged)
+    def save(self, settings):
+        payload = self.pack(settings)
+        payload_crc = crc32(payload)
+        if payload_crc == self.payload_crc:
+            return False
+
+        # write inactive slot, it becomes active with the higher sequence number
+        slot = 0 if self.active_slot is None else 1 - self.active_slot
+        sequence = self.sequence + 1
+        header = struct.pack(
+            HEADER_FORMAT, MAGIC, FORMAT_VERSION, sequence, len(payload), payload_crc
+        )
+        with open(self.slot_paths[slot], "wb") as file:
+            file.write(header)
+            file.write(payload)
+        metrics.count("flash_writes")
+
+        # commit
+        self.active_slot = slot
+        self.sequence = sequence
+        self.payload_crc = payload_crc
+        return True
+
+    # import settings from a json file (config.json layout)
+    def import_json(self, file_path):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return ujson.load(file)
+
+    # export settings to a json file (config.json layout)
+    def export_json(self, settings, file_path):
+        exported = {}
+        for key, kind, _ in SETTINGS_SCHEMA:
+            if key in settings:
+                value = settings[key]
+                if kind == "bool":
+                    value = 1 if to_bool(value) else 0
+                exported[key] = value
+        with open(file_path, "w", encoding="utf-8") as file:
+            ujson.dump(exported, file)
+        metrics.count("flash_writes")
+        return exported
@@ -0,0 +1,121 @@
+# imports
+import ujson  # https://docs.micropython.org/en/latest/library/json.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.log import log
+from src.config import config  # Config() instance
+from src.api import state_tracker  # StateTracker() instance
+
+# maximum number of /events subscribers
+EVENTS_MAX_SUBSCRIBERS = 4
+
+# keep alive comment, if nothing changed (detects closed connections)
+EVENTS_PING_MS = 15000
+
+# reconnect time for the browser (EventSource retry)
+EVENTS_RETRY_MS = 3000
+
+
+# ==================================================
+# class Subscriber
+# ==================================================
+# one /events client. the queue holds the latest value per state field, so a
+# slow client skips intermediate values and its queue never grows beyond the
+# number of fields.
+class Subscriber:
+    def __init__(self):
+        self.pending = {}  # field -> latest value, not sent yet
+        self.event = asyncio.Event()
+        self.dropped = 0  # values replaced before they were sent
+
+    # push changes
+    def push(self, changes):
+        for name, value in changes.items():
+            if name in self.pending:
+                self.dropped += 1
+            self.pending[name] = value
+        self.event.set()
+
+    # take pending changes
+    def take(self):
+        changes = self.pending
+        self.pending = {}
+        self.event.clear()
+        return changes
+
+
+# ==================================================
+# class EventHub
+# ==================================================
+# publishes state changes to all subscribers. the hub sleeps until a change site
+# (config.set_value() of a runtime value, mark_lcd_dirty(), the relays) sets
+# config.state_changed, the changes of one step are published at once.
+class EventHub:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.subscribers = []
+        self.task = None
+        self.version = 0
+        self.events = 0  # published events
+
+    # subscribe (None, if there are too many subscribers)
+    def subscribe(self):
+        if len(self.subscribers) >= EVENTS_MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber()
+        self.subscribers.append(subscriber)
+        if self.task is None:
+            self.version = self.tracker.update()
+            self.task = asyncio.create_task(self.run())
+        return subscriber
+
+    # unsubscribe (wakes the hub, so it ends with the last subscriber)
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+            config.state_changed.set()
+
+    # publish changes to all subscribers
+    def publish(self, changes):
+        self.events += 1
+        for subscriber in self.subscribers:
+            subscriber.push(changes)
+
+    # run hub task (ends with the last subscriber)
+    async def run(self):
+        try:
+            while self.subscribers:
+                await config.state_changed.wait()
+                config.state_changed.clear()
+                changes = self.tracker.get_changes(self.version, self.tracker.boot)
+                self.version = self.tracker.version
+                if changes:
+                    self.publish(changes)
+        finally:
+            self.task = None
+
+
+# format server-sent event
+def format_event(event, data):
+    return f"event: {event}\ndata: {ujson.dumps(data)}\n\n".encode("utf-8")
+
+
+# stream events to a client (until the client closes the connection)
+async def stream_events(writer, subscriber):
+    try:
+        await writer.awrite(f"retry: {EVENTS_RETRY_MS}\n\n".encode("utf-8"))
+        await writer.awrite(format_event("state", state_tracker.get_changes()))
+        while True:
+            try:
+                await asyncio.wait_for_ms(subscriber.event.wait(), EVENTS_PING_MS)
+            except asyncio.TimeoutError:
+                await writer.awrite(b": ping\n\n")
+                continue
+            await writer.awrite(format_event("state", subscriber.take()))
+    except OSError as e:
+        log("INFO", "events: client closed: {}", e)
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+# instance EventHub()
+event_hub = EventHub(state_tracker)
@@ -1,13 +1,14 @@
 # imports
-import time  # https://docs.micropython.org/en/latest/library/time.html
 import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
 from src.log import log
 
 # from src.button import check_button
 from src.config import config  # Config() instance
 from src.lcd import print_lcd, print_lcd_char, rjust
-from src.relay import open_relay, close_relay
-from src.temp import temp_sensor, temp_sensor_2  # TemperatureSensor() instance
+from src.actuator import actuator  # Actuator() instance
+from src.valve import valve  # ValveModel() instance
+from src.sampler import sampler  # Sampler() instance
+from src.scheduler import scheduler  # Scheduler() instance
 
 # ==================================================
 # functions
@@ -111,16 +112,23 @@ def convert_utf8(string=""):
     return string
 
 
-# update current temp on lcd
-async def update_temp(sensor_number=1):
-    # set sensor postfix
-    sensor_postfix = f"_{sensor_number}" if sensor_number > 1 else ""
+# show latest temps of all sensors on lcd (without waiting for a measurement)
+def show_temps():
+    for name in sampler.samples:
+        show_temp(name, sampler.get(name))
 
-    # read temp
-    current_temp = await globals()[f"temp_sensor{sensor_postfix}"].get_temp()
 
-    # set temp
-    config.set_value(f"current_temp{sensor_postfix}", current_temp)
+# wait for a fresh sample and show the temps on lcd
+async def update_temps(max_age_ms=0):
+    await sampler.wait_fresh(max_age_ms)
+    show_temps()
+
+
+# show temp on lcd (only the sensors "temp" and "temp_2" have a place on the lcd)
+def show_temp(name, current_temp):
+    log("INFO", "update_{}({})", name, current_temp)
+    if name not in ("temp", "temp_2"):
+        return
 
     # set LCD columns once
     lcd_cols = config.get_int_value("LCD_COLS", 20)
@@ -130,14 +138,12 @@ async def update_temp(sensor_number=1):
     current_temp_string = rjust(f"{current_temp:.1f} °C", lcd_cols_half)
     current_temp_string_utf8 = convert_utf8(current_temp_string)
 
-    log("INFO", f"update_temp{sensor_postfix}({current_temp_string_utf8})")
-
     # print temp on LCD
     # ....................
     # temp 2     temp 1
     # -127.0 °C  -127.0 °C
     temp_pos = max(lcd_cols - len(current_temp_string), 0)
-    if sensor_number > 1:
+    if name == "temp_2":
         temp_pos = max(lcd_cols_half - len(current_temp_string), 0)
     print_lcd(0, temp_pos, current_temp_string_utf8, False)
 
@@ -164,7 +170,7 @@ def print_nominal_temp():
     print_lcd(1, temp_pos, nominal_temp)
 
 
-# set relay
+# set relay (queued in the actuator, returns when the movement is finished)
 async def set_relay(pin, relay_time):
     # load config
     current_temp = config.get_float_value("current_temp", -127.0)
@@ -174,16 +180,21 @@ async def set_relay(pin, relay_time):
     # only switch if the temperature can be read
     if 0 < current_temp <= 120:
         if pin == relay_open_pin:
-            print_lcd(3, 0, "öffne Ventil     >>>")
-            await open_relay(relay_time)
+            await actuator.move("open", relay_time)
         elif pin == relay_close_pin:
-            print_lcd(3, 0, "schließe Ventil: <<<")
-            await close_relay(relay_time)
+            await actuator.move("close", relay_time)
     else:
         print_lcd(3, 0, "Fehler: Temp Fehler!")
         await asyncio.sleep(2)
 
 
+# lcd message, if the valve is already at the end stop of a direction
+VALVE_END_STOP_MESSAGES = {
+    "open": "Ventil ist offen    ",
+    "close": "Ventil ist zu       ",
+}
+
+
 # open relays depending on temp
 async def open_relays(relay_time=config.get_int_value("relay_time", 1200)):
     # load config
@@ -193,18 +204,28 @@ async def open_relays(relay_time=config.get_int_value("relay_time", 1200)):
     relay_open_pin = config.get_int_value("RELAY_OPEN_PIN", 14)
     relay_close_pin = config.get_int_value("RELAY_CLOSE_PIN", 15)
 
-    # set stop timer
-    config.set_value("stop_timer", relay_time // 1000 + 1)
-
     if current_temp < nominal_min_temp:
         # increase temp
-        await set_relay(relay_close_pin, relay_time)
+        direction, relay_pin = "close", relay_close_pin
     elif current_temp > nominal_max_temp:
         # decrease temp
-        await set_relay(relay_open_pin, relay_time)
+        direction, relay_pin = "open", relay_open_pin
     else:
         # do nothing
         print_lcd(3, 0, "Soll Temp erreicht !")
+        return
+
+    # shorten the move at the end stop (skip it, if the valve is already there)
+    relay_time = valve.plan(direction, relay_time)
+    if relay_time == 0:
+        log("INFO", "open_relays(): valve at end stop ({})", direction)
+        print_lcd(3, 0, VALVE_END_STOP_MESSAGES[direction])
+        return
+
+    # set stop timer
+    config.set_value("stop_timer", relay_time // 1000 + 1)
+
+    await set_relay(relay_pin, relay_time)
 
 
 # update temp display
@@ -286,10 +307,10 @@ def format_time(secs):
 def update_timer(secs, message="Regle in:"):
     stop_timer = config.get_int_value("stop_timer", 0)
     if stop_timer >= 0:
-        log("INFO", f"stop_timer({stop_timer})")
+        log("INFO", "stop_timer({})", stop_timer)
         config.set_value("stop_timer", stop_timer - 1)
     else:
-        log("INFO", f"update_timer({secs})")
+        log("INFO", "update_timer({})", secs)
         config.set_value("timer", secs)
 
         time = format_time(secs)
@@ -299,31 +320,41 @@ def update_timer(secs, message="Regle in:"):
         print_lcd(3, cursor, time)
 
 
-# wait start
+# wait start (one tick per interval, the countdown is a job of the scheduler)
 async def wait_start(secs, lcd_text="Starte in:"):
-    log("INFO", f"wait start ({secs})")
+    log("INFO", "wait start ({})", secs)
 
     # load config
-    previous_millis = 0
-    interval = config.get_int_value("interval", 930)
+    interval = config.get_int_value("interval", 1000)
     temp_update_interval = config.get_int_value("temp_update_interval", 5)
 
-    while secs > 0:
-        current_millis = time.ticks_ms()
-        if time.ticks_diff(current_millis, previous_millis) > interval:
-            # update timer
-            update_timer(secs, lcd_text)
+    # set by the last tick
+    done = asyncio.Event()
+
+    # tick
+    def tick():
+        nonlocal secs
+        if secs <= 0:
+            job.cancel()
+            done.set()
+            return
+
+        # update timer
+        update_timer(secs, lcd_text)
 
-            # temp update on interval
-            if secs % temp_update_interval == 0:
-                await update_temp()
-                await update_temp(2)
+        # temp update on interval
+        if secs % temp_update_interval == 0:
+            show_temps()
 
-            # # check buttons
-            # await check_buttons()
+        # # check buttons
+        # await check_buttons()
 
-            # decrease secs
-            secs -= 1
-            previous_millis = current_millis
+        # decrease secs (the countdown ends with the last tick)
+        secs -= 1
+        if secs <= 0:
+            job.cancel()
+            done.set()
 
-        await asyncio.sleep(0.1)
+    # wait until the last tick (the scheduler task runs the ticks)
+    job = scheduler.add_periodic("wait_start", tick, interval, 0)
+    await done.wait()
@@ -0,0 +1,591 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.config import config  # Config() instance
+from src.config_store import crc32
+
+# requests per persistent connection
+KEEP_ALIVE_MAX_REQUESTS = 100
+
+# limits (sizes in bytes, timeouts in ms)
+max_connections = config.int_accessor("http_max_connections", 6)
+max_header_size = config.int_accessor("http_max_header_size", 1024)
+max_body_size = config.int_accessor("http_max_body_size", 2048)
+idle_timeout = config.int_accessor("http_idle_timeout", 5000)
+header_timeout = config.int_accessor("http_header_timeout", 5000)
+body_timeout = config.int_accessor("http_body_timeout", 5000)
+
+# counters
+http_stats = {
+    "accepted": 0,  # accepted connections
+    "active": 0,  # open connections
+    "max_active": 0,  # maximum of open connections
+    "rejected": 0,  # connections rejected with 503
+    "timed_out": 0,  # requests, that were not complete before their deadline
+    "too_large": 0,  # requests rejected with 431 or 413
+    "requests": 0,  # handled requests
+}
+
+# static assets are revalidated on every use (a 304 is cheap on a kept alive
+# connection and a new upload is visible immediately)
+STATIC_CACHE_CONTROL = "no-cache"
+
+# chunk size for streaming files
+FILE_CHUNK_SIZE = 1024
+
+# size and etag of static files (path -> (size, etag), None = file missing)
+file_infos = {}
+
+# buffer for reading files without awaiting (etag calculation)
+file_buffer = bytearray(FILE_CHUNK_SIZE)
+
+
+# ==================================================
+# class HttpError
+# ==================================================
+# request can not be handled, the connection is closed after the response
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+# ==================================================
+# class BufferPool
+# ==================================================
+# preallocated request buffers, one per connection (the heap does not grow or
+# fragment with the number of requests)
+class BufferPool:
+    def __init__(self, count, size):
+        self.size = size
+        self.free = [bytearray(size) for _ in range(count)]
+
+    # acquire buffer (None, if all buffers are in use)
+    def acquire(self):
+        return self.free.pop() if self.free else None
+
+    # release buffer
+    def release(self, buffer):
+        self.free.append(buffer)
+
+
+# ==================================================
+# class Request
+# ==================================================
+# parsed request. query and body are ranges of the connection buffer and are
+# only valid until the next request of the connection is read.
+class Request:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.reset()
+
+    # reset request
+    def reset(self):
+        self.method = ""
+        self.path = ""
+        self.query = None  # (start, end) in buffer
+        self.body = None  # (start, end) in buffer
+        self.params = None  # parsed query (decoding rewrites the buffer)
+        self.form = None  # parsed body
+        self.http_10 = False
+        self.connection_close = False
+        self.connection_keep_alive = False
+        self.gzip = False
+        self.if_none_match = None
+        self.content_length = 0
+
+    # keep connection alive after the response
+    def keep_alive(self):
+        if self.http_10:
+            return self.connection_keep_alive
+        return not self.connection_close
+
+    # accepts gzip content encoding
+    def accepts_gzip(self):
+        return self.gzip
+
+    # get query parameters (url decoded, parsed on the first call)
+    def get_params(self):
+        if self.params is None:
+            if self.query is None:
+                self.params = {}
+            else:
+                self.params = parse_urlencoded(
+                    self.buffer, self.query[0], self.query[1]
+                )
+        return self.params
+
+    # get urlencoded form data of the body (url decoded, parsed on the first call)
+    def get_form(self):
+        if self.form is None:
+            if self.body is None:
+                self.form = {}
+            else:
+                self.form = parse_urlencoded(self.buffer, self.body[0], self.body[1])
+        return self.form
+
+
+# ==================================================
+# class ChunkedWriter
+# ==================================================
+# writer for bodies of unknown length (Transfer-Encoding: chunked)
+class ChunkedWriter:
+    def __init__(self, writer):
+        self.writer = writer
+
+    # write chunk
+    async def awrite(self, data):
+        if len(data):
+            await self.writer.awrite(("%x\r\n" % len(data)).encode())
+            await self.writer.awrite(data)
+            await self.writer.awrite(b"\r\n")
+
+    # write last chunk
+    async def finish(self):
+        await self.writer.awrite(b"0\r\n\r\n")
+
+
+# accept connection (returns a request buffer, None if the connection is rejected)
+def accept_connection():
+    buffer = None
+    if http_stats["active"] < max_connections.get():
+        buffer = request_buffers.acquire()
+    if buffer is None:
+        http_stats["rejected"] += 1
+        return None
+    http_stats["accepted"] += 1
+    http_stats["active"] += 1
+    http_stats["max_active"] = max(http_stats["max_active"], http_stats["active"])
+    return buffer
+
+
+# release connection
+def release_connection(buffer):
+    http_stats["active"] -= 1
+    request_buffers.release(buffer)
+
+
+# reject connection (fast, without reading the request)
+async def reject_connection(writer):
+    await writer.awrite(
+        b"HTTP/1.1 503 Service Unavailable\r\n"
+        b"Content-Length: 0\r\nRetry-After: 1\r\nConnection: close\r\n\r\n"
+    )
+
+
+# get deadline in ticks_ms
+def get_deadline(timeout_ms):
+    return time.ticks_add(time.ticks_ms(), timeout_ms)
+
+
+# wait for reader function until deadline (raises asyncio.TimeoutError)
+async def read_until(deadline, function, *args):
+    remaining = time.ticks_diff(deadline, time.ticks_ms())
+    if remaining <= 0:
+        raise asyncio.TimeoutError
+    return await asyncio.wait_for_ms(function(*args), remaining)
+
+
+# bytearray.find() is missing on some micropython ports
+BYTEARRAY_FIND = hasattr(bytearray, "find")
+
+
+# find byte in buffer (-1, if not found)
+def find_byte(buffer, byte, start, end):
+    if BYTEARRAY_FIND:
+        return buffer.find(byte, start, end)
+    for index in range(start, end):
+        if buffer[index] == byte:
+            return index
+    return -1
+
+
+# compare buffer range with a lower case ascii name (case insensitive)
+def equals_lower(buffer, start, end, name):
+    if end - start != len(name):
+        return False
+    for index in range(len(name)):
+        if buffer[start + index] | 0x20 != name[index]:
+            return False
+    return True
+
+
+# buffer range contains a lower case ascii token (case insensitive)
+def contains_lower(buffer, start, end, token):
+    for offset in range(start, end - len(token) + 1):
+        if equals_lower(buffer, offset, offset + len(token), token):
+            return True
+    return False
+
+
+# strip spaces and tabs of a buffer range
+def strip_range(buffer, start, end):
+    while start < end and buffer[start] in (32, 9):
+        start += 1
+    while end > start and buffer[end - 1] in (32, 9):
+        end -= 1
+    return start, end
+
+
+# parse unsigned int of a buffer range (-1, if it is not a number)
+def parse_int(buffer, start, end):
+    if start == end:
+        return -1
+    value = 0
+    for index in range(start, end):
+        digit = buffer[index] - 48
+        if not 0 <= digit <= 9:
+            return -1
+        value = value * 10 + digit
+    return value
+
+
+# get value of a hex digit (-1, if it is no hex digit)
+def hex_value(byte):
+    if 48 <= byte <= 57:
+        return byte - 48
+    byte |= 0x20
+    if 97 <= byte <= 102:
+        return byte - 87
+    return -1
+
+
+# url decode buffer range in place ("%xx", "+" = " ") and return it as string
+def url_decode(buffer, start, end, plus_is_space=True):
+    # nothing to decode
+    if find_byte(buffer, 37, start, end) < 0 and (  # "%"
+        not plus_is_space or find_byte(buffer, 43, start, end) < 0  # "+"
+    ):
+        return str(memoryview(buffer)[start:end], "utf-8")
+
+    read = start
+    write = start
+    while read < end:
+        byte = buffer[read]
+        if byte == 43 and plus_is_space:  # "+"
+            byte = 32
+        elif byte == 37 and read + 2 < end:  # "%"
+            high = hex_value(buffer[read + 1])
+            low = hex_value(buffer[read + 2])
+            if high >= 0 and low >= 0:
+                byte = high * 16 + low
+                read += 2
+        buffer[write] = byte
+        write += 1
+        read += 1
+    return str(memoryview(buffer)[start:write], "utf-8")
+
+
+# parse urlencoded buffer range "key=value&key" (values are decoded in place)
+def parse_urlencoded(buffer, start, end):
+    params = {}
+    while start < end:
+        pair_end = find_byte(buffer, 38, start, end)  # "&"
+        if pair_end < 0:
+            pair_end = end
+        equal = find_byte(buffer, 61, start, pair_end)  # "="
+        if equal < 0:
+            key = url_decode(buffer, start, pair_end)
+            value = None
+        else:
+            key = url_decode(buffer, start, equal)
+            value = url_decode(buffer, equal + 1, pair_end)
+        if key:
+            params[key] = value
+        start = pair_end + 1
+    return params
+
+
+# read from reader into a memoryview (0, if the client closed the connection)
+async def read_into(reader, view):
+    if hasattr(reader, "readinto"):
+        return await reader.readinto(view) or 0
+    data = await reader.read(len(view))
+    view[: len(data)] = data
+    return len(data)
+
+
+# ==================================================
+# class Connection
+# ==================================================
+# incremental request parser of a connection. requests are received into the
+# pooled buffer of the connection and parsed in place, only the method, the
+# path and the values of a few headers become strings.
+class Connection:
+    def __init__(self, reader, buffer):
+        self.reader = reader
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.start = 0  # first byte of the next (pipelined) request
+        self.end = 0  # end of the received bytes
+        self.request = Request(buffer)
+
+    # receive bytes until deadline (0, if the client closed the connection)
+    async def receive(self, deadline):
+        if self.end >= len(self.buffer):
+            return 0
+        count = await read_until(
+            deadline, read_into, self.reader, self.view[self.end :]
+        )
+        self.end += count
+        return count
+
+    # parse request line
+    def parse_request_line(self, start, end):
+        buffer = self.buffer
+        request = self.request
+        space = find_byte(buffer, 32, start, end)
+        space_2 = find_byte(buffer, 32, space + 1, end) if space > 0 else -1
+        if space_2 < 0:
+            raise HttpError("400 Bad Request")
+        request.method = str(self.view[start:space], "utf-8")
+        path_end = find_byte(buffer, 63, space + 1, space_2)  # "?"
+        if path_end < 0:
+            path_end = space_2
+        else:
+            request.query = (path_end + 1, space_2)
+        request.path = url_decode(buffer, space + 1, path_end, False)
+        request.http_10 = equals_lower(buffer, space_2 + 1, end, b"http/1.0")
+
+    # parse header line (only the headers used by the webserver)
+    def parse_header(self, start, end):
+        buffer = self.buffer
+        request = self.request
+        colon = find_byte(buffer, 58, start, end)  # ":"
+        if colon < 0:
+            return
+        value_start, value_end = strip_range(buffer, colon + 1, end)
+        if equals_lower(buffer, start, colon, b"content-length"):
+            request.content_length = parse_int(buffer, value_start, value_end)
+            if request.content_length < 0:
+                raise HttpError("400 Bad Request")
+        elif equals_lower(buffer, start, colon, b"connection"):
+            request.connection_close = contains_lower(
+                buffer, value_start, value_end, b"close"
+            )
+            request.connection_keep_alive = contains_lower(
+                buffer, value_start, value_end, b"keep-alive"
+            )
+        elif equals_lower(buffer, start, colon, b"accept-encoding"):
+            request.gzip = contains_lower(buffer, value_start, value_end, b"gzip")
+        elif equals_lower(buffer, start, colon, b"if-none-match"):
+            request.if_none_match = str(self.view[value_start:value_end], "utf-8")
+
+    # read request
+    #   None, if the client closed the connection or stayed idle
+    #   HttpError, if the request is too large or not complete before its deadline
+    async def read_request(self):
+        buffer = self.buffer
+        request = self.request
+        request.reset()
+
+        # move bytes of a pipelined request to the start of the buffer
+        if self.start:
+            left = self.end - self.start
+            if left:
+                buffer[:left] = bytes(self.view[self.start : self.end])
+            self.start = 0
+            self.end = left
+
+        # idle phase (wait for the first bytes)
+        if self.end == 0:
+            try:
+                if not await self.receive(get_deadline(idle_timeout.get())):
+                    return None
+            except asyncio.TimeoutError:
+                return None
+
+        # head phase (parse every line as soon as it is received)
+        head_limit = min(max_header_size.get(), len(buffer))
+        deadline = get_deadline(header_timeout.get())
+        line_start = 0
+        first_line = True
+        while True:
+            newline = find_byte(buffer, 10, line_start, self.end)
+            if newline < 0 or newline >= head_limit:
+                if self.end >= head_limit:
+                    http_stats["too_large"] += 1
+                    raise HttpError("431 Request Header Fields Too Large")
+                try:
+                    if not await self.receive(deadline):
+                        return None
+                except asyncio.TimeoutError:
+                    http_stats["timed_out"] += 1
+                    raise HttpError("408 Request Timeout")
+                continue
+            line_end = newline
+            if line_end > line_start and buffer[line_end - 1] == 13:  # "\r"
+                line_end -= 1
+            empty_line = line_end == line_start
+            if empty_line:
+                pass
+            elif first_line:
+                self.parse_request_line(line_start, line_end)
+                first_line = False
+            else:
+                self.parse_header(line_start, line_end)
+            line_start = newline + 1
+            if empty_line and not first_line:
+                break  # end of head
+
+        # body phase
+        body_start = line_start
+        body_end = body_start + request.content_length
+        if request.content_length > min(max_body_size.get(), len(buffer) - body_start):
+            http_stats["too_large"] += 1
+            raise HttpError("413 Payload Too Large")
+        deadline = get_deadline(body_timeout.get())
+        while self.end < body_end:
+            try:
+                if not await self.receive(deadline):
+                    return None
+            except asyncio.TimeoutError:
+                http_stats["timed_out"] += 1
+                raise HttpError("408 Request Timeout")
+        request.body = (body_start, body_end)
+        self.start = body_end
+
+        http_stats["requests"] += 1
+        return request
+
+
+# write response headers
+async def send_headers(
+    writer,
+    status="200 OK",
+    content_type=None,
+    content_length=None,
+    keep_alive=True,
+    headers=None,
+):
+    lines = [f"HTTP/1.1 {status}"]
+    if content_type:
+        lines.append(f"Content-Type: {content_type}")
+    if content_length is not None:
+        lines.append(f"Content-Length: {content_length}")
+    if headers:
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    lines.append("\r\n")
+    await writer.awrite("\r\n".join(lines).encode("utf-8"))
+
+
+# send response with a body of known size (str, bytes or a list of bytes)
+async def send_response(
+    writer,
+    content_type="text/html; charset=utf-8",
+    content=None,
+    status="200 OK",
+    keep_alive=True,
+    headers=None,
+):
+    if content is None:
+        chunks = []
+    elif isinstance(content, str):
+        chunks = [content.encode("utf-8")]
+    elif isinstance(content, (bytes, bytearray, memoryview)):
+        chunks = [content]
+    else:
+        chunks = content
+
+    # 304 has no body and no content length
+    content_length = None
+    if not status.startswith("304"):
+        content_length = sum(len(chunk) for chunk in chunks)
+    else:
+        content_type = None
+
+    await send_headers(
+        writer, status, content_type, content_length, keep_alive, headers
+    )
+    for chunk in chunks:
+        await writer.awrite(chunk)
+
+
+# send response with a body of unknown size, render(writer) writes the body
+async def send_stream(
+    writer, content_type="text/html; charset=utf-8", render=None, keep_alive=True
+):
+    headers = {"Transfer-Encoding": "chunked", "Cache-Control": "no-store"}
+    await send_headers(writer, "200 OK", content_type, None, keep_alive, headers)
+    chunked_writer = ChunkedWriter(writer)
+    await render(chunked_writer)
+    await chunked_writer.finish()
+
+
+# get size and strong etag of a file (cached, None if the file is missing)
+def get_file_info(file_path):
+    if file_path in file_infos:
+        return file_infos[file_path]
+    try:
+        size = 0
+        crc = 0
+        with open(file_path, "rb") as file:
+            while True:
+                count = file.readinto(file_buffer)
+                if not count:
+                    break
+                crc = crc32(memoryview(file_buffer)[:count], crc)
+                size += count
+        info = (size, '"%08x-%x"' % (crc, size))
+    except OSError:
+        info = None
+    file_infos[file_path] = info
+    return info
+
+
+# etag matches If-None-Match header
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for value in if_none_match.split(","):
+        if value.strip() == etag:
+            return True
+    return False
+
+
+# send static file (precompressed file_path + ".gz", if the client accepts gzip)
+async def send_file(writer, request, file_path, content_type, keep_alive=True):
+    headers = {"Cache-Control": STATIC_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    info = None
+    if request.accepts_gzip():
+        info = get_file_info(file_path + ".gz")
+        if info is not None:
+            file_path += ".gz"
+            headers["Content-Encoding"] = "gzip"
+    if info is None:
+        info = get_file_info(file_path)
+    if info is None:
+        await send_response(
+            writer, "text/plain", "Not Found", "404 Not Found", keep_alive
+        )
+        return
+
+    # not modified
+    size, etag = info
+    headers["ETag"] = etag
+    if etag_matches(request.if_none_match, etag):
+        await send_response(
+            writer, status="304 Not Modified", keep_alive=keep_alive, headers=headers
+        )
+        return
+
+    # stream file (own buffer, other clients may stream at the same time)
+    await send_headers(writer, "200 OK", content_type, size, keep_alive, headers)
+    buffer = bytearray(min(size, FILE_CHUNK_SIZE) or 1)
+    buffer_view = memoryview(buffer)
+    with open(file_path, "rb") as file:
+        while True:
+            count = file.readinto(buffer)
+            if not count:
+                break
+            await writer.awrite(buffer_view[:count])
+
+
+# instance BufferPool() (size changes need a reset)
+request_buffers = BufferPool(
+    max_connections.get(), max_header_size.get() + max_body_size.get()
+)
@@ -1,11 +1,14 @@
 # imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
 from machine import (
     I2C,
     Pin,
 )  # https://docs.micropython.org/en/latest/library/machine.html
-from src.machine_i2c_lcd import I2cLcd  # I2C LCD
+from src.machine_i2c_lcd import I2cLcd, BYTES_PER_LCD_BYTE  # I2C LCD
 from src.log import log
 from src.config import config  # Config() instance
+from src.metrics import metrics  # Metrics() instance
 
 # setup i2c
 sda_pin = Pin(config.get_int_value("LCD_PIN_SDA", 20))
@@ -38,13 +41,40 @@ try:
     lcd.custom_char(1, bytearray(arrow_down))
 
 except OSError as e:
-    log("ERROR", f"LCD: could not be loaded: {e}")
+    log("ERROR", "LCD: could not be loaded: {}", e)
 
 lcd_lines = [
     "".join([" " for _ in range(config.get_int_value("LCD_COLS", 20))])
     for _ in range(config.get_int_value("LCD_ROWS", 4))
 ]
 
+# lcd frame (what the lcd is currently showing, as HD44780 character codes)
+lcd_frame = [bytearray(b" " * lcd_cols) for _ in range(lcd_rows)]
+
+# unchanged cells between two changed runs, that are rewritten instead of moving
+# the cursor (a move_to() costs one command byte, a rewritten cell one data byte)
+LCD_MAX_RUN_GAP = 1
+
+# rows changed since the last flush (rendered by run_display())
+lcd_dirty = [False for _ in range(lcd_rows)]
+lcd_dirty_event = asyncio.Event()
+
+# render statistics
+lcd_stats = {
+    "frames": 0,
+    "runs": 0,
+    "moves": 0,
+    "chars": 0,
+    "bus_bytes": 0,
+    "last_frame_runs": 0,
+    "last_frame_moves": 0,
+    "last_frame_chars": 0,
+    "last_frame_bus_bytes": 0,
+}
+
+# memory and time accounting
+display_metrics = metrics.get("display")
+
 # ==================================================
 # functions
 # ==================================================
@@ -53,15 +83,18 @@ lcd_lines = [
 # init lcd
 def init_lcd():
     if lcd is not None:
-        if config.get_bool_value("lcd_i2c_backlight", True):
-            lcd.backlight_on()
-        else:
-            lcd.backlight_off()
-        lcd.hide_cursor()
-        lcd.blink_cursor_off()
-        lcd.clear()
+        with display_metrics:
+            if config.get_bool_value("lcd_i2c_backlight", True):
+                lcd.backlight_on()
+            else:
+                lcd.backlight_off()
+            lcd.hide_cursor()
+            lcd.blink_cursor_off()
+            lcd.clear()
+            reset_lcd_frame()
+            render_lcd()
     else:
-        log("ERROR", f"LCD: could not be initialized")
+        log("ERROR", "LCD: could not be initialized")
 
 
 # set backlight
@@ -69,10 +102,10 @@ def set_backlight(value=True):
     if lcd is not None:
         if value:
             lcd.backlight_on()
-            log("INFO", f"LCD: turn backlight on")
+            log("INFO", "LCD: turn backlight on")
         else:
             lcd.backlight_off()
-            log("INFO", f"LCD: turn backlight off")
+            log("INFO", "LCD: turn backlight off")
 
 
 # show cursor
@@ -80,10 +113,10 @@ def show_cursor(value=True):
     if lcd is not None:
         if value:
             lcd.show_cursor()
-            log("INFO", f"LCD: show cursor")
+            log("INFO", "LCD: show cursor")
         else:
             lcd.hide_cursor()
-            log("INFO", f"hide cursor")
+            log("INFO", "hide cursor")
 
 
 # blink cursor
@@ -91,17 +124,18 @@ def blink_cursor(value=True):
     if lcd is not None:
         if value:
             lcd.blink_cursor_on()
-            log("INFO", f"LCD: blink cursor on")
+            log("INFO", "LCD: blink cursor on")
         else:
             lcd.blink_cursor_off()
-            log("INFO", f"LCD: blink cursor off")
+            log("INFO", "LCD: blink cursor off")
 
 
 # clear lcd
 def clear_lcd():
     if lcd is not None:
         lcd.clear()
-        log("INFO", f"LCD: clear")
+        reset_lcd_frame()
+        log("INFO", "LCD: clear")
 
 
 # convert utf-8 characters to HD44780A00 characters
@@ -171,6 +205,124 @@ def set_lcd_line(line=0, cursor=0, message=""):
     lcd_lines[line] = str(part1 + part2 + part3)[: config.get_int_value("LCD_COLS", 20)]
 
 
+# reset lcd frame (lcd shows only spaces after clear)
+def reset_lcd_frame():
+    for row in lcd_frame:
+        for col in range(len(row)):
+            row[col] = 32
+
+
+# encode lcd line to HD44780A00 character codes
+def encode_lcd_line(string=""):
+    string = convert_HD44780A00(string)
+    encoded = bytearray(len(string))
+    for i, char in enumerate(string):
+        if char == "↑":
+            encoded[i] = 0  # custom character 0 (arrow up)
+        elif char == "↓":
+            encoded[i] = 1  # custom character 1 (arrow down)
+        else:
+            encoded[i] = ord(char) & 0xFF
+    return encoded
+
+
+# get runs of changed cells as (start, end) tuples
+def get_changed_runs(target, frame, max_gap=LCD_MAX_RUN_GAP):
+    runs = []
+    start = -1
+    last = -1
+    for col in range(min(len(target), len(frame))):
+        if target[col] != frame[col]:
+            if start < 0:
+                start = col
+            elif col - last - 1 > max_gap:
+                runs.append((start, last + 1))
+                start = col
+            last = col
+    if start >= 0:
+        runs.append((start, last + 1))
+    return runs
+
+
+# render lcd (push only changed cells of lcd_lines to the lcd)
+def render_lcd(line=None):
+    rows = range(len(lcd_frame)) if line is None else (int(line),)
+    runs_count = 0
+    moves = 0
+    chars = 0
+
+    for row in rows:
+        target = encode_lcd_line(lcd_lines[row])
+        frame = lcd_frame[row]
+        for start, end in get_changed_runs(target, frame):
+            runs_count += 1
+            if lcd is not None:
+                # the lcd increments the cursor itself, so only move if necessary
+                if lcd.cursor_x != start or lcd.cursor_y != row:
+                    lcd.move_to(start, row)  # lcd.move_to(col, row)
+                    moves += 1
+                lcd.hal_write_data_bulk(target, start, end)
+                lcd.cursor_x = end
+            chars += end - start
+            frame[start:end] = target[start:end]
+
+    # update statistics
+    bus_bytes = (moves + chars) * BYTES_PER_LCD_BYTE
+    lcd_stats["frames"] += 1
+    lcd_stats["runs"] += runs_count
+    lcd_stats["moves"] += moves
+    lcd_stats["chars"] += chars
+    lcd_stats["bus_bytes"] += bus_bytes
+    lcd_stats["last_frame_runs"] = runs_count
+    lcd_stats["last_frame_moves"] = moves
+    lcd_stats["last_frame_chars"] = chars
+    lcd_stats["last_frame_bus_bytes"] = bus_bytes
+
+    return bus_bytes
+
+
+# get lcd stats
+def get_lcd_stats():
+    return lcd_stats
+
+
+# mark lcd line as changed and wake up the display task
+def mark_lcd_dirty(line=0):
+    lcd_dirty[int(line)] = True
+    lcd_dirty_event.set()
+    config.state_changed.set()
+
+
+# flush lcd (render all changed lines)
+def flush_lcd():
+    bus_bytes = 0
+    with display_metrics:
+        for row in range(len(lcd_dirty)):
+            if lcd_dirty[row]:
+                lcd_dirty[row] = False
+                bus_bytes += render_lcd(row)
+    return bus_bytes
+
+
+# run display (render changed lines with at most lcd_max_fps frames per second)
+async def run_display():
+    log("INFO", "run_display()")
+    last_frame_ms = None
+    while True:
+        await lcd_dirty_event.wait()
+
+        # collect further changes until the next frame (no wakeup, if the last
+        # frame is older than a frame time)
+        frame_time = int(1000 / max(0.1, config.get_float_value("lcd_max_fps", 4)))
+        if last_frame_ms is not None:
+            wait_ms = frame_time - time.ticks_diff(time.ticks_ms(), last_frame_ms)
+            if 0 < wait_ms <= frame_time:
+                await asyncio.sleep_ms(wait_ms)
+        lcd_dirty_event.clear()
+        last_frame_ms = time.ticks_ms()
+        flush_lcd()
+
+
 # print lcd
 def print_lcd(line=0, cursor=0, message="", fill=True):
     line = int(line)
@@ -184,14 +336,8 @@ def print_lcd(line=0, cursor=0, message="", fill=True):
     # set lcd line
     set_lcd_line(line, cursor, message)
 
-    # convert utf-8 characters to HD44780A00 characters
-    message = convert_HD44780A00(message)
-
-    # print lcd
-    if lcd is not None:
-        lcd.move_to(cursor, line)  # lcd.move_to(col, row)
-        lcd.putstr(message)
-        lcd.hide_cursor()
+    # print lcd on next frame
+    mark_lcd_dirty(line)
 
 
 # print lcd custom character
@@ -215,6 +361,5 @@ def print_lcd_char(line=0, cursor=0, char=0):
         current_line[:cursor] + char_string + current_line[cursor + 1 :],
     )
 
-    if lcd is not None:
-        lcd.move_to(cursor, line)  # lcd.move_to(col, row)
-        lcd.putchar(chr(char))
+    # print lcd on next frame
+    mark_lcd_dirty(line)
@@ -157,9 +157,34 @@ class LcdApi:
     def putstr(self, string):
         """Write the indicated string to the LCD at the current cursor
         position and advances the cursor position appropriately.
+
+        Consecutive characters on the same line are sent with a single
+        hal_write_data_bulk() call. The cursor and line wrap behave exactly
+        like calling putchar() for every character.
         """
-        for char in string:
-            self.putchar(char)
+        newline = '\n' if isinstance(string, str) else 0x0a
+        length = len(string)
+        i = 0
+        while i < length:
+            if string[i] == newline:
+                self.putchar('\n')
+                i += 1
+                continue
+            end = min(length, i + max(1, self.num_columns - self.cursor_x))
+            j = i
+            while j < end and string[j] != newline:
+                j += 1
+            self.hal_write_data_bulk(string, i, j)
+            self.cursor_x += j - i
+            i = j
+            # the lcd increments its address itself, only wrapping needs a move
+            if self.cursor_x >= self.num_columns:
+                self.cursor_x = 0
+                self.cursor_y += 1
+                self.implied_newline = True
+                if self.cursor_y >= self.num_lines:
+                    self.cursor_y = 0
+                self.move_to(self.cursor_x, self.cursor_y)
 
     def custom_char(self, location, charmap):
         """Write a character to one of the 8 CGRAM locations, available
@@ -203,6 +228,18 @@ class LcdApi:
         """
         raise NotImplementedError
 
+    def hal_write_data_bulk(self, data, start=0, end=None):
+        """Write several data bytes (str, bytes or bytearray) to the LCD.
+
+        A derived HAL class may implement this function to send all bytes
+        at once. The default implementation writes them one by one.
+        """
+        if end is None:
+            end = len(data)
+        is_str = isinstance(data, str)
+        for i in range(start, end):
+            self.hal_write_data(ord(data[i]) if is_str else data[i])
+
     # This is a default implementation of hal_sleep_us which is suitable
     # for most micropython implementations. For platforms which don't
     # support `time.sleep_us()` they should provide their own implementation
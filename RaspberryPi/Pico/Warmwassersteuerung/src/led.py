@@ -14,12 +14,12 @@ def set_led(value):
         led = Pin("LED", Pin.OUT)
         led.value(bool(value))
         if value:
-            log("INFO", f"LED: on")
+            log("INFO", "LED: on")
         else:
-            log("INFO", f"LED: off")
+            log("INFO", "LED: off")
 
     except Exception as e:
-        log("ERROR", f"LED: could not be set: {e}")
+        log("ERROR", "LED: could not be set: {}", e)
 
 
 # init led
@@ -1,20 +1,94 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
 from src.config import config  # Config() instance
 
+# log levels
+LEVELS = {"OFF": 0, "ERROR": 1, "WARN": 2, "INFO": 3, "VERBOSE": 4}
 
-# log messages to console
-def log(level="INFO", message=""):
-    level = level.upper()
-    levels = {"OFF": 0, "ERROR": 1, "WARN": 2, "INFO": 3, "VERBOSE": 4}
-    log_level = config.get_value("log_level", "OFF").upper()
 
-    # disable log, if log_level is not valid
-    if log_level not in levels:
-        log_level = "OFF"
+# ==================================================
+# class LogBuffer
+# ==================================================
+# fixed size ring buffer for the latest log lines (preallocated, never grows)
+class LogBuffer:
+    def __init__(self, size=2048):
+        self.size = max(64, int(size))
+        self.buffer = bytearray(self.size)
+        self.pos = 0
+        self.wrapped = False
 
-    if log_level != "OFF" and levels[level] <= levels[log_level]:
-        # convert VERBOSE to INFO
-        if level == "VERBOSE":
-            level = "INFO"
+    # write data into the ring buffer
+    def write(self, data):
+        data = memoryview(data)
+        if len(data) > self.size:
+            data = data[len(data) - self.size :]
+        while len(data):
+            count = min(len(data), self.size - self.pos)
+            self.buffer[self.pos : self.pos + count] = data[:count]
+            self.pos += count
+            data = data[count:]
+            if self.pos == self.size:
+                self.pos = 0
+                self.wrapped = True
 
-        # print log
+    # get buffer content as chunks, oldest first (a cut first line is skipped)
+    def chunks(self):
+        if not self.wrapped:
+            return [bytes(self.buffer[: self.pos])]
+        start = self.pos
+        while start < self.size and self.buffer[start] != 10:  # "\n"
+            start += 1
+        return [bytes(self.buffer[start + 1 :]), bytes(self.buffer[: self.pos])]
+
+    # clear buffer
+    def clear(self):
+        self.pos = 0
+        self.wrapped = False
+
+
+# get log level number of a config key
+def get_log_level(key, default="OFF"):
+    return LEVELS.get(str(config.get_value(key, default)).upper(), 0)
+
+
+# cached log levels (updated on config.set_value())
+console_level = config.accessor("log_level", get_log_level, "OFF")
+buffer_level = config.accessor("log_buffer_level", get_log_level, "WARN")
+
+# instance LogBuffer()
+log_buffer = LogBuffer(config.get_int_value("log_buffer_size", 2048))
+
+
+# log messages to console and log buffer
+# the message is only formatted with args, if it is logged:
+#   log("INFO", "update_timer({})", secs)
+def log(level="INFO", message="", *args):
+    level_number = LEVELS.get(level, 0)
+    if level_number == 0:
+        level = level.upper()
+        level_number = LEVELS.get(level, 0)
+    to_console = level_number <= console_level.get()
+    to_buffer = level_number <= buffer_level.get()
+    if level_number == 0 or not (to_console or to_buffer):
+        return
+
+    # format message
+    if args:
+        message = message.format(*args)
+
+    # convert VERBOSE to INFO
+    if level == "VERBOSE":
+        level = "INFO"
+
+    # print log
+    if to_console:
         print(f"{level}: {message}")
+
+    # write log buffer
+    if to_buffer:
+        log_buffer.write(f"{time.ticks_ms()} {level}: {message}\n".encode("utf-8"))
+
+
+# get log chunks (for streaming the log buffer)
+def get_log_chunks():
+    return log_buffer.chunks()
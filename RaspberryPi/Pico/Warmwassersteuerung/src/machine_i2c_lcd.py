@@ -1,4 +1,5 @@
 from src.lcd_api import LcdApi
+from src.metrics import metrics
 from time import sleep_ms
 
 # The PCF8574 has a jumper selectable address: 0x20 - 0x27
@@ -12,6 +13,12 @@ MASK_E = 0x04
 SHIFT_BACKLIGHT = 3
 SHIFT_DATA = 4
 
+# Every LCD byte is sent as 4 I2C bytes (high and low nibble, each with E high/low)
+BYTES_PER_LCD_BYTE = 4
+
+# Number of LCD data bytes that are sent with a single writeto()
+BULK_DATA_BYTES = 40
+
 
 class I2cLcd(LcdApi):
     """Implements a HD44780 character LCD connected via PCF8574 on I2C."""
@@ -19,7 +26,11 @@ class I2cLcd(LcdApi):
     def __init__(self, i2c, i2c_addr, num_lines, num_columns):
         self.i2c = i2c
         self.i2c_addr = i2c_addr
-        self.i2c.writeto(self.i2c_addr, bytearray([0]))
+        # Preallocated buffers for the nibble sequences sent to the PCF8574
+        self.cmd_buf = bytearray(BYTES_PER_LCD_BYTE)
+        self.data_buf = bytearray(BULK_DATA_BYTES * BYTES_PER_LCD_BYTE)
+        self.data_mv = memoryview(self.data_buf)
+        self.hal_writeto(bytearray([0]))
         sleep_ms(20)  # Allow LCD time to powerup
         # Send reset 3 times
         self.hal_write_init_nibble(self.LCD_FUNCTION_RESET)
@@ -37,49 +48,73 @@ class I2cLcd(LcdApi):
             cmd |= self.LCD_FUNCTION_2LINES
         self.hal_write_command(cmd)
 
+    def hal_writeto(self, buf):
+        """Sends buf to the PCF8574 with a single I2C transaction."""
+        self.i2c.writeto(self.i2c_addr, buf)
+        metrics.count("i2c_transactions")
+
     def hal_write_init_nibble(self, nibble):
         """Writes an initialization nibble to the LCD.
         This particular function is only used during initialization.
         """
         byte = ((nibble >> 4) & 0x0F) << SHIFT_DATA
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.hal_writeto(bytearray([byte | MASK_E]))
+        self.hal_writeto(bytearray([byte]))
 
     def hal_backlight_on(self):
         """Allows the hal layer to turn the backlight on."""
-        self.i2c.writeto(self.i2c_addr, bytearray([1 << SHIFT_BACKLIGHT]))
+        self.hal_writeto(bytearray([1 << SHIFT_BACKLIGHT]))
 
     def hal_backlight_off(self):
         """Allows the hal layer to turn the backlight off."""
-        self.i2c.writeto(self.i2c_addr, bytearray([0]))
+        self.hal_writeto(bytearray([0]))
 
     def hal_write_command(self, cmd):
         """Writes a command to the LCD.
         Data is latched on the falling edge of E.
         """
-        byte = (self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0F) << SHIFT_DATA)
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0F) << SHIFT_DATA)
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.hal_fill_nibbles(self.cmd_buf, 0, cmd, self.backlight << SHIFT_BACKLIGHT)
+        self.hal_writeto(self.cmd_buf)
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
             sleep_ms(5)
 
     def hal_write_data(self, data):
         """Write data to the LCD."""
-        byte = (
-            MASK_RS
-            | (self.backlight << SHIFT_BACKLIGHT)
-            | (((data >> 4) & 0x0F) << SHIFT_DATA)
-        )
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (
-            MASK_RS
-            | (self.backlight << SHIFT_BACKLIGHT)
-            | ((data & 0x0F) << SHIFT_DATA)
+        self.hal_fill_nibbles(
+            self.cmd_buf, 0, data, MASK_RS | (self.backlight << SHIFT_BACKLIGHT)
         )
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.hal_writeto(self.cmd_buf)
+
+    def hal_write_data_bulk(self, data, start=0, end=None):
+        """Write several data bytes (str, bytes or bytearray) to the LCD.
+        The bytes are expanded into the E high/low nibble sequence in a
+        preallocated buffer, which is sent with a single writeto() for up to
+        BULK_DATA_BYTES bytes.
+        """
+        if end is None:
+            end = len(data)
+        is_str = isinstance(data, str)
+        flags = MASK_RS | (self.backlight << SHIFT_BACKLIGHT)
+        buf = self.data_buf
+        size = len(buf)
+        pos = 0
+        for i in range(start, end):
+            byte = ord(data[i]) & 0xFF if is_str else data[i]
+            self.hal_fill_nibbles(buf, pos, byte, flags)
+            pos += BYTES_PER_LCD_BYTE
+            if pos == size:
+                self.hal_writeto(buf)
+                pos = 0
+        if pos:
+            self.hal_writeto(self.data_mv[:pos])
+
+    @staticmethod
+    def hal_fill_nibbles(buf, pos, byte, flags):
+        """Writes the 4 I2C bytes for one LCD byte into buf at pos."""
+        high = flags | (((byte >> 4) & 0x0F) << SHIFT_DATA)
+        low = flags | ((byte & 0x0F) << SHIFT_DATA)
+        buf[pos] = high | MASK_E
+        buf[pos + 1] = high
+        buf[pos + 2] = low | MASK_E
+        buf[pos + 3] = low
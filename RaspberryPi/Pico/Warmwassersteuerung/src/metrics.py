@@ -0,0 +1,206 @@
+# imports
+import gc  # https://docs.micropython.org/en/latest/library/gc.html
+import time  # https://docs.micropython.org/en/latest/library/time.html
+
+# subsystems, which allocations and time are accounted
+SUBSYSTEMS = ("display", "sensors", "webserver", "config", "relay")
+
+# counted events (the handled requests are counted in http_stats, /metrics exports
+# them as wws_http_requests_total)
+EVENTS = ("flash_writes", "i2c_transactions", "sensor_errors")
+
+# precision of the largest free block search in bytes
+FREE_BLOCK_STEP = 64
+
+# largest test allocation of the search in bytes (a bigger free block is reported
+# as this size, it is enough for every buffer of the firmware)
+FREE_BLOCK_MAX = 16384
+
+# interval of the largest free block search in seconds (it runs in collect(), the
+# test allocations of the search are not free)
+FREE_BLOCK_INTERVAL_S = 300
+
+# upper bounds of the histogram buckets in microseconds (the last bucket has no
+# upper bound)
+HISTOGRAM_BOUNDS_US = (
+    1000,
+    2000,
+    5000,
+    10000,
+    20000,
+    50000,
+    100000,
+    200000,
+    500000,
+    1000000,
+    2000000,
+)
+
+
+# ==================================================
+# class Histogram
+# ==================================================
+# durations in buckets (the counts are not cumulative, /metrics adds them up)
+class Histogram:
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_US):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    # add duration
+    def add(self, value_us):
+        index = 0
+        for bound in self.bounds:
+            if value_us <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    # get histogram for the api (milliseconds)
+    def to_dict(self):
+        return {
+            "bounds_ms": [bound / 1000 for bound in self.bounds],
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum_ms": self.sum_us / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+
+
+# ==================================================
+# class Subsystem
+# ==================================================
+# calls, time and allocated bytes of a subsystem. synchronous code uses the
+# context manager (nested sections only count once), code with awaits uses
+# begin() / end(), its numbers include the tasks, that ran meanwhile. an
+# allocation delta is dropped, if the gc ran during the section (it is
+# negative then).
+class Subsystem:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time_us = 0
+        self.alloc_bytes = 0  # allocated bytes of all sections
+        self.alloc_max = 0  # maximum allocation of a single section
+        self.depth = 0
+        self.start_us = 0
+        self.start_alloc = 0
+
+    def __enter__(self):
+        self.depth += 1
+        if self.depth == 1:
+            self.start_alloc = gc.mem_alloc()
+            self.start_us = time.ticks_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if self.depth == 0:
+            self.add(self.start_us, self.start_alloc)
+        return False
+
+    # begin section (returns the start values for end())
+    def begin(self):
+        return (time.ticks_us(), gc.mem_alloc())
+
+    # end section
+    def end(self, start):
+        self.add(start[0], start[1])
+
+    # add section
+    def add(self, start_us, start_alloc):
+        self.calls += 1
+        self.time_us += time.ticks_diff(time.ticks_us(), start_us)
+        alloc = gc.mem_alloc() - start_alloc
+        if alloc > 0:
+            self.alloc_bytes += alloc
+            self.alloc_max = max(self.alloc_max, alloc)
+        metrics.sample_heap()
+
+
+# ==================================================
+# class Metrics
+# ==================================================
+# memory and time accounting per subsystem, heap watermarks and event counters
+# (exported by /metrics in the prometheus text format)
+class Metrics:
+    def __init__(self):
+        self.start_time = time.time()
+        self.subsystems = {}
+        for name in SUBSYSTEMS:
+            self.subsystems[name] = Subsystem(name)
+        self.events = {}
+        for name in EVENTS:
+            self.events[name] = 0
+        self.alloc_max = 0  # high water mark of the allocated heap
+        self.free_min = None  # low water mark of the free heap
+        self.largest_free_block = None  # of the last search
+        self.free_block_time = None  # time of the last search
+        self.gc_collections = 0
+        self.gc_time_us = 0
+        self.gc_freed_bytes = 0
+
+    # get subsystem
+    def get(self, name):
+        return self.subsystems[name]
+
+    # count event
+    def count(self, name, count=1):
+        self.events[name] = self.events.get(name, 0) + count
+
+    # update heap watermarks
+    def sample_heap(self):
+        alloc = gc.mem_alloc()
+        free = gc.mem_free()
+        if alloc > self.alloc_max:
+            self.alloc_max = alloc
+        if self.free_min is None or free < self.free_min:
+            self.free_min = free
+
+    # collect garbage (counts collections, time and freed bytes)
+    def collect(self):
+        self.sample_heap()
+        alloc = gc.mem_alloc()
+        start_us = time.ticks_us()
+        gc.collect()
+        self.gc_time_us += time.ticks_diff(time.ticks_us(), start_us)
+        self.gc_collections += 1
+        self.gc_freed_bytes += max(0, alloc - gc.mem_alloc())
+        now = time.time()
+        if (
+            self.free_block_time is None
+            or now - self.free_block_time >= FREE_BLOCK_INTERVAL_S
+        ):
+            self.free_block_time = now
+            self.find_largest_free_block()
+
+    # find the largest free block (binary search with test allocations up to
+    # FREE_BLOCK_MAX, a fragmented heap has much less than gc.mem_free() in one
+    # block)
+    def find_largest_free_block(self):
+        low = 0
+        high = min(gc.mem_free(), FREE_BLOCK_MAX)
+        while high - low > FREE_BLOCK_STEP:
+            size = (low + high) // 2
+            try:
+                block = bytearray(size)
+                del block
+                low = size
+            except MemoryError:
+                high = size
+        self.largest_free_block = low
+        return low
+
+    # get uptime in seconds
+    def get_uptime(self):
+        return time.time() - self.start_time
+
+
+# instance Metrics()
+metrics = Metrics()
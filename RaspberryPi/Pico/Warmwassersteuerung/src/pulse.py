@@ -0,0 +1,81 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from machine import (
+    Pin,
+    Timer,
+    disable_irq,
+    enable_irq,
+)  # https://docs.micropython.org/en/latest/library/machine.html
+from src.config import config  # Config() instance
+
+# number of pulses, which are kept for /api/command
+PULSE_HISTORY_SIZE = 16
+
+
+# ==================================================
+# class PulseDriver
+# ==================================================
+# switches a relay pin on and off again from a one-shot machine.Timer callback.
+# a busy event loop (rendering a page, i2c or onewire transfers) only delays
+# the task, that waits for the end of the pulse, not the end of the pulse.
+class PulseDriver:
+    def __init__(self, timer_id=-1):
+        self.timer = Timer(timer_id)
+        self.flag = asyncio.ThreadSafeFlag()
+        self.pin = None  # Pin() of the running pulse
+        self.pin_number = None
+        self.commanded = 0  # milliseconds
+        self.start_us = 0
+        self.end_us = 0
+        self.running = False
+        self.stopped = False  # ended by stop()
+        self.pulses = []  # [pin, commanded ms, measured us] (newest last)
+        self.callback = self.end_pulse  # bound once, no allocation in the irq
+
+    # end pulse (timer callback, runs in irq context: no allocation, no log)
+    def end_pulse(self, timer):
+        self.pin.value(0)
+        self.end_us = time.ticks_us()
+        self.running = False
+        self.flag.set()
+
+    # start pulse (returns False, if a pulse is already running)
+    def start(self, pin_number, duration_ms):
+        if self.running:
+            return False
+        self.pin = Pin(pin_number, Pin.OUT)
+        self.pin_number = pin_number
+        self.commanded = duration_ms
+        self.stopped = False
+        self.running = True
+        self.start_us = time.ticks_us()
+        self.pin.value(1)
+        self.timer.init(mode=Timer.ONE_SHOT, period=duration_ms, callback=self.callback)
+        return True
+
+    # stop running pulse at once (cancel or emergency stop)
+    def stop(self):
+        irq_state = disable_irq()
+        try:
+            if self.running:
+                self.timer.deinit()
+                self.end_pulse(self.timer)
+                self.stopped = True
+        finally:
+            enable_irq(irq_state)
+
+    # wait for the end of the pulse (returns the measured width in microseconds)
+    async def wait(self):
+        while self.running:
+            await self.flag.wait()
+        measured_us = time.ticks_diff(self.end_us, self.start_us)
+        self.pulses.append([self.pin_number, self.commanded, measured_us])
+        if len(self.pulses) > PULSE_HISTORY_SIZE:
+            self.pulses.pop(0)
+        return measured_us
+
+
+# instance PulseDriver() (timer -1 is a software timer on the pico, the esp32
+# only has hardware timers 0-3)
+pulse_driver = PulseDriver(config.get_int_value("RELAY_TIMER_ID", -1))
@@ -1,8 +1,15 @@
 # imports
-import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
 from machine import Pin  # https://docs.micropython.org/en/latest/library/machine.html
 from src.log import log
 from src.config import config  # Config() instance
+from src.metrics import metrics  # Metrics() instance
+from src.pulse import pulse_driver  # PulseDriver() instance
+
+# active relay pins
+active_relays = set()
+
+# memory and time accounting
+relay_metrics = metrics.get("relay")
 
 # ==================================================
 # functions
@@ -17,33 +24,55 @@ def init_relays():
     relay_close_pin.value(0)
 
 
-# activate relay
+# check interlock (False, while another relay is active)
+def check_interlock(relay_pin):
+    if active_relays and relay_pin not in active_relays:
+        log("ERROR", "relay {}: interlock, {} active", relay_pin, active_relays)
+        return False
+    return True
+
+
+# activate relay (refused, while another relay is active)
 def activate_relay(relay_pin):
-    relay = Pin(relay_pin, Pin.OUT)
-    relay.value(1)  # activate relay
+    with relay_metrics:
+        if not check_interlock(relay_pin):
+            return False
+        relay = Pin(relay_pin, Pin.OUT)
+        relay.value(1)  # activate relay
+        active_relays.add(relay_pin)
+        config.state_changed.set()
+        return True
 
 
 # deactivate relay
 def deactivate_relay(relay_pin):
-    relay = Pin(relay_pin, Pin.OUT)
-    relay.value(0)  # deactivate relay
-
-
-# open relay
-async def open_relay(relay_time=config.get_int_value("relay_time", 1200)):
-    relay_open_pin = config.get_int_value("RELAY_OPEN_PIN", 14)
-    log("INFO", f"open_relay({relay_time}): activate")
-    activate_relay(relay_open_pin)
-    await asyncio.sleep_ms(relay_time)  # time in milliseconds
-    deactivate_relay(relay_open_pin)
-    log("INFO", "open_relay(): deactivate")
-
-
-# close relay
-async def close_relay(relay_time=config.get_int_value("relay_time", 1200)):
-    relay_close_pin = config.get_int_value("RELAY_CLOSE_PIN", 15)
-    log("INFO", f"close_relay({relay_time}): activate")
-    activate_relay(relay_close_pin)
-    await asyncio.sleep_ms(relay_time)  # time in milliseconds
-    deactivate_relay(relay_close_pin)
-    log("INFO", "close_relay(): deactivate")
+    with relay_metrics:
+        relay = Pin(relay_pin, Pin.OUT)
+        relay.value(0)  # deactivate relay
+        active_relays.discard(relay_pin)
+        config.state_changed.set()
+
+
+# get relay state ("open", "close" or "off")
+def get_relay_state():
+    if config.get_int_value("RELAY_OPEN_PIN", 14) in active_relays:
+        return "open"
+    if config.get_int_value("RELAY_CLOSE_PIN", 15) in active_relays:
+        return "close"
+    return "off"
+
+
+# pulse relay for relay_time milliseconds (switched off by a timer, returns the
+# measured pulse width in microseconds, None if refused by the interlock)
+async def pulse_relay(relay_pin, relay_time):
+    with relay_metrics:
+        if not check_interlock(relay_pin):
+            return None
+        if not pulse_driver.start(relay_pin, relay_time):
+            return None
+        active_relays.add(relay_pin)
+        config.state_changed.set()
+    try:
+        return await pulse_driver.wait()
+    finally:
+        deactivate_relay(relay_pin)
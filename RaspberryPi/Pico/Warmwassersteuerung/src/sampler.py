@@ -0,0 +1,83 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.log import log
+from src.config import config  # Config() instance
+from src.temp import temp_sensors, TEMP_ERROR  # SensorRegistry() instance
+
+
+# ==================================================
+# class Sampler
+# ==================================================
+# the only owner of the temp sensors. samples all sensors every
+# temp_update_interval seconds and publishes the latest readings with a
+# timestamp. readers take the latest sample without waiting, only code that
+# really needs a new value waits for the fresh event.
+class Sampler:
+    def __init__(self, sensors):
+        self.sensors = sensors
+        self.samples = {}  # name -> (temp, ticks_ms)
+        self.sequence = 0  # number of published samples
+        self.sample_time = None  # ticks_ms of the latest sample
+        self.fresh = asyncio.Event()  # set for every published sample
+        self.request = asyncio.Event()  # set to sample before the next interval
+
+    # get latest temp of a sensor
+    def get(self, name="temp"):
+        sample = self.samples.get(name)
+        return sample[0] if sample is not None else TEMP_ERROR
+
+    # get latest sample of a sensor (temp, ticks_ms)
+    def get_sample(self, name="temp"):
+        return self.samples.get(name, (TEMP_ERROR, None))
+
+    # get age of the latest sample in ms (None, if there is no sample yet)
+    def age_ms(self):
+        if self.sample_time is None:
+            return None
+        return time.ticks_diff(time.ticks_ms(), self.sample_time)
+
+    # wait for a sample, that is not older than max_age_ms (0 = a new sample)
+    async def wait_fresh(self, max_age_ms=0):
+        age = self.age_ms()
+        if age is not None and age <= max_age_ms and max_age_ms > 0:
+            return self.sequence
+        sequence = self.sequence
+        self.request.set()
+        while self.sequence == sequence:
+            await self.fresh.wait()
+        return self.sequence
+
+    # sample all sensors and publish the readings
+    async def sample(self):
+        await self.sensors.read()
+        sample_time = time.ticks_ms()
+        for name, sensor in self.sensors.sensors.items():
+            self.samples[name] = (sensor.temp, sample_time)
+        self.sample_time = sample_time
+        self.sequence += 1
+        config.set_value("temp_sample_time", sample_time)
+
+        # wake up all waiting readers
+        self.fresh.set()
+        self.fresh.clear()
+
+    # run sampler task
+    async def run(self):
+        while True:
+            self.request.clear()
+            try:
+                await self.sample()
+            except Exception as e:
+                log("ERROR", "sampler: {}", e)
+
+            # wait for the next interval or an explicit request
+            interval_ms = max(1, config.get_int_value("temp_update_interval", 5)) * 1000
+            try:
+                await asyncio.wait_for_ms(self.request.wait(), interval_ms)
+            except asyncio.TimeoutError:
+                pass
+
+
+# instance Sampler()
+sampler = Sampler(temp_sensors)
@@ -0,0 +1,144 @@
+# imports
+import heapq  # https://docs.micropython.org/en/latest/library/heapq.html
+import time  # https://docs.micropython.org/en/latest/library/time.html
+import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
+from src.log import log
+from src.watchdog import loop_watchdog  # LoopWatchdog() instance
+
+# longest sleep of the scheduler (keeps the ticks_ms() wrap around detectable)
+MAX_SLEEP_MS = 60000
+
+
+# ==================================================
+# class Job
+# ==================================================
+# scheduled function (period_ms None = one-shot). the function may be a
+# coroutine function, its coroutine runs as a task of its own.
+class Job:
+    def __init__(self, name, function, due_ms, period_ms=None):
+        self.name = name
+        self.function = function
+        self.due_ms = due_ms
+        self.period_ms = period_ms  # may be changed, applies from the next run
+        self.cancelled = False
+        self.runs = 0
+        self.late_max_ms = 0
+
+    # cancel job (removed from the heap, when it is due)
+    def cancel(self):
+        self.cancelled = True
+
+
+# ==================================================
+# class Scheduler
+# ==================================================
+# runs jobs at absolute deadlines from a min-heap of due times and sleeps until
+# the next deadline or until a job is added. periodic jobs are anchored to their
+# first deadline (no drift), deadlines missed while a job ran are skipped.
+# coroutine jobs (e.g. the regulation, that waits for the valve) run as tasks,
+# so they do not delay the other jobs. errors of a job go to on_error(). the
+# lateness of every run is the event loop lateness of the watchdog.
+class Scheduler:
+    def __init__(self):
+        self.jobs = []  # heap of (due_ms, sequence, Job())
+        self.sequence = 0
+        self.last_ticks = time.ticks_ms()
+        self.time_ms = 0  # milliseconds since init (does not wrap around)
+        self.wakeup = asyncio.Event()  # job added (its deadline may be earlier)
+        self.on_error = None  # function(exception), None: the error is raised
+
+    # get time in milliseconds (ticks_ms() without the wrap around)
+    def get_time(self):
+        ticks = time.ticks_ms()
+        self.time_ms += time.ticks_diff(ticks, self.last_ticks)
+        self.last_ticks = ticks
+        return self.time_ms
+
+    # add job to the heap
+    def push(self, job):
+        self.sequence += 1
+        heapq.heappush(self.jobs, (job.due_ms, self.sequence, job))
+        self.wakeup.set()
+        return job
+
+    # add periodic job (first run after delay_ms, default: one period)
+    def add_periodic(self, name, function, period_ms, delay_ms=None):
+        if delay_ms is None:
+            delay_ms = period_ms
+        due_ms = self.get_time() + delay_ms
+        return self.push(Job(name, function, due_ms, max(1, period_ms)))
+
+    # add one-shot job
+    def add_once(self, name, function, delay_ms=0):
+        return self.push(Job(name, function, self.get_time() + delay_ms))
+
+    # get next job (None, if there is none)
+    def get_next_job(self):
+        while self.jobs and self.jobs[0][2].cancelled:
+            heapq.heappop(self.jobs)
+        return self.jobs[0][2] if self.jobs else None
+
+    # run due jobs (returns the milliseconds until the next deadline, None if
+    # there is no job left)
+    def run_due(self):
+        while True:
+            job = self.get_next_job()
+            if job is None:
+                return None
+            now_ms = self.get_time()
+            delay_ms = job.due_ms - now_ms
+            if delay_ms > 0:
+                return delay_ms
+            heapq.heappop(self.jobs)
+            job.runs += 1
+            job.late_max_ms = max(job.late_max_ms, -delay_ms)
+            loop_watchdog.add_lateness(-delay_ms * 1000)
+
+            # next deadline (before the run, so the job can cancel itself)
+            if job.period_ms is not None:
+                job.due_ms += job.period_ms
+                if job.due_ms <= now_ms:
+                    missed = (now_ms - job.due_ms) // job.period_ms + 1
+                    log("VERBOSE", "scheduler: {} skipped {} runs", job.name, missed)
+                    job.due_ms += missed * job.period_ms
+                self.push(job)
+
+            try:
+                result = job.function()
+                if hasattr(result, "send"):  # coroutine
+                    asyncio.create_task(self.run_task(job, result))
+            except Exception as e:
+                self.handle_error(job, e)
+
+    # run coroutine of a job
+    async def run_task(self, job, coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            self.handle_error(job, e)
+
+    # handle error of a job
+    def handle_error(self, job, e):
+        log("ERROR", "scheduler: {}: {}", job.name, e)
+        if self.on_error is None:
+            raise e
+        self.on_error(e)
+
+    # run scheduler task (sleeps until the next deadline or until a job is added)
+    async def run(self):
+        while True:
+            delay_ms = self.run_due()
+            self.wakeup.clear()  # the jobs added by run_due() are in delay_ms
+            if delay_ms is None:
+                await self.wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for_ms(
+                    self.wakeup.wait(), min(delay_ms, MAX_SLEEP_MS)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+# instance Scheduler()
+scheduler = Scheduler()
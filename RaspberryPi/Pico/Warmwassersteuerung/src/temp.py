@@ -1,39 +1,41 @@
 # imports
+import binascii  # https://docs.micropython.org/en/latest/library/binascii.html
 import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
 from machine import Pin  # https://docs.micropython.org/en/latest/library/machine.html
 from onewire import OneWire  # OneWire
 from ds18x20 import DS18X20  # DS180B20
 from src.log import log
 from src.config import config  # Config() instance
+from src.metrics import metrics  # Metrics() instance
+
+# temp of a sensor, which can not be read
+TEMP_ERROR = -127.0
+
+# memory and time accounting
+sensors_metrics = metrics.get("sensors")
+
+
+# convert rom to hex string (e.g. "28ff641e0e16031c")
+def rom_to_hex(rom):
+    return binascii.hexlify(rom).decode()
 
 
 # ==================================================
-# class TemperatureSensor
+# class OneWireBus
 # ==================================================
-class TemperatureSensor:
-    instance_counter = 0
-
-    def __init__(
-        self,
-        pin_number,
-        resolution,
-    ):
-        TemperatureSensor.instance_counter += 1
-        self.sensor_number = TemperatureSensor.instance_counter
-        self.sensor_postfix = f"_{self.sensor_number}" if self.sensor_number > 1 else ""
-
-        if pin_number is None:
-            pin_number = config.get_int_value("TEMP_SENSOR_PIN", 6)
-        if resolution is None:
-            resolution = config.get_int_value("TEMP_SENSOR_RESOLUTION_BIT", 11)
+# one pin with any number of DS18B20 sensors
+class OneWireBus:
+    def __init__(self, pin_number, resolution):
         self.pin_number = pin_number
 
-        # init temp sensor
+        # init bus
         self.temp_sensor_pin = Pin(pin_number)
         self.temp_sensor = DS18X20(OneWire(self.temp_sensor_pin))
-        self.resolution = resolution
-        self.resolution_time = int(750 / (2 ** (12 - resolution)))
-        self.set_resolution()
+        self.resolution = max(9, min(resolution, 12))  # limits to valid values
+        self.resolution_time = int(750 / (2 ** (12 - self.resolution)))
+        self.roms = None  # cached roms (scanned on first use or after an error)
+        self.error = None  # error of the last started measurement
+        self.sensors = []  # Sensor() instances on this bus
 
     # set temp sensor resolution
     # bits   resolution        time
@@ -43,64 +45,188 @@ class TemperatureSensor:
     #   12   0,00626 °C   750,00 ms
     def set_resolution(self):
         try:
-            # set temp resolution
-            resolution = max(
-                9, min(self.resolution, 12)
-            )  # limits the resolution to valid values
-
             # scan for available temp sensors
-            roms = self.temp_sensor.scan()
+            self.roms = self.temp_sensor.scan()
+            log(
+                "INFO",
+                "temp sensors on pin {}: {}",
+                self.pin_number,
+                [rom_to_hex(rom) for rom in self.roms],
+            )
 
             # set resolution
-            for rom in roms:
-                if resolution == 9:
+            for rom in self.roms:
+                if self.resolution == 9:
                     byte_string = b"\x00\x00\x1f"
-                elif resolution == 10:
+                elif self.resolution == 10:
                     byte_string = b"\x00\x00\x3f"
-                elif resolution == 11:
+                elif self.resolution == 11:
                     byte_string = b"\x00\x00\x5f"
                 else:
                     byte_string = b"\x00\x00\x7f"
                 self.temp_sensor.write_scratch(rom, byte_string)
 
         except OSError as e:
-            log("ERROR", f"setting temp resolution: {e}")
+            log("ERROR", "setting temp resolution: {}", e)
 
-    # get temperature
-    async def get_temp(self):
-        try:
-            # scan for available temp sensors
-            roms = self.temp_sensor.scan()
-            if not roms:
+    # get roms (scan only, if the roms are not known yet)
+    def get_roms(self):
+        if not self.roms:
+            self.set_resolution()  # scans and sets the resolution again
+            if not self.roms:
                 raise ValueError("no sensors found")
-
-            # start measurement
+            self.assign_roms()
+        return self.roms
+
+    # assign scanned roms to sensors without a configured rom (in scan order)
+    def assign_roms(self):
+        configured = [sensor.rom for sensor in self.sensors if sensor.rom_configured]
+        free_roms = [rom for rom in self.roms if rom not in configured]
+        for sensor in self.sensors:
+            if not sensor.rom_configured:
+                sensor.rom = free_roms.pop(0) if free_roms else None
+
+    # start measurement (skip rom: all sensors on the bus convert at once)
+    def start_conversion(self):
+        try:
+            self.get_roms()
             self.temp_sensor.convert_temp()
+            self.error = None
+        except (OSError, ValueError) as e:
+            self.roms = None  # rescan on next measurement
+            self.error = e
+
+    # read measurements of all sensors on this bus
+    def read_temps(self):
+        for sensor in self.sensors:
+            try:
+                if self.error is not None:
+                    raise self.error
+                if sensor.rom is None:
+                    raise ValueError("sensor not found")
+                sensor.temp = round(self.temp_sensor.read_temp(sensor.rom), 1)
+                sensor.error = None
+
+            except Exception as e:  # OSError, ValueError or CRC error
+                self.roms = None  # rescan on next measurement
+                log(
+                    "ERROR",
+                    "reading temp on sensor {} (pin {}): {}",
+                    sensor.name,
+                    self.pin_number,
+                    e,
+                )
+                sensor.temp = TEMP_ERROR
+                sensor.error = e
+                metrics.count("sensor_errors")
 
-            # wait for measurement
-            await asyncio.sleep_ms(self.resolution_time)
-
-            # get temps from measurements
-            for rom in roms:
-                temp = self.temp_sensor.read_temp(rom)
-                return round(temp, 1)  # return only first temp found
 
-        except (OSError, ValueError) as e:
-            log(
-                "ERROR",
-                f"reading temp on sensor {self.sensor_number} (pin {self.pin_number}): {e}",
-            )
-            temp = -127.0
-            config.set_value(f"current_temp{self.sensor_postfix}", temp)
-            return temp
+# ==================================================
+# class Sensor
+# ==================================================
+# named DS18B20 sensor (its temp is published as runtime value "current_<name>")
+class Sensor:
+    def __init__(self, name, bus, rom=None):
+        self.name = name
+        self.bus = bus
+        self.rom = rom
+        self.rom_configured = rom is not None
+        self.config_key = "current_" + name
+        self.temp = TEMP_ERROR
+        self.error = None
 
 
-# instance TemperatureSensor()
-temp_sensor = TemperatureSensor(
-    config.get_int_value("TEMP_SENSOR_PIN", 6),
-    config.get_int_value("TEMP_SENSOR_RESOLUTION_BIT", 11),
-)
-temp_sensor_2 = TemperatureSensor(
-    config.get_int_value("TEMP_SENSOR_2_PIN", 10),
-    config.get_int_value("TEMP_SENSOR_RESOLUTION_BIT", 11),
+# ==================================================
+# class SensorRegistry
+# ==================================================
+# all sensors by name. every bus gets a single convert command for all of its
+# sensors, so a refresh takes one conversion time, regardless of the number of
+# sensors and buses.
+class SensorRegistry:
+    def __init__(self, resolution=11):
+        self.resolution = resolution
+        self.buses = {}  # pin number -> OneWireBus()
+        self.sensors = {}  # name -> Sensor()
+
+    # add sensor
+    def add_sensor(self, name, pin_number, rom=None):
+        if pin_number not in self.buses:
+            self.buses[pin_number] = OneWireBus(pin_number, self.resolution)
+        bus = self.buses[pin_number]
+        sensor = Sensor(name, bus, rom)
+        bus.sensors.append(sensor)
+        self.sensors[name] = sensor
+        config.add_runtime_value(sensor.config_key, TEMP_ERROR)
+        return sensor
+
+    # add sensors from config string "name:pin[:rom],name:pin[:rom],..."
+    # e.g. "temp:6,temp_2:10" or "supply:6:28ff641e0e16031c,return:6:28ff0a1b2c3d4e5f"
+    def add_sensors(self, sensors_string):
+        for entry in sensors_string.split(","):
+            parts = [part.strip() for part in entry.split(":")]
+            if len(parts) < 2 or not parts[0]:
+                continue
+            try:
+                rom = binascii.unhexlify(parts[2]) if len(parts) > 2 else None
+                self.add_sensor(parts[0], int(parts[1]), rom)
+            except ValueError as e:
+                log("ERROR", "temp sensor config '{}': {}", entry, e)
+
+    # get sensor by name
+    def get(self, name):
+        return self.sensors.get(name)
+
+    # get temp by name
+    def get_temp(self, name):
+        sensor = self.sensors.get(name)
+        return sensor.temp if sensor is not None else TEMP_ERROR
+
+    # set resolution of all buses
+    def set_resolution(self):
+        for bus in self.buses.values():
+            bus.set_resolution()
+            if bus.roms:
+                bus.assign_roms()
+
+    # read sensors (only the buses of the named sensors, all if names is None)
+    async def read(self, names=None):
+        if names is None:
+            buses = list(self.buses.values())
+        else:
+            buses = []
+            for name in names:
+                sensor = self.sensors.get(name)
+                if sensor is not None and sensor.bus not in buses:
+                    buses.append(sensor.bus)
+
+        # start measurement on all buses
+        with sensors_metrics:
+            for bus in buses:
+                bus.start_conversion()
+
+        # wait for the slowest measurement
+        resolution_time = 0
+        for bus in buses:
+            if bus.error is None:
+                resolution_time = max(resolution_time, bus.resolution_time)
+        if resolution_time > 0:
+            await asyncio.sleep_ms(resolution_time)
+
+        # get temps from measurements
+        with sensors_metrics:
+            for bus in buses:
+                bus.read_temps()
+                for sensor in bus.sensors:
+                    config.set_value(sensor.config_key, sensor.temp)
+
+
+# instance SensorRegistry()
+temp_sensors = SensorRegistry(config.get_int_value("TEMP_SENSOR_RESOLUTION_BIT", 11))
+temp_sensors.add_sensors(
+    config.get_value("temp_sensors", "")
+    or "temp:{},temp_2:{}".format(
+        config.get_int_value("TEMP_SENSOR_PIN", 6),
+        config.get_int_value("TEMP_SENSOR_2_PIN", 10),
+    )
 )
+temp_sensors.set_resolution()
@@ -0,0 +1,115 @@
+# imports
+from src.log import log
+
+# placeholder markers: !!!--name--!!!
+MARKER_OPEN = b"!!!--"
+MARKER_CLOSE = b"--!!!"
+
+
+# ==================================================
+# class Template
+# ==================================================
+# html template, that is parsed once into static segments and named slots.
+# static segments stay in flash and are streamed by file offset, slots are
+# evaluated once per render.
+class Template:
+    def __init__(self, file_path, chunk_size=512):
+        self.file_path = file_path
+        self.segments = []  # (start, end) for static bytes, name for a slot
+        self.slot_names = []
+        self.chunk_size = chunk_size
+        self.compile()
+
+    # compile template (find all placeholders)
+    def compile(self):
+        self.segments = []
+        self.slot_names = []
+        try:
+            with open(self.file_path, "rb") as file:
+                content = file.read()
+        except OSError as e:
+            log("ERROR", "reading template {}: {}", self.file_path, e)
+            return
+
+        start = 0
+        while True:
+            slot_start = content.find(MARKER_OPEN, start)
+            if slot_start < 0:
+                break
+            name_start = slot_start + len(MARKER_OPEN)
+            name_end = content.find(MARKER_CLOSE, name_start)
+            if name_end < 0:
+                break
+            if slot_start > start:
+                self.segments.append((start, slot_start))
+            name = content[name_start:name_end].decode("utf-8")
+            self.segments.append(name)
+            if name not in self.slot_names:
+                self.slot_names.append(name)
+            start = name_end + len(MARKER_CLOSE)
+        if start < len(content):
+            self.segments.append((start, len(content)))
+        log(
+            "INFO",
+            "template {}: {} segments, {} slots",
+            self.file_path,
+            len(self.segments),
+            len(self.slot_names),
+        )
+
+    # evaluate slots (every slot once, default(name) for slots without function)
+    def evaluate(self, slots, default=None):
+        values = {}
+        for name in self.slot_names:
+            function = slots.get(name)
+            if function is not None:
+                value = function()
+            elif default is not None:
+                value = default(name)
+            else:
+                value = ""
+            values[name] = str(value).encode("utf-8")
+        return values
+
+    # render template to writer
+    async def render(self, writer, slots, default=None):
+        values = self.evaluate(slots, default)
+        buffer = bytearray(self.chunk_size)  # own buffer for concurrent renders
+        buffer_view = memoryview(buffer)
+        size = len(buffer)
+        pos = 0  # used bytes of the output buffer
+        file_pos = 0
+
+        with open(self.file_path, "rb") as file:
+            for segment in self.segments:
+                # slot value
+                if isinstance(segment, str):
+                    value = values[segment]
+                    if pos + len(value) > size:
+                        await writer.awrite(buffer_view[:pos])
+                        pos = 0
+                    if len(value) > size:
+                        await writer.awrite(value)
+                    else:
+                        buffer[pos : pos + len(value)] = value
+                        pos += len(value)
+                    continue
+
+                # static segment (read from file into the output buffer)
+                start, end = segment
+                if file_pos != start:
+                    file.seek(start)
+                while start < end:
+                    if pos == size:
+                        await writer.awrite(buffer_view)
+                        pos = 0
+                    count = min(end - start, size - pos)
+                    count = file.readinto(buffer_view[pos : pos + count])
+                    if not count:
+                        break
+                    pos += count
+                    start += count
+                file_pos = start
+
+        if pos:
+            await writer.awrite(buffer_view[:pos])
@@ -0,0 +1,73 @@
+# imports
+from src.log import log
+from src.config import config  # Config() instance
+
+# moves shorter than this are skipped (milliseconds)
+VALVE_MIN_MOVE_TIME = 100
+
+# run time of the homing move (factor of the full travel time)
+VALVE_HOME_OVERDRIVE = 1.1
+
+# position, before the valve is homed
+VALVE_UNKNOWN = -1.0
+
+
+# ==================================================
+# class ValveModel
+# ==================================================
+# estimates the valve position (0 % = closed, 100 % = open) from the measured
+# run times of the relays and the full travel time of the valve motor. moves
+# beyond an end stop are shortened or skipped. the position is unknown until
+# the valve was homed by a full close.
+class ValveModel:
+    def __init__(self):
+        self.position = VALVE_UNKNOWN
+        self.travel_time = config.int_accessor("valve_travel_time", 120000)
+
+    # position known (homed)
+    def is_homed(self):
+        return self.position >= 0
+
+    # get run time of the homing move (full close with overdrive)
+    def get_home_time(self):
+        return int(self.travel_time.get() * VALVE_HOME_OVERDRIVE)
+
+    # get run time until the end stop of a direction (None, if not homed)
+    def get_remaining_time(self, direction):
+        if not self.is_homed():
+            return None
+        remaining = 100.0 - self.position if direction == "open" else self.position
+        return int(remaining * self.travel_time.get() / 100 + 0.5)
+
+    # plan move (returns the run time, 0 if the valve is at the end stop)
+    def plan(self, direction, relay_time):
+        remaining_time = self.get_remaining_time(direction)
+        if remaining_time is not None and remaining_time < relay_time:
+            relay_time = remaining_time
+        if relay_time < VALVE_MIN_MOVE_TIME:
+            return 0
+        return relay_time
+
+    # update position after a move
+    def update(self, direction, run_time):
+        if not self.is_homed():
+            return
+        change = run_time * 100.0 / max(1, self.travel_time.get())
+        if direction == "open":
+            self.set_position(min(100.0, self.position + change))
+        else:
+            self.set_position(max(0.0, self.position - change))
+
+    # set position (VALVE_UNKNOWN, if a homing move was interrupted)
+    def set_position(self, position):
+        self.position = position
+        config.set_value("valve_position", round(position, 1))
+
+    # set home (after a full close)
+    def set_home(self):
+        self.set_position(0.0)
+        log("INFO", "valve: homed")
+
+
+# instance ValveModel()
+valve = ValveModel()
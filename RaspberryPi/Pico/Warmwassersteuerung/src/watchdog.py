@@ -0,0 +1,152 @@
+# imports
+import time  # https://docs.micropython.org/en/latest/library/time.html
+from src.log import log
+from src.metrics import Histogram
+
+# a job, that runs at least this late, is recorded as stall (milliseconds)
+STALL_THRESHOLD_MS = 50
+
+# number of stalls, which are kept for /api/loop
+STALL_HISTORY_SIZE = 16
+
+
+# ==================================================
+# class TaskTimer
+# ==================================================
+# durations of the steps of a task (from one resume to the next await)
+class TaskTimer:
+    def __init__(self, name):
+        self.name = name
+        self.steps = Histogram()
+        self.running = 0  # number of running coroutines with this name
+
+    # get timer for the api
+    def to_dict(self):
+        result = self.steps.to_dict()
+        result["running"] = self.running
+        return result
+
+
+# ==================================================
+# class TimedCoroutine
+# ==================================================
+# drives a coroutine step by step and measures every step. every value the
+# coroutine yields is passed to the event loop and every value or exception
+# the event loop sends (e.g. CancelledError) is passed back.
+class TimedCoroutine:
+    def __init__(self, watchdog, timer, coroutine):
+        self.watchdog = watchdog
+        self.timer = timer
+        self.coroutine = coroutine
+
+    def __iter__(self):
+        coroutine = self.coroutine
+        value = None
+        error = None
+        self.timer.running += 1
+        try:
+            while True:
+                start_us = time.ticks_us()
+                try:
+                    if error is None:
+                        yielded = coroutine.send(value)
+                    else:
+                        yielded = coroutine.throw(error)
+                except StopIteration as e:
+                    self.watchdog.add_step(self.timer, start_us)
+                    return e.args[0] if e.args else None
+                self.watchdog.add_step(self.timer, start_us)
+                try:
+                    value = yield yielded
+                    error = None
+                except GeneratorExit:
+                    coroutine.close()
+                    raise
+                except BaseException as e:  # CancelledError
+                    value = None
+                    error = e
+        finally:
+            self.timer.running -= 1
+
+    __await__ = __iter__
+
+
+# ==================================================
+# class LoopWatchdog
+# ==================================================
+# measures, how late the jobs of the scheduler run after their deadlines (the
+# scheduler reports every run, there is no wakeup of its own). a late job means,
+# that a task blocked the event loop (i2c, onewire, flash writes, gc.collect()).
+# on a stall the timed task with the longest step since the last job is
+# recorded as cause.
+class LoopWatchdog:
+    def __init__(self):
+        self.lateness = Histogram()  # lateness of the jobs
+        self.tasks = {}  # name -> TaskTimer()
+        self.stalls = []  # [ticks_ms, late ms, task, step ms] (newest last)
+        self.stall_count = 0
+        self.longest_step_us = 0  # longest step since the last job
+        self.longest_step_task = None
+
+    # get timer of a task
+    def get_timer(self, name):
+        timer = self.tasks.get(name)
+        if timer is None:
+            timer = TaskTimer(name)
+            self.tasks[name] = timer
+        return timer
+
+    # add step of a timed task
+    def add_step(self, timer, start_us):
+        step_us = time.ticks_diff(time.ticks_us(), start_us)
+        timer.steps.add(step_us)
+        if step_us > self.longest_step_us:
+            self.longest_step_us = step_us
+            self.longest_step_task = timer.name
+
+    # record stall
+    def add_stall(self, late_us):
+        self.stall_count += 1
+        task = self.longest_step_task or "unknown"
+        self.stalls.append(
+            [time.ticks_ms(), late_us // 1000, task, self.longest_step_us // 1000]
+        )
+        if len(self.stalls) > STALL_HISTORY_SIZE:
+            self.stalls.pop(0)
+        log(
+            "WARN",
+            "watchdog: event loop stalled for {}ms ({}: {}ms step)",
+            late_us // 1000,
+            task,
+            self.longest_step_us // 1000,
+        )
+
+    # get status for the api
+    def get_status(self):
+        tasks = {}
+        for name, timer in self.tasks.items():
+            tasks[name] = timer.to_dict()
+        return {
+            "stall_threshold_ms": STALL_THRESHOLD_MS,
+            "lateness": self.lateness.to_dict(),
+            "stall_count": self.stall_count,
+            "stalls": self.stalls,
+            "tasks": tasks,
+        }
+
+    # add lateness of a job (reported by the scheduler)
+    def add_lateness(self, late_us):
+        self.lateness.add(late_us)
+        if late_us >= STALL_THRESHOLD_MS * 1000:
+            self.add_stall(late_us)
+        self.longest_step_us = 0
+        self.longest_step_task = None
+
+
+# instance LoopWatchdog()
+loop_watchdog = LoopWatchdog()
+
+
+# run coroutine with step timing (as task: create_task(timed("name", coro())))
+async def timed(name, coroutine):
+    return await TimedCoroutine(loop_watchdog, loop_watchdog.get_timer(name), coroutine)
@@ -1,17 +1,45 @@
 # imports
-import gc  # https://docs.micropython.org/en/latest/library/gc.html
-import re  # https://docs.micropython.org/en/latest/library/re.html
 import uasyncio as asyncio  # https://docs.micropython.org/en/latest/library/asyncio.html
 from machine import (
     reset,
 )  # https://docs.micropython.org/en/latest/library/machine.html#machine.reset
-from src.log import log
+from src.log import log, get_log_chunks
 from src.config import config  # Config() instance
-from src.functions import print_nominal_temp, set_relay
-from src.lcd import get_lcd_line, set_backlight
+from src.functions import print_nominal_temp
+from src.lcd import get_lcd_line, set_backlight, run_display
+from src.relay import get_relay_state
+from src.actuator import actuator  # Actuator() instance
+from src.metrics import metrics  # Metrics() instance
+from src.watchdog import timed
+from src.api import (
+    get_api_state,
+    get_api_command,
+    get_api_config,
+    get_api_stats,
+    get_api_metrics,
+    get_api_loop,
+    to_int,
+)
+from src.events import event_hub, stream_events
+from src.template import Template
+from src.http import (
+    KEEP_ALIVE_MAX_REQUESTS,
+    Connection,
+    HttpError,
+    accept_connection,
+    reject_connection,
+    release_connection,
+    send_file,
+    send_headers,
+    send_response,
+    send_stream,
+)
 from src.wifi import connect_wifi, check_wifi_isconnected
 
 
+# memory and time accounting
+webserver_metrics = metrics.get("webserver")
+
 # ==================================================
 # functions
 # ==================================================
@@ -38,188 +66,73 @@ def is_true(value):
     return "true" if str(value).lower() in ["true", "1", "yes", "on"] else "false"
 
 
-# replace placeholder
-def replace_placeholder(content="", line_number=0):
-    # assign line numbers to placeholders and their keys
-    line_to_placeholder = {
-        # LCD LINE NUMBERS
-        13: ("LCD_LINE_1", get_lcd_html_line(0)),
-        14: ("LCD_LINE_2", get_lcd_html_line(1)),
-        15: ("LCD_LINE_3", get_lcd_html_line(2)),
-        16: ("LCD_LINE_4", get_lcd_html_line(3)),
-        # MANUAL CONTROL
-        21: (
-            "highlighted",
-            (
-                " highlighted"
-                if config.get_float_value("current_temp", -127.0)
-                > config.get_float_value("nominal_max_temp", 57.0)
-                else ""
-            ),
-        ),
-        22: ("manual_relay_time", config.get_value("manual_relay_time", "")),
-        23: (
-            "highlighted",
-            (
-                " highlighted"
-                if config.get_float_value("current_temp", -127.0)
-                < config.get_float_value("nominal_min_temp", 42.0)
-                else ""
-            ),
-        ),
-        # CONFIGURATION
-        29: ("nominal_min_temp", config.get_value("nominal_min_temp", "")),
-        31: ("nominal_max_temp", config.get_value("nominal_max_temp", "")),
-        33: ("delay_before_start_1", config.get_value("delay_before_start_1", "")),
-        35: ("init_relay_time", config.get_value("init_relay_time", "")),
-        37: ("delay_before_start_2", config.get_value("delay_before_start_2", "")),
-        39: ("relay_time", config.get_value("relay_time", "")),
-        41: ("update_time", config.get_value("update_time", "")),
-        43: ("temp_update_interval", config.get_value("temp_update_interval", "")),
-        45: (
-            "lcd_i2c_backlight",
-            is_checked(config.get_value("lcd_i2c_backlight", "false")),
-        ),
-        47: (
-            "lcd_i2c_backlight",
-            is_true(config.get_value("lcd_i2c_backlight", "false")),
-        ),
-        48: (
-            "buttons_activated",
-            is_checked(config.get_value("buttons_activated", "false")),
-        ),
-        50: (
-            "buttons_activated",
-            is_true(config.get_value("buttons_activated", "false")),
-        ),
-        52: (
-            "log_level_OFF",
-            (
-                " selected"
-                if str(config.get_value("log_level", "OFF")).upper() == "OFF"
-                else ""
-            ),
-        ),
-        53: (
-            "log_level_ERROR",
-            (
-                " selected"
-                if str(config.get_value("log_level", "OFF")).upper() == "ERROR"
-                else ""
-            ),
-        ),
-        54: (
-            "log_level_WARN",
-            (
-                " selected"
-                if str(config.get_value("log_level", "OFF")).upper() == "WARN"
-                else ""
-            ),
-        ),
-        55: (
-            "log_level_INFO",
-            (
-                " selected"
-                if str(config.get_value("log_level", "OFF")).upper() == "INFO"
-                else ""
-            ),
-        ),
-        56: (
-            "log_level_VERBOSE",
-            (
-                " selected"
-                if str(config.get_value("log_level", "OFF")).upper() == "VERBOSE"
-                else ""
-            ),
-        ),
-        59: ("interval", config.get_value("interval", "")),
-        61: ("temp_sampling_interval", config.get_value("temp_sampling_interval", "")),
-        63: (
-            "temp_change_high_threshold_temp",
-            config.get_float_value("temp_change_high_threshold_temp", 1.0),
-        ),
-        65: (
-            "temp_change_high_threshold_relay_time_multiplier",
-            config.get_float_value(
-                "temp_change_high_threshold_relay_time_multiplier", 1.5
-            ),
-        ),
-        67: (
-            "temp_change_high_threshold_update_time_multiplier",
-            config.get_float_value(
-                "temp_change_high_threshold_update_time_multiplier", 0.5
-            ),
-        ),
-        69: ("wifi_max_attempts", config.get_value("wifi_max_attempts", "")),
-        # INFO
-        73: ("wifi_ssid", config.get_value("wifi_ssid", "")),
-        75: ("previous_millis", config.get_value("previous_millis", "")),
-        77: (
-            "temp_last_measurement_time",
-            config.get_value("temp_last_measurement_time", ""),
-        ),
-        79: ("current_temp", config.get_value("current_temp", "")),
-        81: ("temp_last_measurement", config.get_value("temp_last_measurement", "")),
-        83: ("temp_increasing", config.get_value("temp_increasing", "")),
-        85: ("temp_change_category", config.get_value("temp_change_category", "")),
-        88: ("TEMP_SENSOR_PIN", config.get_value("TEMP_SENSOR_PIN", "")),
-        90: ("TEMP_SENSOR_2_PIN", config.get_value("TEMP_SENSOR_2_PIN", "")),
-        92: (
-            "TEMP_SENSOR_RESOLUTION_BIT",
-            config.get_value("TEMP_SENSOR_RESOLUTION_BIT", ""),
-        ),
-        94: ("LCD_PIN_SDA", config.get_value("LCD_PIN_SDA", "")),
-        96: ("LCD_PIN_SCL", config.get_value("LCD_PIN_SCL", "")),
-        98: ("LCD_ADDR", config.get_value("LCD_ADDR", "")),
-        100: ("LCD_FREQ", config.get_value("LCD_FREQ", "")),
-        102: ("LCD_COLS", config.get_value("LCD_COLS", "")),
-        104: ("LCD_ROWS", config.get_value("LCD_ROWS", "")),
-        106: ("RELAY_OPEN_PIN", config.get_value("RELAY_OPEN_PIN", "")),
-        108: ("RELAY_CLOSE_PIN", config.get_value("RELAY_CLOSE_PIN", "")),
-        110: ("BUTTON_TEMP_UP_PIN", config.get_value("BUTTON_TEMP_UP_PIN", "")),
-        112: ("BUTTON_TEMP_DOWN_PIN", config.get_value("BUTTON_TEMP_DOWN_PIN", "")),
-        # HIDDEN
-        115: ("manual_relay_time", config.get_value("manual_relay_time", "")),
-        # RESET
-        120: (
-            "boot_normal",
-            (
-                " checked"
-                if str(config.get_value("boot_normal", "false")).lower()
-                in ["true", "1", "yes", "on"]
-                else ""
-            ),
-        ),
-        122: (
-            "boot_normal",
-            (
-                "true"
-                if str(config.get_value("boot_normal", "false")).lower()
-                in ["true", "1", "yes", "on"]
-                else "false"
-            ),
-        ),
-    }
-
-    # replace keys
-    if line_number in line_to_placeholder:
-        key, value = line_to_placeholder[line_number]
-        placeholder = f"!!!--{key}--!!!"
-        content = content.replace(placeholder, str(value))
-
-    return content
-
-
-# parse for data
-def parse_form_data(body):
-    parsed_data = {}
-    for pair in body.split("&"):
-        if "=" in pair:
-            key, value = pair.split("=", 1)
-            parsed_data[key] = value
-        else:
-            parsed_data[pair] = None
-    return parsed_data
+# get " highlighted", if the current temp is above (or below) the nominal temp
+def get_highlighted(above=True):
+    current_temp = config.get_float_value("current_temp", -127.0)
+    if above:
+        highlighted = current_temp > config.get_float_value("nominal_max_temp", 57.0)
+    else:
+        highlighted = current_temp < config.get_float_value("nominal_min_temp", 42.0)
+    return " highlighted" if highlighted else ""
+
+
+# get " selected", if level is the current log level
+def get_log_level_selected(level):
+    selected = str(config.get_value("log_level", "OFF")).upper() == level
+    return " selected" if selected else ""
+
+
+# get config value for template slots without an own function
+def get_slot_value(key):
+    return config.get_value(key, "")
+
+
+# template slots of index.html (evaluated once per page load)
+INDEX_SLOTS = {
+    # LCD
+    "LCD_LINE_1": lambda: get_lcd_html_line(0),
+    "LCD_LINE_2": lambda: get_lcd_html_line(1),
+    "LCD_LINE_3": lambda: get_lcd_html_line(2),
+    "LCD_LINE_4": lambda: get_lcd_html_line(3),
+    # MANUAL CONTROL
+    "highlighted_open": lambda: get_highlighted(above=True),
+    "highlighted_close": lambda: get_highlighted(above=False),
+    # CONFIGURATION
+    "lcd_i2c_backlight_checked": lambda: is_checked(
+        config.get_value("lcd_i2c_backlight", "false")
+    ),
+    "lcd_i2c_backlight": lambda: is_true(
+        config.get_value("lcd_i2c_backlight", "false")
+    ),
+    "buttons_activated_checked": lambda: is_checked(
+        config.get_value("buttons_activated", "false")
+    ),
+    "buttons_activated": lambda: is_true(
+        config.get_value("buttons_activated", "false")
+    ),
+    "log_level_OFF": lambda: get_log_level_selected("OFF"),
+    "log_level_ERROR": lambda: get_log_level_selected("ERROR"),
+    "log_level_WARN": lambda: get_log_level_selected("WARN"),
+    "log_level_INFO": lambda: get_log_level_selected("INFO"),
+    "log_level_VERBOSE": lambda: get_log_level_selected("VERBOSE"),
+    "temp_change_high_threshold_temp": lambda: config.get_float_value(
+        "temp_change_high_threshold_temp", 1.0
+    ),
+    "temp_change_high_threshold_relay_time_multiplier": lambda: config.get_float_value(
+        "temp_change_high_threshold_relay_time_multiplier", 1.5
+    ),
+    "temp_change_high_threshold_update_time_multiplier": lambda: config.get_float_value(
+        "temp_change_high_threshold_update_time_multiplier", 0.5
+    ),
+    # INFO
+    "relay": get_relay_state,
+    # RESET
+    "boot_normal_checked": lambda: is_checked(config.get_value("boot_normal", "false")),
+    "boot_normal": lambda: is_true(config.get_value("boot_normal", "false")),
+}
+
+# instance Template() (index.html is parsed once at boot)
+index_template = Template("/web/index.html")
 
 
 # manage wifi connection
@@ -230,67 +143,94 @@ async def manage_wifi_connection():
             await connect_wifi()
 
 
-# stream file
-async def stream_file(writer, file_name, chunk_size=1024):
-    file_name_präfix = "../web/"
-    try:
-        with open(file_name_präfix + file_name, "rb", encoding="utf-8") as file:
-            while True:
-                chunk = file.read(chunk_size)
-                if not chunk:
-                    break
-                await writer.awrite(chunk)
-    except OSError as e:
-        log("ERROR", f"while reading file: {e}")
+# static files (path -> (file path, content type))
+STATIC_FILES = {
+    "/styles.css": ("/web/styles.css", "text/css"),
+}
 
 
 # get index.html
 async def get_index_html(writer):
-    web_path = "/web/"
-    file_path = web_path + "index.html"
-    line_number = 0
-
-    with open(file_path, "r", encoding="utf-8") as file:
-        for line in file:
-            line_number += 1
-            line = replace_placeholder(line, line_number)
-            await writer.awrite(line.encode("utf-8"))
-
-
-# handle relay action
-async def handle_relay_action(action, manual_relay_time, error_msg, pin_key):
-    if error_msg:
-        response_content = (
-            f'<span style="color: orange;">WARN: {action} failed: {error_msg}</span>'
+    await index_template.render(writer, INDEX_SLOTS, get_slot_value)
+
+
+# relay texts per direction (html, log)
+RELAY_TEXTS = {
+    "open": ("ge&ouml;ffnet", "open_relay"),
+    "close": ("geschlossen", "close_relay"),
+}
+
+
+# queue manual relay command (returns response content, status and headers)
+def handle_manual_relay(direction, error):
+    done_text, name = RELAY_TEXTS[direction]
+    current_temp = config.get_float_value("current_temp", -127.0)
+    manual_relay_time = config.get_int_value("manual_relay_time", 1200)
+    if manual_relay_time > 10000:
+        manual_relay_time = 10000
+    timer = config.get_int_value("timer")
+    puffer_time = (manual_relay_time / 1000) + 3
+    if error:
+        log("WARN", "{}({}): manual trigger failed: {}", name, manual_relay_time, error)
+        return (
+            f'<span style="color: orange;">WARN: Ventil wurde nicht {done_text}: {error}</span>',
+            "200 OK",
+            None,
         )
-    elif config.get_int_value("timer") <= 10:
-        response_content = f'<span style="color: orange;">WARN: {action} failed: Timer is below 10.</span>'
-    else:
-        response_content = f'<span style="color: green;">INFO: {action} for {manual_relay_time}ms successful.</span>'
-        await set_relay(config.get_int_value(pin_key), manual_relay_time)
-    return response_content
+    if timer <= puffer_time:
+        log(
+            "ERROR",
+            "{}({}): manual trigger failed: Timer near by 0.",
+            name,
+            manual_relay_time,
+        )
+        return (
+            f'<span style="color: orange;">WARN: Ventil wurde nicht {done_text}: der Timer ist zu nahe an 0.</span>',
+            "200 OK",
+            None,
+        )
+    if not (0 < current_temp <= 120):
+        log("ERROR", "{}({}): manual trigger failed: temp error.", name, manual_relay_time)
+        return (
+            f'<span style="color: red;">ERROR: Ventil wurde nicht {done_text}: Temp Fehler!</span>',
+            "200 OK",
+            None,
+        )
+    command = actuator.submit(direction, manual_relay_time, "web")
+    if command is None:
+        log("ERROR", "{}({}): manual trigger failed: queue full.", name, manual_relay_time)
+        return (
+            f'<span style="color: red;">ERROR: Ventil wurde nicht {done_text}: zu viele Befehle in der Warteschlange.</span>',
+            "503 Service Unavailable",
+            None,
+        )
+    log("INFO", "{}({}): manual trigger #{}", name, manual_relay_time, command.id)
+    return (
+        f'<span style="color: green;">INFO: Ventil wird f&uuml;r {manual_relay_time}ms {done_text} (Befehl #{command.id}).</span>',
+        "202 Accepted",
+        {"Location": f"/api/command?id={command.id}", "X-Command-Id": command.id},
+    )
 
 
-# handle post from index.html
-async def handle_post(body, requested_path="/save_config"):
+# handle post from index.html (reload=False for requests by fetch())
+# returns response content, status and headers
+async def handle_post(form_data, requested_path="/save_config", reload=True):
     # response_content
     response_content = ""
 
-    # parse form data
-    form_data = parse_form_data(body)
-    log("INFO", f"POST request: data:\n{form_data}")
+    log("INFO", "POST request: data:\n{}", form_data)
 
     error = False
 
     # update config
     for key in form_data:
-        if config.get_value(key) is not None:
-            config.set_value(key, form_data[key])
-        else:
+        if config.get_value(key) is None:
             error = "key " + key + " not found in config.json"
+        elif not config.set_value(key, form_data[key]):
+            error = "invalid value for key " + key
 
-    # save config
-    config.save_config()
+    # save config (deferred, several posts are written at once)
+    config.request_save()
 
     # print nominal temp
     print_nominal_temp()
@@ -298,75 +238,19 @@ async def handle_post(body, requested_path="/save_config"):
     # set lcd backlight
     set_backlight(config.get_bool_value("lcd_i2c_backlight"))
 
-    # /open_relay
+    # /open_relay, /close_relay (queued, the response does not wait for the relay)
+    status = "200 OK"
+    headers = None
     if requested_path == "/open_relay":
-        current_temp = config.get_float_value("current_temp", -127.0)
-        manual_relay_time = config.get_int_value("manual_relay_time", 1200)
-        if manual_relay_time > 10000:
-            manual_relay_time = 10000
-        timer = config.get_int_value("timer")
-        puffer_time = (manual_relay_time / 1000) + 3
-        if error:
-            response_content = f'<span style="color: orange;">WARN: Ventil wurde nicht ge&ouml;ffnet: {error}</span>'
-            log(
-                "WARN",
-                f"open_relay({manual_relay_time}): manual trigger failed: {error}",
-            )
-        elif timer <= puffer_time:
-            response_content = f'<span style="color: orange;">WARN: Ventil wurde nicht ge&ouml;ffnet: der Timer ist zu nahe an 0.</span>'
-            log(
-                "ERROR",
-                f"open_relay({manual_relay_time}): manual trigger failed: Timer near by 0.",
-            )
-        elif not (0 < current_temp <= 120):
-            response_content = f'<span style="color: red;">ERROR: Ventil wurde nicht ge&ouml;ffnet: Temp Fehler!</span>'
-            log(
-                "ERROR",
-                f"open_relay({manual_relay_time}): manual trigger failed: temp error.",
-            )
-        else:
-            response_content = f'<span style="color: green;">INFO: Ventil wird f&uuml;r {manual_relay_time}ms ge&ouml;ffnet.</span>'
-            log("INFO", f"open_relay({manual_relay_time}): manual trigger")
-            relay_open_pin = config.get_int_value("RELAY_OPEN_PIN", 14)
-            await set_relay(relay_open_pin, manual_relay_time)
-
-    # /close_relay
-    if requested_path == "/close_relay":
-        current_temp = config.get_float_value("current_temp", -127.0)
-        manual_relay_time = config.get_int_value("manual_relay_time", 1200)
-        if manual_relay_time > 10000:
-            manual_relay_time = 10000
-        timer = config.get_int_value("timer")
-        puffer_time = (manual_relay_time / 1000) + 3
-        if error:
-            response_content = f'<span style="color: orange;">WARN: Ventil wurde nicht geschlossen: {error}</span>'
-            log(
-                "WARN",
-                f"close_relay({manual_relay_time}): manual trigger failed: {error}",
-            )
-        elif timer <= puffer_time:
-            response_content = f'<span style="color: orange;">WARN: Ventil wurde nicht geschlossen: der Timer ist zu nahe an 0.</span>'
-            log(
-                "ERROR",
-                f"close_relay({manual_relay_time}): manual trigger failed: Timer near by 0.",
-            )
-        elif not (0 < current_temp <= 120):
-            response_content = f'<span style="color: red;">ERROR: Ventil wurde nicht geschlossen: Temp Fehler!</span>'
-            log(
-                "ERROR",
-                f"close_relay({manual_relay_time}): manual trigger failed: temp error.",
-            )
-        else:
-            response_content = f'<span style="color: green;">INFO: Ventil wird f&uuml;r {manual_relay_time}ms geschlossen.</span>'
-            log("INFO", f"close_relay({manual_relay_time}): manual trigger")
-            relay_close_pin = config.get_int_value("RELAY_CLOSE_PIN", 15)
-            await set_relay(relay_close_pin, manual_relay_time)
+        response_content, status, headers = handle_manual_relay("open", error)
+    elif requested_path == "/close_relay":
+        response_content, status, headers = handle_manual_relay("close", error)
 
     # /save_config
     elif requested_path == "/save_config":
         if error:
             response_content = f'<span style="color: orange;">WARN: Konfiguration nur teilweise aktualisiert: {error}</span>'
-            log("WARN", f"config.json partially updated: {error}")
+            log("WARN", "config.json partially updated: {}", error)
         else:
             response_content = f'<span style="color: green;">INFO: Konfiguration erfolgreich aktualisiert</span>'
             log("INFO", "config.json successfully updated")
@@ -375,13 +259,18 @@ async def handle_post(body, requested_path="/save_config"):
     elif requested_path == "/reset":
         if error:
             response_content = f'<span style="color: orange;">WARN: Boot Normal Option wurde nicht richtig &uuml;bermittelt und bleibt unber&uuml;hrt: {error}</span>'
-            log("WARN", f"boot_normal NOT updated: {error}")
+            log("WARN", "boot_normal NOT updated: {}", error)
         else:
             response_content = f'<span style="color: green;">INFO: Reset erkannt. Starte neu ...</span>'
             log("INFO", "reset()")
 
     # add back button and return script
-    if requested_path in ["/open_relay", "/close_relay", "/save_config", "/reset"]:
+    if reload and requested_path in [
+        "/open_relay",
+        "/close_relay",
+        "/save_config",
+        "/reset",
+    ]:
         response_content += """
             <br /><br />
             <a href="/"><button type="button">zur&uuml;ck</button></a>
@@ -392,110 +281,223 @@ async def handle_post(body, requested_path="/save_config"):
             </script>
         """
 
-    return response_content
-
-
-# send_response
-async def send_response(writer, content_type, content=None):
-    writer.write(f"HTTP/1.1 200 OK\nContent-Type: {content_type}\n\n".encode("utf-8"))
-    if content:
-        await writer.awrite(content.encode("utf-8"))
+    return response_content, status, headers
 
 
 # handle post request
-async def handle_post_request(writer, request_body, requested_path):
-    response_content = await handle_post(request_body, requested_path)
-    await send_response(writer, "text/html", response_content)
-
-
-# handle client
-async def handle_client(reader, writer):
-    reset_pico = False
+async def handle_post_request(writer, request, keep_alive=True, reload=True):
+    response_content, status, headers = await handle_post(
+        request.get_form(), request.path, reload
+    )
+    await send_response(
+        writer, "text/html; charset=utf-8", response_content, status, keep_alive, headers
+    )
 
-    # get request
-    request_lines = []
-    content_length = 0
-    while True:
-        line = await reader.readline()
-        if line == b"\r\n":
-            break
-        request_lines.append(line.decode("utf-8"))
-        if line.lower().startswith(b"content-length:"):
-            content_length = int(line.decode().split()[1])
-
-    # get request header
-    request_header = "".join(request_lines)
-
-    # read body if present
-    request_body = ""
-    if content_length > 0:
-        remaining_length = content_length
-        while remaining_length > 0:
-            chunk = await reader.read(min(remaining_length, 1024))
-            if not chunk:
-                break
-            request_body += chunk.decode("utf-8")
-            remaining_length -= len(chunk)
 
-    # process request
-    match = re.search(
-        r"^(GET|POST|PUT|DELETE|HEAD|OPTIONS|PATCH) /[^ ]*", request_header
-    )
-    if match:
-        result = match.group(0)
+# handle relay stop (/stop_relay: emergency stop, /cancel_relay?id=<id>: cancel)
+async def handle_relay_stop(writer, request, keep_alive=True):
+    if request.path == "/stop_relay":
+        actuator.stop()
+        response_content = '<span style="color: orange;">WARN: Ventil gestoppt, alle Befehle abgebrochen.</span>'
     else:
-        result = ""
-    log("INFO", f"handle_client() - {result}")
+        command_id = to_int(request.get_form().get("id", request.get_params().get("id")))
+        if actuator.cancel(command_id):
+            response_content = f'<span style="color: green;">INFO: Befehl #{command_id} abgebrochen.</span>'
+        else:
+            response_content = f'<span style="color: orange;">WARN: Befehl #{command_id} nicht gefunden oder bereits beendet.</span>'
+    await send_response(
+        writer, "text/html; charset=utf-8", response_content, keep_alive=keep_alive
+    )
 
-    requested_path = request_header.split(" ")[1]
+
+# handle request (returns True, if the pico has to be reset)
+async def handle_request(writer, request, keep_alive=True):
+    log("INFO", "handle_request() - {} {}", request.method, request.path)
+    requested_path = request.path
+    params = request.get_params()
+    reload = "ajax" not in params
 
     # /index.html
     if requested_path in ["/", "/index.html"]:
-        await send_response(writer, "text/html")
-        await get_index_html(writer)
+        await send_stream(
+            writer, "text/html; charset=utf-8", get_index_html, keep_alive
+        )
 
     # /open_relay, /close_relay, /save_config
     elif (
         requested_path in ["/open_relay", "/close_relay", "/save_config"]
-        and "POST" in request_header.split(" ")[0]
+        and request.method == "POST"
     ):
-        await handle_post_request(writer, request_body, requested_path)
+        await handle_post_request(writer, request, keep_alive, reload)
 
     # /reset
-    elif requested_path == "/reset" and "POST" in request_header.split(" ")[0]:
-        await handle_post_request(writer, request_body, requested_path)
-        reset_pico = True
+    elif requested_path == "/reset" and request.method == "POST":
+        await handle_post_request(writer, request, False, reload)
+        return True
+
+    # /api/state (?since=<version>&boot=<boot>: only changed fields or 304)
+    elif requested_path == "/api/state":
+        content = get_api_state(params)
+        if content is None:
+            await send_response(
+                writer, status="304 Not Modified", keep_alive=keep_alive
+            )
+        else:
+            await send_response(
+                writer, "application/json", content, keep_alive=keep_alive
+            )
+
+    # /events (server-sent events, the stream runs until the client disconnects)
+    elif requested_path == "/events":
+        subscriber = event_hub.subscribe()
+        if subscriber is None:
+            await send_response(
+                writer, "text/plain", "Too Many Subscribers", "503 Service Unavailable"
+            )
+        else:
+            headers = {"Cache-Control": "no-cache"}
+            await send_headers(
+                writer, "200 OK", "text/event-stream", None, True, headers
+            )
+            await stream_events(writer, subscriber)
+
+    # /stop_relay, /cancel_relay
+    elif (
+        requested_path in ["/stop_relay", "/cancel_relay"] and request.method == "POST"
+    ):
+        await handle_relay_stop(writer, request, keep_alive)
+
+    # /api/command (?id=<id>: one command, otherwise queue and recent commands)
+    elif requested_path == "/api/command":
+        content = get_api_command(params)
+        if content is None:
+            await send_response(
+                writer, "text/plain", "Not Found", "404 Not Found", keep_alive
+            )
+        else:
+            await send_response(
+                writer, "application/json", content, keep_alive=keep_alive
+            )
+
+    # /api/config
+    elif requested_path == "/api/config":
+        await send_response(
+            writer, "application/json", get_api_config(), keep_alive=keep_alive
+        )
+
+    # /api/stats
+    elif requested_path == "/api/stats":
+        await send_response(
+            writer, "application/json", get_api_stats(), keep_alive=keep_alive
+        )
+
+    # /api/loop (event loop lateness, stalls and step times of the tasks)
+    elif requested_path == "/api/loop":
+        await send_response(
+            writer, "application/json", get_api_loop(), keep_alive=keep_alive
+        )
+
+    # /metrics (prometheus text format)
+    elif requested_path == "/metrics":
+        await send_response(
+            writer,
+            "text/plain; version=0.0.4; charset=utf-8",
+            get_api_metrics(),
+            keep_alive=keep_alive,
+        )
+
+    # /log
+    elif requested_path == "/log":
+        await send_response(
+            writer, "text/plain; charset=utf-8", get_log_chunks(), keep_alive=keep_alive
+        )
 
-    # /styles.css
-    elif requested_path == "/styles.css":
-        await send_response(writer, "text/css")
-        await stream_file(writer, "styles.css", chunk_size=1024)
+    # static files (/styles.css)
+    elif requested_path in STATIC_FILES:
+        file_path, content_type = STATIC_FILES[requested_path]
+        await send_file(writer, request, file_path, content_type, keep_alive)
 
     # 404 Not Found
     else:
-        response = "HTTP/1.1 404 Not Found\n\n"
-        await writer.awrite(response.encode("utf-8"))
+        await send_response(
+            writer, "text/plain", "Not Found", "404 Not Found", keep_alive
+        )
+
+    return False
+
+
+# handle client (several requests per connection, if the client keeps it alive)
+async def handle_client(reader, writer):
+    reset_pico = False
+    requests = 0
+
+    # admission control (too many connections are rejected with 503)
+    buffer = accept_connection()
+    if buffer is None:
+        log("WARN", "handle_client(): too many connections")
+        try:
+            await reject_connection(writer)
+        except OSError:
+            pass
+        await writer.wait_closed()
+        return
+
+    connection = Connection(reader, buffer)
+    try:
+        while not reset_pico:
+            try:
+                request = await connection.read_request()
+            except HttpError as e:
+                log("WARN", "handle_client(): {}", e.status)
+                await send_response(writer, "text/plain", e.status, e.status, False)
+                break
+            if request is None:
+                break
+            requests += 1
+            keep_alive = request.keep_alive() and requests < KEEP_ALIVE_MAX_REQUESTS
+
+            # the event stream runs until the client disconnects, it is not
+            # accounted (it would include everything, that runs meanwhile)
+            start = None
+            if request.path != "/events":
+                start = webserver_metrics.begin()
+            reset_pico = await handle_request(writer, request, keep_alive)
+            await writer.drain()
+            if start is not None:
+                webserver_metrics.end(start)
+            if not keep_alive:
+                break
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        log("WARN", "handle_client(): {}", e)
+    finally:
+        release_connection(buffer)
 
     # clean up and close
-    await writer.drain()
     await writer.wait_closed()
 
     # release memory
-    gc.collect()
+    metrics.collect()
 
     # reset pico
     if reset_pico:
+        config.save_config()
         reset()
 
 
+# handle client with step timing (a client, that blocks the event loop, shows up
+# as "handle_client" in the stalls of /api/loop)
+def handle_timed_client(reader, writer):
+    return timed("handle_client", handle_client(reader, writer))
+
+
 # run webserver
 async def run_webserver():
     try:
         host = "0.0.0.0"
         port = 80
-        asyncio.create_task(manage_wifi_connection())
-        log("INFO", f"run_webserver({host}, {port})")
-        server = await asyncio.start_server(handle_client, host, port)  # type: ignore
+        asyncio.create_task(timed("manage_wifi_connection", manage_wifi_connection()))
+        log("INFO", "run_webserver({}, {})", host, port)
+        server = await asyncio.start_server(handle_timed_client, host, port)
 
     except Exception as e:
         # print error message
@@ -514,5 +516,8 @@ if __name__ == "__main__":
     # run webserver() as task
     loop.create_task(run_webserver())
 
+    # run run_display() as task
+    loop.create_task(run_display())
+
     # run event loop forever
     loop.run_forever()
@@ -21,7 +21,7 @@ async def connect_wifi():
     if wifi_is_activated:
         global show_message
         ssid = config.get_value("wifi_ssid")
-        log("INFO", f"connect_wifi(ssid = {ssid})")
+        log("INFO", "connect_wifi(ssid = {})", ssid)
 
         if ssid is not None:
             password = config.get_value("wifi_password", "password")
@@ -31,7 +31,7 @@ async def connect_wifi():
                 wifi.active(True)
                 wifi.connect(ssid, password)
             except OSError as error:
-                log("ERROR", f"wifi module error: {error}")
+                log("ERROR", "wifi module error: {}", error)
                 log("ERROR", "disable wifi()")
                 wifi_is_activated = False
 
@@ -47,7 +47,7 @@ async def connect_wifi():
 
             if wifi.isconnected():
                 if show_message >= 1:
-                    log("INFO", f"wifi connected: {wifi.ifconfig()}")
+                    log("INFO", "wifi connected: {}", wifi.ifconfig())
                     print_lcd(2, 0, "WLAN wurde verbunden")
                     await asyncio.sleep(3)
                 show_message = 0
@@ -55,7 +55,7 @@ async def connect_wifi():
                 log("WARN", "wifi connection failed!")
                 print_lcd(2, 0, "WLAN nicht verbunden")
         else:
-            log("ERROR", f"no SSID found!")
+            log("ERROR", "no SSID found!")
             print_lcd(2, 0, "keine SSID gefunden!")
             wifi_is_activated = False
 
@@ -0,0 +1,127 @@
+# ==================================================
+# Tests: binary settings slots (src/config_store.py)
+# ==================================================
+#
+# Usage (from the project folder):
+#   python -m pytest tests
+
+# imports
+import json
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+sys.path.insert(0, os.path.join(PROJECT_DIR, "bench"))
+
+from fake_hw import install_shims
+
+install_shims()
+
+from src import config_store
+from src.config_store import ConfigStore
+
+# settings, that are missing in the config.json of an older release
+MISSING_KEYS = (
+    "config_save_delay",
+    "lcd_max_fps",
+    "interval",
+    "lcd_i2c_backlight",
+    "wifi_country",
+)
+
+
+# config.json of the project without the missing keys
+def write_config_json(tmp_path):
+    with open(os.path.join(PROJECT_DIR, "config.json"), encoding="utf-8") as file:
+        settings = json.load(file)
+    for key in MISSING_KEYS:
+        settings.pop(key, None)
+    path = str(tmp_path / "config.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(settings, file)
+    return path, settings
+
+
+# import config.json, save a slot and load it with a new store (next boot)
+def test_round_trip_keeps_missing_keys_absent(tmp_path):
+    path, settings = write_config_json(tmp_path)
+    store = ConfigStore(str(tmp_path) + "/")
+    imported = store.import_json(path)
+    assert store.save(imported)
+
+    loaded = ConfigStore(str(tmp_path) + "/").load()
+    for key in MISSING_KEYS:
+        assert key not in loaded
+    for key, kind, _ in config_store.SETTINGS_SCHEMA:
+        if key not in settings or settings[key] == "":
+            assert key not in loaded
+        elif kind == "bool":
+            assert loaded[key] == config_store.to_bool(settings[key])
+        else:
+            assert loaded[key] == settings[key]
+
+
+# unchanged settings are not written again
+def test_save_skips_unchanged_settings(tmp_path):
+    store = ConfigStore(str(tmp_path) + "/")
+    assert store.save({"update_time": 120})
+    assert not store.save({"update_time": 120})
+    assert store.save({"update_time": 90})
+    assert ConfigStore(str(tmp_path) + "/").load() == {"update_time": 90}
+
+
+# slots stay valid, when settings are added to or removed from the schema
+def test_schema_change_keeps_slot(tmp_path, monkeypatch):
+    schema = config_store.SETTINGS_SCHEMA + (("removed_setting", "int", 4),)
+    monkeypatch.setattr(config_store, "SETTINGS_SCHEMA", schema)
+    store = ConfigStore(str(tmp_path) + "/")
+    store.save({"update_time": 90, "wifi_ssid": "home", "removed_setting": 7})
+    monkeypatch.undo()
+
+    loaded = ConfigStore(str(tmp_path) + "/").load()
+    assert loaded == {"update_time": 90, "wifi_ssid": "home"}
+
+
+# a corrupted slot is ignored, the other slot wins
+def test_corrupted_slot_falls_back(tmp_path):
+    store = ConfigStore(str(tmp_path) + "/")
+    store.save({"update_time": 90})
+    store.save({"update_time": 60})
+    with open(store.slot_paths[store.active_slot], "r+b") as file:
+        file.seek(config_store.HEADER_SIZE)
+        file.write(b"\xff")
+    assert ConfigStore(str(tmp_path) + "/").load() == {"update_time": 90}
+
+
+# values from the web ui are converted to the type of the setting
+def test_convert_setting():
+    convert = config_store.convert_setting
+    assert convert("lcd_i2c_backlight", "true") == 1
+    assert convert("lcd_i2c_backlight", "false") == 0
+    assert convert("update_time", "90") == 90
+    assert convert("nominal_min_temp", "42.5") == 42.5
+    assert convert("LCD_ADDR", "0x27") == "0x27"
+    assert convert("unknown_setting", "1") == "1"
+    for key, value in (("update_time", "1.5"), ("nominal_min_temp", "warm")):
+        try:
+            convert(key, value)
+        except ValueError:
+            continue
+        raise AssertionError(key)
+
+
+# six probes with rom ids fit into temp_sensors, longer values are rejected
+def test_temp_sensors_with_rom_ids(tmp_path):
+    sensors = ",".join(
+        "probe_{}:{}:28ff{:012x}".format(index, 6 + index, index) for index in range(6)
+    )
+    store = ConfigStore(str(tmp_path) + "/")
+    store.save({"temp_sensors": sensors})
+    assert ConfigStore(str(tmp_path) + "/").load() == {"temp_sensors": sensors}
+    try:
+        config_store.convert_setting("temp_sensors", sensors * 4)
+    except ValueError:
+        return
+    raise AssertionError("too long value accepted")
@@ -0,0 +1,48 @@
+# ==================================================
+# Tests: request parser (src/http.py)
+# ==================================================
+#
+# Usage (from the project folder):
+#   python -m pytest tests
+
+# imports
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+sys.path.insert(0, os.path.join(PROJECT_DIR, "bench"))
+
+from fake_hw import install_shims
+
+install_shims()
+
+from src.http import Request
+
+
+# request with a query and a body range in the buffer
+def create_request(query, body):
+    buffer = bytearray(query + body)
+    request = Request(buffer)
+    request.query = (0, len(query))
+    request.body = (len(query), len(buffer))
+    return request
+
+
+# query and form are decoded once, a second call returns the same values
+def test_params_and_form_are_decoded_once():
+    request = create_request(b"id=%2541&ajax", b"name=a%2Bb+c")
+    assert request.get_params() == {"id": "%41", "ajax": None}
+    assert request.get_params() == {"id": "%41", "ajax": None}
+    assert request.get_form() == {"name": "a+b c"}
+    assert request.get_form() == {"name": "a+b c"}
+
+
+# reset() drops the parsed values of the previous request
+def test_reset_drops_parsed_values():
+    request = create_request(b"id=1", b"")
+    assert request.get_params() == {"id": "1"}
+    request.reset()
+    assert request.get_params() == {}
+    assert request.get_form() == {}
@@ -20,23 +20,38 @@ function RemoveProjectFiles {
     if ($config) {
         Write-Host "Entferne config.json"
         python -m mpremote connect $port rm :config.json
+        python -m mpremote connect $port rm :config_a.bin
+        python -m mpremote connect $port rm :config_b.bin
     }
     python -m mpremote connect $port rm :config_backup.json
+    python -m mpremote connect $port rm :src/api.py
     python -m mpremote connect $port rm :src/button.py
     python -m mpremote connect $port rm :src/config.py
+    python -m mpremote connect $port rm :src/config_store.py
+    python -m mpremote connect $port rm :src/events.py
     python -m mpremote connect $port rm :src/functions.py
+    python -m mpremote connect $port rm :src/http.py
     python -m mpremote connect $port rm :src/lcd_api.py
     python -m mpremote connect $port rm :src/lcd.py
     python -m mpremote connect $port rm :src/led.py
     python -m mpremote connect $port rm :src/log.py
+    python -m mpremote connect $port rm :src/metrics.py
+    python -m mpremote connect $port rm :src/watchdog.py
+    python -m mpremote connect $port rm :src/scheduler.py
     python -m mpremote connect $port rm :src/machine_i2c_lcd.py
+    python -m mpremote connect $port rm :src/valve.py
+    python -m mpremote connect $port rm :src/pulse.py
     python -m mpremote connect $port rm :src/relay.py
+    python -m mpremote connect $port rm :src/actuator.py
+    python -m mpremote connect $port rm :src/sampler.py
     python -m mpremote connect $port rm :src/temp.py
+    python -m mpremote connect $port rm :src/template.py
     python -m mpremote connect $port rm :src/webserver.py
     python -m mpremote connect $port rm :src/wifi.py
     python -m mpremote connect $port rmdir :src
     python -m mpremote connect $port rm :web/index.html
     python -m mpremote connect $port rm :web/styles.css
+    python -m mpremote connect $port rm :web/styles.css.gz
     python -m mpremote connect $port rmdir :web
     Write-Host "Projektdateien entfernt"
 }
@@ -50,21 +65,34 @@ function CopyProjectFiles {
         python -m mpremote connect $port cp ./config.json :config.json
     }
     python -m mpremote connect $port mkdir src
+    python -m mpremote connect $port cp ./src/api.py :src/api.py
     python -m mpremote connect $port cp ./src/button.py :src/button.py
     python -m mpremote connect $port cp ./src/config.py :src/config.py
+    python -m mpremote connect $port cp ./src/config_store.py :src/config_store.py
+    python -m mpremote connect $port cp ./src/events.py :src/events.py
     python -m mpremote connect $port cp ./src/functions.py :src/functions.py
+    python -m mpremote connect $port cp ./src/http.py :src/http.py
     python -m mpremote connect $port cp ./src/lcd_api.py :src/lcd_api.py
     python -m mpremote connect $port cp ./src/lcd.py :src/lcd.py
     python -m mpremote connect $port cp ./src/led.py :src/led.py
     python -m mpremote connect $port cp ./src/log.py :src/log.py
+    python -m mpremote connect $port cp ./src/metrics.py :src/metrics.py
+    python -m mpremote connect $port cp ./src/watchdog.py :src/watchdog.py
+    python -m mpremote connect $port cp ./src/scheduler.py :src/scheduler.py
     python -m mpremote connect $port cp ./src/machine_i2c_lcd.py :src/machine_i2c_lcd.py
+    python -m mpremote connect $port cp ./src/valve.py :src/valve.py
+    python -m mpremote connect $port cp ./src/pulse.py :src/pulse.py
     python -m mpremote connect $port cp ./src/relay.py :src/relay.py
+    python -m mpremote connect $port cp ./src/actuator.py :src/actuator.py
+    python -m mpremote connect $port cp ./src/sampler.py :src/sampler.py
     python -m mpremote connect $port cp ./src/temp.py :src/temp.py
+    python -m mpremote connect $port cp ./src/template.py :src/template.py
     python -m mpremote connect $port cp ./src/webserver.py :src/webserver.py
     python -m mpremote connect $port cp ./src/wifi.py :src/wifi.py
     python -m mpremote connect $port mkdir web
     python -m mpremote connect $port cp ./web/index.html :web/index.html
     python -m mpremote connect $port cp ./web/styles.css :web/styles.css
+    python -m mpremote connect $port cp ./web/styles.css.gz :web/styles.css.gz
     Write-Host "Projektdateien kopiert"
 }
 